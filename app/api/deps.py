@@ -1,16 +1,26 @@
-from typing import Optional
-from fastapi import Depends, HTTPException, status, Request
+from typing import Any, Optional, Tuple
+from fastapi import Depends, HTTPException, Query, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import verify_token
+from app.core.pagination import coerce_cursor, decode_cursor
 from app.crud.user import user as user_crud
 from app.models.user import User, UserRole
+from app.models.order import Order, Reservation
+from app.models.menu import MenuItem
+from app.models.table import Table
+from app.services.user_cache import user_cache
 
 
 security = HTTPBearer()
 
 
+def get_user_by_subject(db: Session, username: str) -> Optional[User]:
+    """Resolve a token subject to its user, served from the user cache when fresh"""
+    return user_cache.get(db, username, lambda: user_crud.get_by_username(db, username=username))
+
+
 def get_current_user(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -26,7 +36,7 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = user_crud.get_by_username(db, username=username)
+    user = get_user_by_subject(db, username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -102,7 +112,7 @@ def get_current_user_optional(
         if username is None:
             return None
         
-        user = user_crud.get_by_username(db, username=username)
+        user = get_user_by_subject(db, username)
         if user is None or not user_crud.is_active(user):
             return None
         
@@ -144,7 +154,7 @@ def get_current_user_or_rasa(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        user = user_crud.get_by_username(db, username=username)
+        user = get_user_by_subject(db, username)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -166,4 +176,30 @@ def get_current_user_or_rasa(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+
+
+def cursor_for(*columns):
+    """
+    Keyset pagination cursor dependency for a listing sorted by `columns`;
+    malformed cursors and values of the wrong type are rejected with 400
+    """
+    def get_cursor(
+        cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's next_cursor (overrides skip)"),
+    ) -> Optional[Tuple[Any, ...]]:
+        """Decode the keyset pagination cursor"""
+        try:
+            return coerce_cursor(columns, decode_cursor(cursor))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    return get_cursor
+
+
+# One cursor dependency per listing, matching its sort key
+get_order_cursor = cursor_for(Order.created_at, Order.id)
+get_reservation_cursor = cursor_for(Reservation.created_at, Reservation.id)
+get_menu_item_cursor = cursor_for(MenuItem.name, MenuItem.id)
+get_table_cursor = cursor_for(Table.table_number, Table.id)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from . import auth, users, menu, tables, orders, arrivals
+from . import auth, users, menu, tables, orders, arrivals, events
 
 api_router = APIRouter()
 
@@ -8,4 +8,5 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(menu.router, prefix="/menu", tags=["menu"])
 api_router.include_router(tables.router, prefix="/tables", tags=["tables"])
 api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
-api_router.include_router(arrivals.router, prefix="/arrivals", tags=["arrivals"])
\ No newline at end of file
+api_router.include_router(arrivals.router, prefix="/arrivals", tags=["arrivals"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
\ No newline at end of file
@@ -1,11 +1,12 @@
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.api.deps import get_current_user, get_current_staff_user
 from app.services.customer_arrival_tracker import create_arrival_tracker, ArrivalRecord
+from app.core.time_window import naive_utc
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -27,6 +28,19 @@ class ArrivalRecordResponse(BaseModel):
     party_size: int
 
 
+class NoShowSweepResponse(BaseModel):
+    no_shows: int
+    released_tables: int
+    reservation_ids: List[int]
+    released_table_ids: List[int]
+
+
+class ArrivalBreakdown(BaseModel):
+    arrivals: int
+    no_shows: int
+    average_difference_minutes: float
+
+
 class ArrivalStatistics(BaseModel):
     total_arrivals: int
     early: int
@@ -35,6 +49,11 @@ class ArrivalStatistics(BaseModel):
     very_late: int
     no_show: int
     average_difference_minutes: float
+    p50_difference_minutes: Optional[int] = None
+    p90_difference_minutes: Optional[int] = None
+    histogram: Dict[str, int] = {}
+    by_weekday: Dict[int, ArrivalBreakdown] = {}  # 0 = Monday
+    by_hour: Dict[int, ArrivalBreakdown] = {}  # restaurant-local hour of the reservation
 
 
 @router.post("/record", response_model=ArrivalRecordResponse)
@@ -72,7 +91,7 @@ def record_customer_arrival(
         raise HTTPException(status_code=500, detail="Failed to record arrival")
 
 
-@router.post("/check-no-shows", response_model=List[dict])
+@router.post("/check-no-shows", response_model=NoShowSweepResponse)
 def check_for_no_shows(
     *,
     db: Session = Depends(get_db),
@@ -83,24 +102,20 @@ def check_for_no_shows(
     Check for and mark no-show reservations (Staff+ only)
     """
     tracker = create_arrival_tracker(db)
-    no_shows = tracker.check_for_no_shows(threshold_minutes=threshold_minutes)
-    
-    return [
-        {
-            "reservation_id": res.id,
-            "customer_name": res.customer.full_name if res.customer else "Guest",
-            "table_number": res.table.table_number if res.table else "N/A",
-            "reservation_time": res.reservation_datetime.isoformat(),
-            "party_size": res.party_size
-        }
-        for res in no_shows
-    ]
+    sweep = tracker.check_for_no_shows(threshold_minutes=threshold_minutes)
+
+    return NoShowSweepResponse(
+        no_shows=len(sweep.reservation_ids),
+        released_tables=len(sweep.released_table_ids),
+        reservation_ids=sweep.reservation_ids,
+        released_table_ids=sweep.released_table_ids
+    )
 
 
 @router.get("/statistics", response_model=ArrivalStatistics)
 def get_arrival_statistics(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     start_date: Optional[datetime] = Query(None, description="Start date for statistics"),
     end_date: Optional[datetime] = Query(None, description="End date for statistics"),
     current_user = Depends(get_current_staff_user),
@@ -117,7 +132,7 @@ def get_arrival_statistics(
 @router.get("/today", response_model=List[dict])
 def get_todays_arrivals(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_staff_user),
 ) -> Any:
     """
@@ -144,13 +159,13 @@ def get_upcoming_arrivals(
     return [
         {
             "reservation_id": res.id,
-            "customer_name": res.customer.full_name if res.customer else "Guest",
-            "customer_phone": res.customer.phone if res.customer else None,
-            "table_number": res.table.table_number if res.table else "N/A",
+            "customer_name": res.customer_name or "Guest",
+            "customer_phone": res.customer_phone,
+            "table_number": res.table_number or "N/A",
             "reservation_time": res.reservation_datetime.isoformat(),
             "party_size": res.party_size,
             "minutes_until_arrival": int(
-                (res.reservation_datetime - datetime.utcnow()).total_seconds() / 60
+                (naive_utc(res.reservation_datetime) - datetime.utcnow()).total_seconds() / 60
             )
         }
         for res in upcoming
@@ -0,0 +1,39 @@
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_current_staff_user
+from app.services.event_stream import EventFilter, event_broker, event_stream
+
+router = APIRouter()
+
+
+@router.get("/stream")
+async def stream_events(
+    *,
+    types: Optional[List[str]] = Query(
+        None, description="Event type prefixes to receive, e.g. table, order.status, reservation"
+    ),
+    table_id: Optional[List[int]] = Query(None, description="Only events for these tables"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user = Depends(get_current_staff_user),
+) -> Any:
+    """
+    Server-Sent Events stream of table status, order status and new reservation
+    events (Staff+ only). Replaces polling status-summary / orders / dashboard.
+    A reconnect with Last-Event-ID replays missed events, or sends a resync
+    snapshot of the floor when they are no longer buffered.
+    """
+    return StreamingResponse(
+        event_stream(EventFilter(types, table_id), last_event_id=last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+async def event_stream_stats(
+    current_user = Depends(get_current_staff_user),
+) -> Any:
+    """Listener state, connected subscribers and delivery counters for this worker"""
+    return event_broker.stats()
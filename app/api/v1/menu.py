@@ -1,14 +1,16 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db, get_async_db
 from app.crud.menu import category as category_crud, menu_item as menu_item_crud
 from app.schemas.menu import (
     Category, CategoryCreate, CategoryUpdate, CategoryWithItems,
     MenuItem, MenuItemCreate, MenuItemUpdate, PaginatedMenuResponse, PaginatedCategoryResponse
 )
-from app.api.deps import get_current_staff_user, get_current_user_optional
+from app.api.deps import get_current_staff_user, get_current_user_optional, get_menu_item_cursor
+from app.core.pagination import next_cursor
 
 router = APIRouter()
 
@@ -16,7 +18,7 @@ router = APIRouter()
 # Category endpoints
 @router.get("/categories/", response_model=PaginatedCategoryResponse)
 def read_categories(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     q: Optional[str] = Query(None, description="Search query"),
@@ -26,10 +28,9 @@ def read_categories(
     """
     Retrieve categories with pagination and search.
     """
-    categories = category_crud.get_multi_with_search(
+    categories, total = category_crud.get_page_with_search(
         db, skip=skip, limit=limit, search=q, active_only=active_only
     )
-    total = category_crud.count_with_search(db, search=q, active_only=active_only)
     
     return PaginatedCategoryResponse(
         items=categories,
@@ -41,7 +42,7 @@ def read_categories(
 
 @router.get("/categories/with-items", response_model=List[CategoryWithItems])
 def read_categories_with_items(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     # current_user = Depends(get_current_user_optional),  # Tạm disable auth
 ) -> Any:
     """
@@ -145,8 +146,8 @@ def delete_category(
 
 # Menu Item endpoints
 @router.get("/items/", response_model=PaginatedMenuResponse)
-def read_menu_items(
-    db: Session = Depends(get_db),
+async def read_menu_items(
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100,
     available_only: bool = Query(True, description="Filter only available items"),
@@ -154,25 +155,21 @@ def read_menu_items(
     q: Optional[str] = Query(None, description="Search term for item name"),
     is_featured: Optional[bool] = Query(None, description="Filter by featured status"),
     is_available: Optional[bool] = Query(None, description="Filter by availability status"),
+    after = Depends(get_menu_item_cursor),
     # current_user = Depends(get_current_user_optional),  # Tạm disable auth
 ) -> Any:
     """
     Retrieve menu items with pagination and search.
     """
-    # Get total count with filters applied
-    total = menu_item_crud.get_count(
-        db, available_only=available_only, category_id=category_id, search_term=q,
-        is_featured=is_featured, is_available=is_available
-    )
-    
-    # Get items with pagination
-    items = menu_item_crud.get_multi(
+    # Get items and total count in one query
+    items, total = await menu_item_crud.get_page_async(
         db, skip=skip, limit=limit, 
         available_only=available_only, 
         category_id=category_id,
         search_term=q,
         is_featured=is_featured,
-        is_available=is_available
+        is_available=is_available,
+        after=after
     )
     
     # Calculate pagination info
@@ -184,13 +181,14 @@ def read_menu_items(
         "total": total,
         "page": page,
         "size": limit,
-        "pages": pages
+        "pages": pages,
+        "next_cursor": next_cursor(items, limit, key=lambda item: (item.name, item.id))
     }
 
 
 @router.get("/items/featured", response_model=List[MenuItem])
 def read_featured_items(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user = Depends(get_current_user_optional),
 ) -> Any:
     """
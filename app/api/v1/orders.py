@@ -1,13 +1,15 @@
 from typing import Any, List, Optional
 from datetime import date, datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func
 from pydantic import BaseModel
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db, get_async_db
 from app.crud.order import order as order_crud, reservation as reservation_crud
 from app.crud.table import table as table_crud
 from app.crud.menu import menu_item as menu_item_crud
+from app.crud.counter import counter as counter_crud
 from app.schemas.order import (
     Order, OrderCreate, OrderUpdate, ReservationCreate, ReservationUpdate, ReservationWithDetails,
     OrderSummary, DashboardStats, PaginatedReservationResponse, PaginatedOrderResponse
@@ -15,31 +17,30 @@ from app.schemas.order import (
 from app.models.order import OrderStatus, PaymentStatus, ReservationStatus, OrderItem, Order as OrderModel
 from app.models.menu import MenuItem
 from app.models.user import UserRole
-from app.api.deps import get_current_user, get_current_staff_user, get_current_user_optional, get_current_user_or_rasa
+from app.api.deps import get_current_user, get_current_staff_user, get_current_manager_user, get_current_user_optional, get_current_user_or_rasa, get_reservation_cursor, get_order_cursor
+from app.core.pagination import next_cursor
+from app.services.dashboard_cache import dashboard_cache
 router = APIRouter()
 # Reservation endpoints
 @router.get("/reservations/", response_model=PaginatedReservationResponse)
 def read_reservations(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     status: Optional[ReservationStatus] = Query(None, description="Filter by status"),
     date_filter: Optional[date] = Query(None, description="Filter by date"),
+    after = Depends(get_reservation_cursor),
     current_user = Depends(get_current_staff_user),
 ) -> Any:
     """
     Retrieve reservations with pagination and optional filtering.
     """
-    # Get total count with filters applied
-    total = reservation_crud.get_count_with_details(
-        db, status=status, date_filter=date_filter
-    )
-    
-    # Get reservations with pagination
-    reservations = reservation_crud.get_multi_with_details(
+    # Get reservations and total count in one query
+    reservations, total, total_is_estimate = reservation_crud.get_page_with_details(
         db, skip=skip, limit=limit, 
         status=status, 
-        date_filter=date_filter
+        date_filter=date_filter,
+        after=after
     )
     
     # Calculate pagination info
@@ -51,11 +52,13 @@ def read_reservations(
         total=total,
         page=page,
         size=limit,
-        pages=pages
+        pages=pages,
+        total_is_estimate=total_is_estimate,
+        next_cursor=next_cursor(reservations, limit, key=lambda r: (r["created_at"], r["id"]))
     )
 @router.get("/reservations/my", response_model=List[ReservationWithDetails])
-def read_my_reservations(
-    db: Session = Depends(get_db),
+async def read_my_reservations(
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100,
     current_user = Depends(get_current_user_or_rasa),
@@ -68,7 +71,7 @@ def read_my_reservations(
         # Rasa request or no user - return empty list
         return []
         
-    reservations = reservation_crud.get_my_reservations_with_details(
+    reservations = await reservation_crud.get_my_reservations_with_details_async(
         db, customer_id=current_user.id, skip=skip, limit=limit
     )
     
@@ -78,15 +81,32 @@ def create_reservation(
     *,
     db: Session = Depends(get_db),
     reservation_in: ReservationCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=100),
     current_user = Depends(get_current_user_optional),
 ) -> Any:
     """
     Create new reservation.
+    Retries carrying the same Idempotency-Key return the original reservation.
     """
     # If user is authenticated, use their ID
     if current_user:
         reservation_in.customer_id = current_user.id
     
+    # A retried request returns the reservation its first attempt created
+    from app.services.booking import (
+        create_booking_service, BookingConflict, IdempotencyKeyReused, IdempotencyKeyExpired
+    )
+    booking_service = create_booking_service(db)
+    if idempotency_key:
+        try:
+            existing = booking_service.replay(idempotency_key, reservation_in.customer_id)
+        except IdempotencyKeyReused:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for another booking")
+        except IdempotencyKeyExpired:
+            raise HTTPException(status_code=422, detail="Idempotency-Key belongs to a reservation that is no longer active")
+        if existing:
+            return reservation_crud.get_with_details(db, reservation_id=existing.id)
+    
     # Check if table exists and has sufficient capacity
     table = table_crud.get(db, id=reservation_in.table_id)
     if not table:
@@ -98,24 +118,20 @@ def create_reservation(
             detail=f"Table capacity ({table.capacity}) is insufficient for party size ({reservation_in.party_size})"
         )
     
-    # Check for conflicting reservations (same table, overlapping time)
-    start_time = reservation_in.reservation_date
-    end_time = datetime.combine(
-        start_time.date(), 
-        (datetime.combine(date.today(), start_time.time()) + timedelta(hours=2)).time()
-    )
-    
-    conflicting_reservations = reservation_crud.get_by_date_range(
-        db, start_date=start_time, end_date=end_time, table_id=reservation_in.table_id
-    )
-    
-    if conflicting_reservations:
+    # Conflict check and insert run atomically under a per-table lock
+    try:
+        reservation, _ = booking_service.book(
+            reservation_in, [reservation_in.table_id], idempotency_key=idempotency_key
+        )
+    except BookingConflict:
         raise HTTPException(
             status_code=400,
             detail="Table is already reserved for this time slot"
         )
-    
-    reservation = reservation_crud.create(db, obj_in=reservation_in)
+    except IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for another booking")
+    except IdempotencyKeyExpired:
+        raise HTTPException(status_code=422, detail="Idempotency-Key belongs to a reservation that is no longer active")
     
     # Get full details for the created reservation
     reservation_details = reservation_crud.get_with_details(db, reservation_id=reservation.id)
@@ -229,39 +245,38 @@ def update_reservation_status(
 # Order endpoints
 @router.get("/orders/", response_model=PaginatedOrderResponse)
 def read_orders(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     status: Optional[OrderStatus] = Query(None, description="Filter by status"),
     date_filter: Optional[date] = Query(None, description="Filter by date"),
     search: Optional[str] = Query(None, description="Search by order number, customer name, or table number"),
+    after = Depends(get_order_cursor),
     current_user = Depends(get_current_staff_user),
 ) -> Any:
     """
     Retrieve orders with pagination and customer/table details (Staff+ only).
     """
-    # Get total count with filters applied
-    total = order_crud.get_count_with_details(
-        db, status=status, date_filter=date_filter, search=search
-    )
-    
-    # Get orders with pagination
-    orders = order_crud.get_multi_with_details(
+    # Get orders and total count in one query
+    orders, total, total_is_estimate = order_crud.get_page_with_details(
         db, skip=skip, limit=limit, 
         status=status, 
         date_filter=date_filter,
-        search=search
+        search=search,
+        after=after
     )
     
     return PaginatedOrderResponse(
         items=orders,
         total=total,
         skip=skip,
-        limit=limit
+        limit=limit,
+        total_is_estimate=total_is_estimate,
+        next_cursor=next_cursor(orders, limit, key=lambda o: (o["created_at"], o["id"]))
     )
 @router.get("/orders/my", response_model=List[Order])
 def read_my_orders(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     current_user = Depends(get_current_user),
@@ -357,7 +372,7 @@ def read_order(
 @router.get("/orders/{order_id}/details")
 def read_order_details(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     order_id: int,
     current_user = Depends(get_current_staff_user),
 ) -> Any:
@@ -412,7 +427,7 @@ def update_order(
 @router.get("/summary/daily", response_model=OrderSummary)
 def get_daily_summary(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     target_date: Optional[date] = Query(None, description="Date to get summary for (default: today)"),
     current_user = Depends(get_current_staff_user),
 ) -> Any:
@@ -424,18 +439,40 @@ def get_daily_summary(
 @router.get("/dashboard/stats", response_model=DashboardStats)
 def get_dashboard_stats(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_staff_user),
 ) -> Any:
     """
     Get comprehensive dashboard statistics (Staff+ only).
+    Served from a short-lived snapshot; supports If-None-Match.
     """
-    stats = order_crud.get_dashboard_stats(db)
-    return stats
+    snapshot = dashboard_cache.get_or_compute(
+        "dashboard_stats", lambda: order_crud.get_dashboard_stats(db)
+    )
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+    response.headers["ETag"] = snapshot.etag
+    return {**snapshot.value, "generated_at": snapshot.generated_at}
+@router.post("/dashboard/counters/reconcile")
+def reconcile_dashboard_counters(
+    *,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_manager_user),
+) -> Any:
+    """
+    Recompute the dashboard counters from the base tables (Manager+ only).
+    Returns the corrections that were applied.
+    """
+    drift = counter_crud.reconcile(db)
+    if drift:
+        dashboard_cache.invalidate()
+    return {"corrected": len(drift), "drift": drift}
 @router.get("/analytics/bestsellers")
 def get_bestseller_dishes(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     limit: int = Query(10, description="Number of bestseller dishes to return"),
     days: int = Query(30, description="Number of days to analyze"),
     current_user = Depends(get_current_user_optional),
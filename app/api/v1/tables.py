@@ -1,17 +1,22 @@
-from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any, List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, date
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta, date, time as dt_time
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db, get_async_db
 from app.crud.table import table as table_crud
 from app.crud.order import reservation as reservation_crud
 from app.schemas.table import Table, TableCreate, TableUpdate, TableStatusUpdate
 from app.schemas.order import ReservationCreate, ReservationWithDetails
 from app.models.table import TableStatus
-from app.api.deps import get_current_staff_user, get_current_user_optional
+from app.api.deps import get_current_staff_user, get_current_manager_user, get_current_user_optional, get_table_cursor
+from app.core.pagination import next_cursor
+from app.services.dashboard_cache import dashboard_cache
+from app.services.reservation_index import reservation_index
+from app.services.floor_projection import floor_projection
 from app.core.business_hours import BusinessHours
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 router = APIRouter()
 
@@ -19,52 +24,54 @@ router = APIRouter()
 class TablesResponse(BaseModel):
     tables: List[Table]
     total: int
+    next_cursor: Optional[str] = None
 
 
 @router.get("/", response_model=TablesResponse)
 def read_tables(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     active_only: bool = Query(True, description="Filter only active tables"),
     status: Optional[TableStatus] = Query(None, description="Filter by status"),
     search: Optional[str] = Query(None, description="Search by table number or location"),
+    after = Depends(get_table_cursor),
     current_user = Depends(get_current_user_optional),
 ) -> Any:
     """
     Retrieve tables with pagination and search.
     """
-    tables = table_crud.get_multi(
+    tables, total = table_crud.get_page(
         db, skip=skip, limit=limit, 
         active_only=active_only, 
         status=status,
-        search=search
+        search=search,
+        after=after
     )
-    total = table_crud.count(
-        db, active_only=active_only, 
-        status=status,
-        search=search
+    return TablesResponse(
+        tables=tables,
+        total=total,
+        next_cursor=next_cursor(tables, limit, key=lambda t: (t.table_number, t.id))
     )
-    return TablesResponse(tables=tables, total=total)
 
 
 @router.get("/available", response_model=List[Table])
-def read_available_tables(
-    db: Session = Depends(get_db),
+async def read_available_tables(
+    db: AsyncSession = Depends(get_async_db),
     min_capacity: Optional[int] = Query(None, description="Minimum capacity required"),
     current_user = Depends(get_current_user_optional),
 ) -> Any:
     """
     Retrieve available tables.
     """
-    tables = table_crud.get_available_tables(db, min_capacity=min_capacity)
+    tables = await table_crud.get_available_tables_async(db, min_capacity=min_capacity)
     return tables
 
 
 @router.get("/by-status/{status}", response_model=List[Table])
 def read_tables_by_status(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     status: TableStatus,
     current_user = Depends(get_current_staff_user),
 ) -> Any:
@@ -75,6 +82,48 @@ def read_tables_by_status(
     return tables
 
 
+@router.get("/availability-calendar")
+def read_availability_calendar(
+    *,
+    db: Session = Depends(get_read_db),
+    start_date: date = Query(..., description="First day (YYYY-MM-DD)"),
+    days: int = Query(7, ge=1, le=31, description="Number of days"),
+    party_size: int = Query(..., ge=1, description="Number of guests"),
+    slot_minutes: int = Query(30, ge=15, le=60, description="Slot length in minutes"),
+    current_user = Depends(get_current_user_optional),
+) -> Any:
+    """
+    Free-capacity heatmap: for every day and slot, how many tables that seat
+    party_size are free (and their total seats).
+    """
+    from app.services.availability_calendar import create_availability_calendar
+
+    calendar = create_availability_calendar(db)
+    return calendar.build(start_date, days=days, party_size=party_size, slot_minutes=slot_minutes)
+
+
+@router.get("/floor")
+def read_floor(
+    *,
+    db: Session = Depends(get_read_db),
+    request: Request,
+    response: Response,
+    current_user = Depends(get_current_staff_user),
+) -> Any:
+    """
+    Floor plan state: every active table with its status, current or next
+    reservation and open orders (Staff+ only).
+    Served from the in-memory floor projection; supports If-None-Match.
+    """
+    if not floor_projection.loaded:
+        floor_projection.load(db)
+    snapshot = floor_projection.snapshot()
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+    response.headers["ETag"] = snapshot.etag
+    return {**snapshot.value, "timestamp": snapshot.generated_at.isoformat()}
+
+
 @router.post("/", response_model=Table)
 def create_table(
     *,
@@ -183,18 +232,78 @@ def delete_table(
     return table
 
 
+class SlotAvailability(BaseModel):
+    time: str
+    available_tables: int
+
+
 class AvailabilityResponse(BaseModel):
     available: bool
     suggested_times: Optional[List[str]] = None
     available_tables: List[Table]
+    slots: Optional[List[SlotAvailability]] = None
+
+
+def _closed_hours_response(reservation_datetime: datetime) -> Optional[AvailabilityResponse]:
+    """
+    Canned answer when the time is outside business hours or in the lunch break
+    (advance booking rule is skipped for availability checks)
+    """
+    weekday = reservation_datetime.weekday()
+    check_time = reservation_datetime.time()
+    
+    # Check if within business hours
+    business_hours = BusinessHours.BUSINESS_HOURS.get(weekday, [])
+    is_within_hours = False
+    
+    for start_time, end_time in business_hours:
+        if start_time <= check_time <= end_time:
+            is_within_hours = True
+            break
+    
+    if not is_within_hours:
+        suggested_times = ["10:00", "11:00", "12:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
+        return AvailabilityResponse(
+            available=False,
+            suggested_times=suggested_times,
+            available_tables=[]
+        )
+    
+    # Check lunch break
+    lunch_break = BusinessHours.LUNCH_BREAK.get(weekday)
+    if lunch_break:
+        break_start, break_end = lunch_break
+        if break_start <= check_time <= break_end:
+            suggested_times = ["10:00", "10:30", "11:00", "11:30", "12:00", "12:30", "13:00", "13:30", 
+                             "17:00", "17:30", "18:00", "18:30", "19:00", "19:30", "20:00", "20:30", "21:00", "21:30"]
+            return AvailabilityResponse(
+                available=False,
+                suggested_times=suggested_times,
+                available_tables=[]
+            )
+    return None
+
+
+def _rank_suggestions(slot_counts: dict, reservation_datetime: datetime) -> Tuple[List[str], List[SlotAvailability]]:
+    """Per-slot counts plus the four free slots closest to the requested time"""
+    slots = [
+        SlotAvailability(time=slot.strftime("%H:%M"), available_tables=count)
+        for slot, count in slot_counts.items()
+    ]
+    free_slots = sorted(
+        (slot for slot, count in slot_counts.items() if count > 0),
+        key=lambda slot: (abs(slot - reservation_datetime), slot)
+    )
+    return [slot.strftime("%H:%M") for slot in free_slots[:4]], slots
 
 
 @router.get("/check-availability", response_model=AvailabilityResponse)
-def check_table_availability(
+async def check_table_availability(
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
     time: str = Query(..., description="Time in HH:MM format"), 
     guests: int = Query(..., description="Number of guests"),
-    db: Session = Depends(get_db),
+    slot_minutes: int = Query(30, ge=15, le=60, description="Suggestion granularity in minutes"),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user_optional),
 ) -> Any:
     """
@@ -206,98 +315,136 @@ def check_table_availability(
         time_obj = datetime.strptime(time, "%H:%M").time()
         reservation_datetime = datetime.combine(date_obj, time_obj)
         
-        # Basic validation - check business hours only (skip advance booking rule for availability check)
-        weekday = reservation_datetime.weekday()
-        check_time = reservation_datetime.time()
-        
-        # Check if within business hours
-        from app.core.business_hours import BusinessHours
-        business_hours = BusinessHours.BUSINESS_HOURS.get(weekday, [])
-        is_within_hours = False
-        
-        for start_time, end_time in business_hours:
-            if start_time <= check_time <= end_time:
-                is_within_hours = True
-                break
-        
-        if not is_within_hours:
-            suggested_times = ["10:00", "11:00", "12:00", "17:00", "18:00", "19:00", "20:00", "21:00"]
-            return AvailabilityResponse(
-                available=False,
-                suggested_times=suggested_times,
-                available_tables=[]
-            )
-        
-        # Check lunch break
-        lunch_break = BusinessHours.LUNCH_BREAK.get(weekday)
-        if lunch_break:
-            break_start, break_end = lunch_break
-            if break_start <= check_time <= break_end:
-                suggested_times = ["10:00", "10:30", "11:00", "11:30", "12:00", "12:30", "13:00", "13:30", 
-                                 "17:00", "17:30", "18:00", "18:30", "19:00", "19:30", "20:00", "20:30", "21:00", "21:30"]
-                return AvailabilityResponse(
-                    available=False,
-                    suggested_times=suggested_times,
-                    available_tables=[]
-                )
+        closed = _closed_hours_response(reservation_datetime)
+        if closed:
+            return closed
         
         # Get available tables for the requested time
-        available_tables = table_crud.get_available_tables(
+        available_tables = await table_crud.get_available_tables_async(
             db, 
             min_capacity=guests,
-            reservation_datetime=reservation_datetime,
-            duration_hours=2
+            reservation_datetime=reservation_datetime
         )
         
         # If no tables available, suggest alternative times
         suggested_times = []
+        slots = None
         if not available_tables:
-            # Check availability for nearby time slots
-            for offset_hours in [1, -1, 2, -2]:
-                alt_datetime = reservation_datetime + timedelta(hours=offset_hours)
-                is_valid_alt, _ = BusinessHours.validate_reservation_time(alt_datetime)
-                if is_valid_alt:
-                    alt_tables = table_crud.get_available_tables(
-                        db, 
-                        min_capacity=guests,
-                        reservation_datetime=alt_datetime,
-                        duration_hours=2
-                    )
-                    if alt_tables:
-                        suggested_times.append(alt_datetime.strftime("%H:%M"))
-                        if len(suggested_times) >= 4:  # Limit suggestions
-                            break
+            # Availability of every bookable slot of the day in a single query
+            slot_counts = await table_crud.get_slot_availability_async(
+                db,
+                BusinessHours.reservation_slots(date_obj, slot_minutes),
+                min_capacity=guests
+            )
+            # Closest free slots to the requested time first
+            suggested_times, slots = _rank_suggestions(slot_counts, reservation_datetime)
         
         return AvailabilityResponse(
             available=bool(available_tables),
             suggested_times=suggested_times,
-            available_tables=available_tables
+            available_tables=available_tables,
+            slots=slots
         )
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid date or time format: {str(e)}")
 
 
+class AvailabilityQuery(BaseModel):
+    date: date
+    time: dt_time
+    guests: int = Field(..., ge=1)
+
+
+class BulkAvailabilityRequest(BaseModel):
+    queries: List[AvailabilityQuery] = Field(..., min_items=1, max_items=50)
+    slot_minutes: int = Field(30, ge=15, le=60)
+
+
+class BulkAvailabilityResponse(BaseModel):
+    results: List[AvailabilityResponse]
+
+
+@router.post("/check-availability/bulk", response_model=BulkAvailabilityResponse)
+async def check_table_availability_bulk(
+    request_in: BulkAvailabilityRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_optional),
+) -> Any:
+    """
+    Answer many (date, time, guests) availability questions at once.
+    All items share one table query and one reservation scan; results are in request order.
+    """
+    from app.services.bulk_availability import load_availability_scan
+
+    requested = [datetime.combine(q.date, q.time) for q in request_in.queries]
+    days = sorted({q.date for q in request_in.queries})
+    scan = await load_availability_scan(
+        db,
+        datetime.combine(days[0], dt_time.min),
+        datetime.combine(days[-1], dt_time.max)
+    )
+
+    results = []
+    for query, reservation_datetime in zip(request_in.queries, requested):
+        closed = _closed_hours_response(reservation_datetime)
+        if closed:
+            results.append(closed)
+            continue
+        available_tables = scan.free_tables(reservation_datetime, query.guests)
+        suggested_times, slots = [], None
+        if not available_tables:
+            slot_counts = scan.free_counts(
+                BusinessHours.reservation_slots(query.date, request_in.slot_minutes), query.guests
+            )
+            suggested_times, slots = _rank_suggestions(slot_counts, reservation_datetime)
+        results.append(AvailabilityResponse(
+            available=bool(available_tables),
+            suggested_times=suggested_times,
+            available_tables=available_tables,
+            slots=slots
+        ))
+    return BulkAvailabilityResponse(results=results)
+
+
 @router.post("/book", response_model=ReservationWithDetails)
 def book_table(
     *,
     db: Session = Depends(get_db),
     reservation_in: ReservationCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=100),
     current_user = Depends(get_current_user_optional),
 ) -> Any:
     """
     Book a table for a customer.
+    Retries carrying the same Idempotency-Key return the original reservation.
     """
     # If user is authenticated, use their ID
     if current_user:
         reservation_in.customer_id = current_user.id
     
+    # A retried request returns the reservation its first attempt created
+    from app.services.booking import (
+        create_booking_service, BookingConflict, IdempotencyKeyReused, IdempotencyKeyExpired
+    )
+    booking_service = create_booking_service(db)
+    if idempotency_key:
+        try:
+            existing = booking_service.replay(idempotency_key, reservation_in.customer_id)
+        except IdempotencyKeyReused:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for another booking")
+        except IdempotencyKeyExpired:
+            raise HTTPException(status_code=422, detail="Idempotency-Key belongs to a reservation that is no longer active")
+        if existing:
+            return reservation_crud.get_with_details(db, reservation_id=existing.id)
+    
     # Validate business hours
     is_valid, error_message = BusinessHours.validate_reservation_time(reservation_in.reservation_date)
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_message)
     
     # Check if table exists and has sufficient capacity
+    table_ids = [reservation_in.table_id]
     if reservation_in.table_id:
         table = table_crud.get(db, id=reservation_in.table_id)
         if not table:
@@ -313,8 +460,7 @@ def book_table(
         available_tables = table_crud.get_available_tables(
             db, 
             min_capacity=reservation_in.party_size,
-            reservation_datetime=reservation_in.reservation_date,
-            duration_hours=2
+            reservation_datetime=reservation_in.reservation_date
         )
         
         if not available_tables:
@@ -323,29 +469,32 @@ def book_table(
                 detail="No available tables for the requested time and party size"
             )
         
-        # Assign the best fitting table (smallest capacity that fits)
-        best_table = min(available_tables, key=lambda t: t.capacity)
-        reservation_in.table_id = best_table.id
-    
-    # Check for conflicting reservations
-    start_time = reservation_in.reservation_date
-    end_time = datetime.combine(
-        start_time.date(), 
-        (datetime.combine(date.today(), start_time.time()) + timedelta(hours=2)).time()
-    )
-    
-    conflicting_reservations = reservation_crud.get_by_date_range(
-        db, start_date=start_time, end_date=end_time, table_id=reservation_in.table_id
-    )
+        # Assign the table that keeps the most capacity open for the rest of the day
+        from app.services.table_assignment import create_table_assigner
+        best_table = create_table_assigner(db).assign(
+            available_tables,
+            party_size=reservation_in.party_size,
+            reservation_datetime=reservation_in.reservation_date
+        )
+        # If a concurrent booking takes the chosen table, fall through to the others
+        table_ids = [best_table.id] + [
+            t.id for t in sorted(available_tables, key=lambda t: (t.capacity, t.id)) if t.id != best_table.id
+        ]
     
-    if conflicting_reservations:
+    # Conflict check and insert run atomically under a per-table lock
+    try:
+        reservation, _ = booking_service.book(
+            reservation_in, table_ids, idempotency_key=idempotency_key
+        )
+    except BookingConflict:
         raise HTTPException(
             status_code=409,
             detail="Table is already reserved for this time slot"
         )
-    
-    # Create reservation
-    reservation = reservation_crud.create(db, obj_in=reservation_in)
+    except IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for another booking")
+    except IdempotencyKeyExpired:
+        raise HTTPException(status_code=422, detail="Idempotency-Key belongs to a reservation that is no longer active")
     
     # Get full details for the created reservation
     reservation_details = reservation_crud.get_with_details(db, reservation_id=reservation.id)
@@ -457,21 +606,45 @@ def sync_all_table_statuses(
     return updated_tables
 
 
+@router.post("/availability-index/verify")
+def verify_availability_index(
+    *,
+    db: Session = Depends(get_db),
+    rebuild: bool = Query(True, description="Reload the index when it disagrees with the database"),
+    current_user = Depends(get_current_manager_user),
+) -> Any:
+    """
+    Compare the in-memory reservation index with the database (Manager+ only)
+    """
+    report = reservation_index.verify(db)
+    if not report["consistent"] and rebuild:
+        report["reloaded"] = reservation_index.load(db)
+    return report
+
+
 @router.get("/status-summary")
 def get_table_status_summary(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_user_optional),
 ) -> Any:
     """
     Get table status summary for dashboard
+    Served from a short-lived snapshot; supports If-None-Match.
     """
     from app.services.table_status_manager import create_table_status_manager
     
     status_manager = create_table_status_manager(db)
-    summary = status_manager.get_table_status_summary()
+    snapshot = dashboard_cache.get_or_compute(
+        "table_status_summary", status_manager.get_table_status_summary
+    )
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+    response.headers["ETag"] = snapshot.etag
     
     return {
-        "status_summary": summary,
-        "timestamp": datetime.utcnow().isoformat()
+        "status_summary": snapshot.value,
+        "timestamp": snapshot.generated_at.isoformat()
     }
\ No newline at end of file
@@ -137,6 +137,19 @@ class BusinessHours:
         
         return True, "OK"
     
+    @classmethod
+    def reservation_slots(cls, day, step_minutes: int = 30) -> List[datetime]:
+        """All bookable start times on a day, every step_minutes"""
+        slots = []
+        for start_time, end_time in cls.BUSINESS_HOURS.get(day.weekday(), []):
+            slot = datetime.combine(day, start_time)
+            last = datetime.combine(day, end_time)
+            while slot <= last:
+                if cls.validate_reservation_time(slot)[0]:
+                    slots.append(slot)
+                slot += timedelta(minutes=step_minutes)
+        return slots
+    
     @classmethod
     def get_business_hours_text(cls) -> str:
         """Get formatted business hours text"""
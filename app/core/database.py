@@ -1,18 +1,310 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class PoolMetrics:
+    """Thread-safe gauges and counters describing connection pool usage"""
+
+    def __init__(self, max_overflow: int):
+        self.max_overflow = max_overflow
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.last_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_seconds += seconds
+            self.last_wait_seconds = seconds
+            if seconds > self.max_wait_seconds:
+                self.max_wait_seconds = seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_timeouts = 0
+            self.total_wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.last_wait_seconds = 0.0
+
+    def snapshot(self, pool: QueuePool) -> dict:
+        with self._lock:
+            avg_wait = self.total_wait_seconds / self.checkouts if self.checkouts else 0.0
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow_in_use": max(pool.overflow(), 0),
+                "max_overflow": self.max_overflow,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait_ms_last": round(self.last_wait_seconds * 1000, 3),
+                "checkout_wait_ms_avg": round(avg_wait * 1000, 3),
+                "checkout_wait_ms_max": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+pool_metrics = {
+    "primary": PoolMetrics(settings.DB_MAX_OVERFLOW),
+    "replica": PoolMetrics(settings.DB_REPLICA_MAX_OVERFLOW),
+}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    metrics_key = "primary"
+
+    def _do_get(self):
+        metrics = pool_metrics[self.metrics_key]
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        metrics.record_wait(time.perf_counter() - start)
+        return conn
+
+
+class ReplicaQueuePool(InstrumentedQueuePool):
+    """Instrumented pool for the read replica, reported under its own key"""
+
+    metrics_key = "replica"
+
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+)
+
+replica_engine = create_engine(
+    settings.DATABASE_REPLICA_URL,
+    poolclass=ReplicaQueuePool,
+    pool_size=settings.DB_REPLICA_POOL_SIZE,
+    max_overflow=settings.DB_REPLICA_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+) if settings.DATABASE_REPLICA_URL else None
+
+
+class ReadYourWritesTracker:
+    """Remembers clients that wrote recently so their reads stay on the primary"""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._pinned_until = {}
+
+    def pin(self, client_key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._pinned_until[client_key] = now + self.window_seconds
+            if len(self._pinned_until) > 10000:
+                self._pinned_until = {
+                    key: until for key, until in self._pinned_until.items() if until > now
+                }
+
+    def is_pinned(self, client_key: Optional[str]) -> bool:
+        if not client_key:
+            return False
+        with self._lock:
+            until = self._pinned_until.get(client_key)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._pinned_until[client_key]
+                return False
+            return True
+
+
+read_your_writes = ReadYourWritesTracker(settings.DB_READ_YOUR_WRITES_SECONDS)
+
+
+class RoutingSession(Session):
+    """Session that sends read-only work to the replica and everything else to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if replica_engine is not None and self.info.get("use_replica") and not self._flushing:
+            return replica_engine
+        return engine
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_client_after_write(session):
+    client_key = session.info.get("client_key")
+    if client_key and not session.info.get("use_replica"):
+        read_your_writes.pin(client_key)
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for read-heavy endpoints that should not hold a threadpool slot
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_size=settings.DB_ASYNC_POOL_SIZE,
+    max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+)
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency to get DB session"""
+def _client_key(request: Optional[Request]) -> Optional[str]:
+    """Identify the caller for read-your-writes pinning (token, else client address)"""
+    if request is None:
+        return None
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return authorization
+    return request.client.host if request.client else None
+
+
+def get_db(request: Request = None):
+    """Dependency to get DB session (primary)"""
     db = SessionLocal()
+    db.info["client_key"] = _client_key(request)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(request: Request = None):
+    """Dependency to get a read-only DB session, routed to the replica when configured"""
+    db = SessionLocal()
+    client_key = _client_key(request)
+    db.info["client_key"] = client_key
+    db.info["use_replica"] = not read_your_writes.is_pinned(client_key)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Dependency to get async DB session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_pool_stats() -> dict:
+    """Current connection pool gauges for monitoring, per instrumented engine"""
+    return {
+        "primary": pool_metrics["primary"].snapshot(engine.pool),
+        "replica": pool_metrics["replica"].snapshot(replica_engine.pool) if replica_engine is not None else None,
+    }
+
+
+def benchmark(workers: Optional[int] = None, checkouts_per_worker: int = 20, hold_seconds: float = 0.05) -> dict:
+    """
+    Saturate the primary pool: `workers` threads (default pool_size + max_overflow
+    + 10, so some must queue) each check out a connection, hold it for
+    hold_seconds in pg_sleep and return it. Reports the checkout waits and
+    timeouts recorded by the pool, as served from /health/db-pool.
+    """
+    workers = workers or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW + 10
+
+    def hold_connection(_):
+        for _ in range(checkouts_per_worker):
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": hold_seconds})
+            except exc.TimeoutError:
+                pass  # counted by the pool as a checkout timeout
+
+    pool_metrics["primary"].reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(hold_connection, range(workers)))
+    elapsed = time.perf_counter() - started
+    stats = get_pool_stats()["primary"]
+    return {
+        "workers": workers,
+        "pool_capacity": settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+        "elapsed_s": round(elapsed, 2),
+        "checkouts_per_second": round(stats["checkouts"] / elapsed, 1),
+        **stats
+    }
+
+
+def read_your_writes_check(window_seconds: float = 0.5) -> dict:
+    """
+    Routing check for one client (same bearer token): after it commits through
+    get_db, its get_read_db sessions must bind to the primary until the
+    read-your-writes window ends, and to the replica afterwards. Needs no
+    database (a commit with no work never connects); uses a short window.
+    """
+    from starlette.requests import Request
+
+    request = Request({
+        "type": "http",
+        "headers": [(b"authorization", b"Bearer read-your-writes-check")],
+        "client": ("127.0.0.1", 0)
+    })
+
+    def read_route() -> dict:
+        dependency = get_read_db(request)
+        db = next(dependency)
+        try:
+            return {
+                "use_replica": db.info["use_replica"],
+                "bind": "replica" if db.get_bind() is replica_engine else "primary"
+            }
+        finally:
+            dependency.close()
+
+    saved_window = read_your_writes.window_seconds
+    read_your_writes.window_seconds = window_seconds
+    try:
+        write = get_db(request)
+        db = next(write)
+        db.commit()  # fires the after_commit pin
+        write.close()
+        within = read_route()
+        time.sleep(window_seconds + 0.1)
+        after = read_route()
+    finally:
+        read_your_writes.window_seconds = saved_window
+
+    expected_after = "replica" if replica_engine is not None else "primary"
+    return {
+        "replica_configured": replica_engine is not None,
+        "within_window": within,
+        "after_window": after,
+        "passed": (
+            within == {"use_replica": False, "bind": "primary"}
+            and after == {"use_replica": True, "bind": expected_after}
+        )
+    }
+
+
+if __name__ == "__main__":
+    print("Read-your-writes routing:", read_your_writes_check())
+    print("Pool saturation:", benchmark())
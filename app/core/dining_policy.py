@@ -0,0 +1,39 @@
+"""
+Dining duration policy for RestoBot
+How long a reservation holds its table, by party size and time of day
+"""
+from datetime import datetime, time, timedelta
+from app.core.config import settings
+from app.core.time_window import wall_clock
+
+
+def _wall_clock(moment: datetime) -> time:
+    """
+    Time of day of a reservation start. Schedule values are wall-clock (see
+    time_window): a value loaded from the DB is 19:00+00 for a 19:00 booking,
+    so the label is dropped, never converted to the restaurant timezone.
+    """
+    return wall_clock(moment).time()
+
+
+def dining_duration(party_size: int, start: datetime) -> timedelta:
+    """Table hold for a party starting at `start`"""
+    minutes = settings.RESERVATION_DURATION_HOURS * 60
+    if party_size and party_size >= settings.DINING_LARGE_PARTY_SIZE:
+        minutes += settings.DINING_LARGE_PARTY_EXTRA_MINUTES
+    if _wall_clock(start) >= settings.DINING_DINNER_FROM:
+        minutes += settings.DINING_DINNER_EXTRA_MINUTES
+    return timedelta(minutes=minutes)
+
+
+def estimated_end_time(party_size: int, start: datetime) -> datetime:
+    return start + dining_duration(party_size, start)
+
+
+def max_dining_duration() -> timedelta:
+    """Longest hold the policy can give (large party at dinner); bounds overlap scans"""
+    return timedelta(minutes=(
+        settings.RESERVATION_DURATION_HOURS * 60
+        + settings.DINING_LARGE_PARTY_EXTRA_MINUTES
+        + settings.DINING_DINNER_EXTRA_MINUTES
+    ))
@@ -0,0 +1,165 @@
+"""
+Pagination helpers for RestoBot
+Keyset cursors (an opaque, URL-safe encoding of the sort key of the last row on a page)
+and single-statement page totals
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from sqlalchemy import func, text, tuple_
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if hasattr(value, "value"):  # enums
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row into an opaque cursor"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Any, ...]]:
+    """Decode a cursor back into its sort key; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or not values:
+            raise ValueError("Invalid cursor")
+        return tuple(_decode_value(v) for v in values)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def coerce_cursor(columns: Sequence[Any], values: Optional[Sequence[Any]]) -> Optional[Tuple[Any, ...]]:
+    """
+    Check a decoded cursor against the sort columns' types so a forged or stale
+    cursor fails as "Invalid cursor" instead of reaching the database.
+    Ints are accepted for float columns; raises ValueError on any other mismatch.
+    """
+    if values is None:
+        return None
+    if len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    coerced = []
+    for column, value in zip(columns, values):
+        expected = column.type.python_type
+        if isinstance(value, bool) and expected is not bool:
+            raise ValueError("Invalid cursor")
+        if expected is float and isinstance(value, int):
+            value = float(value)
+        if value is None or not isinstance(value, expected):
+            raise ValueError("Invalid cursor")
+        coerced.append(value)
+    return tuple(coerced)
+
+
+def keyset_filter(columns: Sequence[Any], after: Sequence[Any], descending: bool = False):
+    """Rows strictly after the given sort key, e.g. (created_at, id) < (:t, :id)"""
+    after = coerce_cursor(columns, after)
+    if descending:
+        return tuple_(*columns) < tuple_(*after)
+    return tuple_(*columns) > tuple_(*after)
+
+
+def next_cursor(items: Sequence[Any], limit: int, key) -> Optional[str]:
+    """Cursor for the page after `items`, or None when this is the last page"""
+    if limit <= 0 or len(items) < limit:
+        return None
+    return encode_cursor(key(items[-1]))
+
+
+def window_total():
+    """count(*) OVER () - total matching rows, returned alongside every row of the page"""
+    return func.count().over().label("total_count")
+
+
+def split_total(rows: Sequence[Any]) -> Tuple[List[Any], Optional[int]]:
+    """Strip the trailing window_total() column; total is None for an empty page"""
+    if not rows:
+        return [], None
+    total = rows[0][-1]
+    return [tuple(row)[:-1] for row in rows], total
+
+
+ESTIMATED_COUNT_SQL = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table_name AS regclass)"
+)
+
+
+def estimated_row_count(db, table_name: str) -> int:
+    """Planner's row estimate for a table (cheap, refreshed by ANALYZE/autovacuum)"""
+    estimate = db.execute(ESTIMATED_COUNT_SQL, {"table_name": table_name}).scalar()
+    return max(int(estimate or 0), 0)
+
+
+def benchmark(pages: int = 5000, limit: int = 50, runs: int = 5) -> dict:
+    """
+    Page 1 vs page `pages` of the orders listing by offset and by keyset cursor.
+    Seeds pages * limit synthetic orders in a transaction that is rolled back;
+    the SQL mirrors what CRUDOrder emits for (created_at, id) descending.
+    """
+    import statistics
+    import time
+    from app.core.database import engine
+
+    rows = pages * limit
+    offset_sql = text(
+        "SELECT id, created_at FROM orders ORDER BY created_at DESC, id DESC LIMIT :limit OFFSET :offset"
+    )
+    keyset_sql = text(
+        "SELECT id, created_at FROM orders WHERE (created_at, id) < (:created_at, :id) "
+        "ORDER BY created_at DESC, id DESC LIMIT :limit"
+    )
+
+    def timed(conn, statement, params) -> float:
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            conn.execute(statement, params).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(samples), 3)
+
+    report = {"rows_seeded": rows, "limit": limit}
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            conn.execute(text(
+                "INSERT INTO orders (order_number, status, payment_status, total_amount, tax_amount, "
+                "discount_amount, created_at) "
+                "SELECT 'PAGE-BENCH-' || g, 'completed', 'paid', 100, 0, 0, now() - g * interval '1 second' "
+                "FROM generate_series(1, :rows) AS g"
+            ), {"rows": rows})
+            conn.execute(text("ANALYZE orders"))
+            for page in (1, pages):
+                offset = (page - 1) * limit
+                entry = {"offset_ms": timed(conn, offset_sql, {"limit": limit, "offset": offset})}
+                if page == 1:
+                    entry["keyset_ms"] = entry["offset_ms"]  # no cursor on the first page
+                else:
+                    # Cursor = last row of the previous page, as next_cursor() would encode it
+                    last = conn.execute(offset_sql, {"limit": 1, "offset": offset - 1}).one()
+                    entry["keyset_ms"] = timed(conn, keyset_sql, {
+                        "created_at": last.created_at, "id": last.id, "limit": limit
+                    })
+                report[f"page_{page}"] = entry
+        finally:
+            transaction.rollback()
+    return report
+
+
+if __name__ == "__main__":
+    print("Pagination benchmark:", benchmark())
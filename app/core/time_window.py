@@ -0,0 +1,164 @@
+"""
+Time window helpers for RestoBot
+Build half-open [start, end) timestamp ranges so date filters can use btree indexes
+
+Two kinds of timestamps live in the database, and each has one convention:
+
+- Instants (created_at, updated_at, payment_date, actual_arrival_time) are
+  real moments in UTC; a naive value means UTC. Their calendar day is taken
+  in RESTAURANT_TIMEZONE: day_window, day_range_window, restaurant_date.
+- The reservation schedule (reservation_datetime, estimated_end_time and the
+  time_range built from them) holds restaurant wall-clock times, stored
+  UTC-labelled: a 19:00 booking is 19:00+00. A naive value is wall-clock.
+  These are never converted between timezones; their day is the stored date:
+  wall_clock, wall_clock_date, wall_clock_day_window, wall_clock_range_window.
+  "Now" for comparisons with them is wall_clock_now(), never utcnow().
+"""
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple, Optional
+import pytz
+from sqlalchemy import and_
+from app.core.config import settings
+
+
+def restaurant_timezone():
+    """Timezone the restaurant's calendar days are measured in"""
+    return pytz.timezone(settings.RESTAURANT_TIMEZONE)
+
+
+class TimeWindow(NamedTuple):
+    """Half-open timestamp range [start, end)"""
+    start: datetime
+    end: datetime
+
+    def filter(self, column):
+        """Sargable predicate: column >= start AND column < end"""
+        return and_(column >= self.start, column < self.end)
+
+
+def _local_midnight(day: date) -> datetime:
+    return restaurant_timezone().localize(datetime.combine(day, time.min))
+
+
+def day_window(day: date) -> TimeWindow:
+    """Whole calendar day in the restaurant's timezone"""
+    return TimeWindow(_local_midnight(day), _local_midnight(day + timedelta(days=1)))
+
+
+def day_range_window(start_day: date, end_day: date) -> TimeWindow:
+    """Calendar days start_day..end_day inclusive"""
+    return TimeWindow(_local_midnight(start_day), _local_midnight(end_day + timedelta(days=1)))
+
+
+def restaurant_today() -> date:
+    """Current date in the restaurant's timezone"""
+    return datetime.now(restaurant_timezone()).date()
+
+
+def restaurant_date(moment: datetime) -> date:
+    """Calendar date of an instant in the restaurant's timezone (naive = UTC)"""
+    if moment.tzinfo is None:
+        moment = pytz.utc.localize(moment)
+    return moment.astimezone(restaurant_timezone()).date()
+
+
+def naive_utc(moment: datetime) -> datetime:
+    """Drop tzinfo after converting to UTC so aware DB values and naive request values compare"""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def today_window() -> TimeWindow:
+    """Today in the restaurant's timezone"""
+    return day_window(restaurant_today())
+
+
+# Reservation schedule (wall-clock) values
+
+def wall_clock(moment: datetime) -> datetime:
+    """Naive wall-clock value of a schedule timestamp, as stored (a loaded value's UTC label is dropped)"""
+    return naive_utc(moment)
+
+
+def wall_clock_date(moment: datetime) -> date:
+    """Calendar date of a schedule timestamp: its stored date, no timezone shift"""
+    return wall_clock(moment).date()
+
+
+def wall_clock_now() -> datetime:
+    """
+    Current restaurant wall-clock time, UTC-labelled like the stored schedule
+    values: compare it with loaded values or bind it in SQL against schedule
+    columns; wall_clock(wall_clock_now()) is the naive form
+    """
+    return pytz.utc.localize(datetime.now(restaurant_timezone()).replace(tzinfo=None))
+
+
+def _wall_clock_midnight(day: date) -> datetime:
+    # UTC-labelled like the stored values, so the bounds don't depend on the session timezone
+    return pytz.utc.localize(datetime.combine(day, time.min))
+
+
+def wall_clock_day_window(day: date) -> TimeWindow:
+    """[day 00:00, day+1 00:00) for schedule columns such as Reservation.reservation_datetime"""
+    return TimeWindow(_wall_clock_midnight(day), _wall_clock_midnight(day + timedelta(days=1)))
+
+
+def wall_clock_range_window(start_day: date, end_day: date) -> TimeWindow:
+    """Schedule days start_day..end_day inclusive"""
+    return TimeWindow(_wall_clock_midnight(start_day), _wall_clock_midnight(end_day + timedelta(days=1)))
+
+
+def benchmark(rows: int = 200000, day: Optional[date] = None) -> dict:
+    """
+    Compare the plans of the old func.date() predicate and the half-open
+    window on orders.created_at. Seeds `rows` synthetic orders (one a minute,
+    going back from now) in a transaction that is rolled back, ANALYZEs, then
+    EXPLAIN ANALYZEs a count for `day` (default: yesterday) both ways.
+    """
+    from sqlalchemy import text
+    from app.core.database import engine
+
+    day = day or restaurant_today() - timedelta(days=1)
+    window = day_window(day)
+    # The SQL the ORM emits for each predicate
+    statements = {
+        "func_date": (text("SELECT count(*) FROM orders WHERE date(created_at) = :day"), {"day": day}),
+        "window": (
+            text("SELECT count(*) FROM orders WHERE created_at >= :start AND created_at < :end"),
+            {"start": window.start, "end": window.end}
+        ),
+    }
+
+    def walk(plan: dict) -> list:
+        nodes = [plan["Node Type"] + (f" using {plan['Index Name']}" if "Index Name" in plan else "")]
+        for child in plan.get("Plans", []):
+            nodes.extend(walk(child))
+        return nodes
+
+    report = {"rows_seeded": rows, "day": day}
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            conn.execute(text(
+                "INSERT INTO orders (order_number, status, payment_status, total_amount, tax_amount, "
+                "discount_amount, created_at) "
+                "SELECT 'PLAN-BENCH-' || g, 'completed', 'paid', 100, 0, 0, now() - g * interval '1 minute' "
+                "FROM generate_series(1, :rows) AS g"
+            ), {"rows": rows})
+            conn.execute(text("ANALYZE orders"))
+            for name, (statement, params) in statements.items():
+                plan = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {statement.text}"), params).scalar()[0]
+                report[name] = {
+                    "plan": walk(plan["Plan"]),
+                    "execution_ms": plan["Execution Time"],
+                    "count": conn.execute(statement, params).scalar()
+                }
+        finally:
+            transaction.rollback()
+    return report
+
+
+if __name__ == "__main__":
+    print("Plan benchmark:", benchmark())
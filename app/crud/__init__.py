@@ -3,10 +3,14 @@ from .user import user
 from .menu import category, menu_item
 from .table import table
 from .order import reservation, order, order_item
+from .counter import counter
+from .arrival_stats import arrival_stats
 
 __all__ = [
     "user",
     "category", "menu_item", 
     "table",
-    "reservation", "order", "order_item"
+    "reservation", "order", "order_item",
+    "counter",
+    "arrival_stats"
 ]
\ No newline at end of file
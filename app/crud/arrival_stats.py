@@ -0,0 +1,264 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, cast, extract, or_, Date, Float, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, Iterable, List, Optional
+from datetime import date, datetime, time, timedelta
+import logging
+import math
+from app.models.arrival_stats import ArrivalDailyStats
+from app.models.order import Reservation
+from app.core.time_window import restaurant_today, wall_clock, wall_clock_date, wall_clock_range_window
+
+logger = logging.getLogger(__name__)
+
+# Same values as CustomerArrivalTracker's ArrivalStatus
+ARRIVAL_STATUSES = ("early", "on_time", "late", "very_late")
+NO_SHOW = "no_show"
+
+# Lateness is histogrammed per minute, clamped to +/- this many minutes
+MINUTE_RANGE = 240
+
+# (label, lower bound exclusive, upper bound inclusive) in minutes late; None = open
+LATENESS_BUCKETS = (
+    ("< -15", None, -16),
+    ("-15..-6", -16, -6),
+    ("-5..5", -6, 5),
+    ("6..15", 5, 15),
+    ("16..30", 15, 30),
+    ("31..60", 30, 60),
+    ("> 60", 60, None),
+)
+
+
+def empty_day(day: date) -> dict:
+    return {
+        "day": day,
+        "total_arrivals": 0,
+        **{status: 0 for status in ARRIVAL_STATUSES},
+        NO_SHOW: 0,
+        "sum_difference_minutes": 0.0,
+        "minute_counts": {},
+        "hour_stats": {}
+    }
+
+
+def _percentile(minute_counts: Dict[int, int], total: int, fraction: float) -> Optional[int]:
+    """Nearest-rank percentile over a per-minute histogram"""
+    if not total:
+        return None
+    rank = max(1, math.ceil(fraction * total))
+    seen = 0
+    for minute in sorted(minute_counts):
+        seen += minute_counts[minute]
+        if seen >= rank:
+            return minute
+    return max(minute_counts)
+
+
+def _breakdown(arrivals: int, total_minutes: float, no_shows: int) -> dict:
+    return {
+        "arrivals": arrivals,
+        "no_shows": no_shows,
+        "average_difference_minutes": round(total_minutes / arrivals, 1) if arrivals else 0
+    }
+
+
+def summarize(days: Iterable[dict]) -> dict:
+    """Merge per-day rows (rollup or live) into the statistics payload"""
+    totals = empty_day(None)
+    minute_counts: Dict[int, int] = {}
+    by_weekday: Dict[int, List[float]] = {}
+    by_hour: Dict[int, List[float]] = {}
+    for day in days:
+        for key in ("total_arrivals", NO_SHOW, "sum_difference_minutes") + ARRIVAL_STATUSES:
+            totals[key] += day[key]
+        for minute, count in day["minute_counts"].items():
+            minute_counts[int(minute)] = minute_counts.get(int(minute), 0) + count
+        weekday = by_weekday.setdefault(day["day"].weekday(), [0, 0.0, 0])
+        weekday[0] += day["total_arrivals"]
+        weekday[1] += day["sum_difference_minutes"]
+        weekday[2] += day[NO_SHOW]
+        for hour, (arrivals, total_minutes, no_shows) in day["hour_stats"].items():
+            stats = by_hour.setdefault(int(hour), [0, 0.0, 0])
+            stats[0] += arrivals
+            stats[1] += total_minutes
+            stats[2] += no_shows
+
+    total = totals["total_arrivals"]
+    histogram = {}
+    for label, lower, upper in LATENESS_BUCKETS:
+        histogram[label] = sum(
+            count for minute, count in minute_counts.items()
+            if (lower is None or minute > lower) and (upper is None or minute <= upper)
+        )
+    return {
+        "total_arrivals": total,
+        "early": totals["early"],
+        "on_time": totals["on_time"],
+        "late": totals["late"],
+        "very_late": totals["very_late"],
+        "no_show": totals[NO_SHOW],
+        "average_difference_minutes": round(totals["sum_difference_minutes"] / total, 1) if total else 0,
+        "p50_difference_minutes": _percentile(minute_counts, total, 0.5),
+        "p90_difference_minutes": _percentile(minute_counts, total, 0.9),
+        "histogram": histogram,
+        "by_weekday": {weekday: _breakdown(*by_weekday[weekday]) for weekday in sorted(by_weekday)},
+        "by_hour": {hour: _breakdown(*by_hour[hour]) for hour in sorted(by_hour)}
+    }
+
+
+class CRUDArrivalStats:
+    def _day_rows(self, db: Session, *conditions) -> Dict[date, dict]:
+        """
+        Per-day aggregates computed in SQL: one row per (day, hour, clamped
+        minute, status), folded into day dicts here. Day and hour are those of
+        the stored wall-clock reservation time (see time_window), so the
+        timestamptz is read AT TIME ZONE 'UTC', never the restaurant timezone
+        """
+        local_time = func.timezone("UTC", Reservation.reservation_datetime)
+        exact_minutes = extract(
+            "epoch", Reservation.actual_arrival_time - Reservation.reservation_datetime
+        ) / 60
+        minute = func.greatest(
+            func.least(cast(func.floor(exact_minutes), Integer), MINUTE_RANGE), -MINUTE_RANGE
+        )
+        status = func.coalesce(Reservation.arrival_status, "on_time")
+        day_column = cast(local_time, Date).label("day")
+        hour_column = cast(extract("hour", local_time), Integer).label("hour")
+        rows = db.query(
+            day_column,
+            hour_column,
+            minute.label("minute"),
+            status.label("status"),
+            func.count().label("count"),
+            func.coalesce(func.sum(cast(exact_minutes, Float)), 0.0).label("total_minutes")
+        ).filter(
+            or_(Reservation.actual_arrival_time.isnot(None), Reservation.arrival_status == NO_SHOW),
+            *conditions
+        ).group_by(day_column, hour_column, minute, status).all()
+
+        days: Dict[date, dict] = {}
+        for row in rows:
+            day = days.setdefault(row.day, empty_day(row.day))
+            hour = day["hour_stats"].setdefault(str(row.hour), [0, 0.0, 0])
+            if row.status in ARRIVAL_STATUSES:
+                day[row.status] += row.count
+            elif row.status == NO_SHOW:
+                day[NO_SHOW] += row.count
+                hour[2] += row.count
+            # minute is NULL for swept no-shows, which never arrived
+            if row.minute is not None:
+                day["total_arrivals"] += row.count
+                day["sum_difference_minutes"] += float(row.total_minutes)
+                key = str(row.minute)
+                day["minute_counts"][key] = day["minute_counts"].get(key, 0) + row.count
+                hour[0] += row.count
+                hour[1] += float(row.total_minutes)
+        return days
+
+    def rolled_through(self, db: Session) -> Optional[date]:
+        """Last day covered by the rollup (every earlier day down to the first row has a row)"""
+        return db.query(func.max(ArrivalDailyStats.day)).scalar()
+
+    def refresh(self, db: Session, start_day: date, end_day: date) -> int:
+        """
+        Recompute the rollup for start_day..end_day inclusive; days without
+        arrivals get a zero row so coverage stays contiguous. Commits.
+        """
+        days = self._day_rows(db, wall_clock_range_window(start_day, end_day).filter(Reservation.reservation_datetime))
+        rows = []
+        day = start_day
+        while day <= end_day:
+            rows.append(days.get(day) or empty_day(day))
+            day += timedelta(days=1)
+        if rows:
+            stmt = pg_insert(ArrivalDailyStats).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ArrivalDailyStats.day],
+                set_={
+                    **{
+                        column: stmt.excluded[column]
+                        for column in ("total_arrivals", NO_SHOW, "sum_difference_minutes",
+                                       "minute_counts", "hour_stats") + ARRIVAL_STATUSES
+                    },
+                    "updated_at": func.now()
+                }
+            )
+            db.execute(stmt)
+        db.commit()
+        return len(rows)
+
+    def refresh_recent(self, db: Session, days_back: int = 3) -> int:
+        """
+        Roll up completed days: from the day after the current coverage (or the
+        first reservation) - but at least the last days_back days, which late
+        arrivals and no-show sweeps can still change - through yesterday
+        """
+        end_day = restaurant_today() - timedelta(days=1)
+        covered = self.rolled_through(db)
+        if covered is None:
+            first = db.query(func.min(Reservation.reservation_datetime)).scalar()
+            if first is None:
+                return 0
+            start_day = wall_clock_date(first)
+        else:
+            start_day = min(covered + timedelta(days=1), end_day - timedelta(days=days_back - 1))
+        if start_day > end_day:
+            return 0
+        count = self.refresh(db, start_day, end_day)
+        logger.info(f"Arrival rollup refreshed for {start_day}..{end_day}")
+        return count
+
+    def rebuild(self, db: Session) -> int:
+        """Drop the rollup and recompute every completed day (after a bucketing change). Commits."""
+        db.query(ArrivalDailyStats).delete(synchronize_session=False)
+        first = db.query(func.min(Reservation.reservation_datetime)).scalar()
+        end_day = restaurant_today() - timedelta(days=1)
+        if first is None or wall_clock_date(first) > end_day:
+            db.commit()
+            return 0
+        return self.refresh(db, wall_clock_date(first), end_day)
+
+    def get_statistics(
+        self, db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None
+    ) -> dict:
+        """
+        Statistics for reservations in [start_date, end_date]: whole days the
+        rollup covers are read from it (one row per day), the rest - partial
+        edge days and anything newer than the rollup, such as today - is
+        aggregated live
+        """
+        covered = self.rolled_through(db)
+        first_full = None
+        if start_date:
+            # Bounds are schedule (wall-clock) values, like reservation_datetime
+            first_full = wall_clock_date(start_date)
+            if wall_clock(start_date) > datetime.combine(first_full, time.min):
+                first_full += timedelta(days=1)
+        last_full = covered
+        if end_date and covered is not None:
+            last_full = min(covered, wall_clock_date(end_date) - timedelta(days=1))
+
+        days: List[dict] = []
+        live_conditions = []
+        if start_date:
+            live_conditions.append(Reservation.reservation_datetime >= start_date)
+        if end_date:
+            live_conditions.append(Reservation.reservation_datetime <= end_date)
+        if last_full is not None and (first_full is None or first_full <= last_full):
+            query = db.query(ArrivalDailyStats).filter(ArrivalDailyStats.day <= last_full)
+            if first_full:
+                query = query.filter(ArrivalDailyStats.day >= first_full)
+            days.extend(
+                {column: getattr(row, column) for column in empty_day(None)} for row in query.all()
+            )
+            rolled_up = wall_clock_range_window(first_full or last_full, last_full)
+            outside = [Reservation.reservation_datetime >= rolled_up.end]
+            if first_full:
+                outside.append(Reservation.reservation_datetime < rolled_up.start)
+            live_conditions.append(or_(*outside))
+        days.extend(self._day_rows(db, *live_conditions).values())
+        return summarize(days)
+
+
+arrival_stats = CRUDArrivalStats()
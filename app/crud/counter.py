@@ -0,0 +1,144 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, Optional
+from datetime import date
+import logging
+from app.models.counter import DashboardCounter
+from app.models.order import Order, Reservation, OrderStatus
+from app.models.table import Table
+from app.core.time_window import restaurant_date
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+ORDERS_TOTAL = "orders:total"
+RESERVATIONS_TOTAL = "reservations:total"
+TABLES_TOTAL = "tables:total"
+
+
+def order_status_key(status) -> str:
+    return f"orders:status:{getattr(status, 'value', status)}"
+
+
+def reservation_status_key(status) -> str:
+    return f"reservations:status:{getattr(status, 'value', status)}"
+
+
+def table_status_key(status) -> str:
+    return f"tables:status:{getattr(status, 'value', status)}"
+
+
+def revenue_key(day: date) -> str:
+    return f"orders:revenue:{day.isoformat()}"
+
+
+def transition(old_key: Optional[str], new_key: Optional[str], count: int = 1) -> Dict[str, float]:
+    """Deltas for moving `count` rows from one status bucket to another"""
+    if old_key == new_key:
+        return {}
+    deltas = {}
+    if old_key:
+        deltas[old_key] = -count
+    if new_key:
+        deltas[new_key] = deltas.get(new_key, 0) + count
+    return deltas
+
+
+def order_revenue(order: Order) -> Dict[str, float]:
+    """Revenue contribution of an order (completed orders count on their creation day)"""
+    if order.status != OrderStatus.completed or not order.created_at:
+        return {}
+    return {revenue_key(restaurant_date(order.created_at)): float(order.total_amount or 0)}
+
+
+def merge(*deltas: Dict[str, float]) -> Dict[str, float]:
+    merged: Dict[str, float] = {}
+    for delta in deltas:
+        for key, value in delta.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def subtract(after: Dict[str, float], before: Dict[str, float]) -> Dict[str, float]:
+    return merge(after, {key: -value for key, value in before.items()})
+
+
+class CRUDCounter:
+    def bump(self, db: Session, deltas: Dict[str, float]) -> None:
+        """
+        Add deltas to counters inside the caller's transaction (commit is left to the caller)
+        """
+        rows = [{"key": key, "value": value} for key, value in sorted(deltas.items()) if value]
+        if not rows:
+            return
+        stmt = pg_insert(DashboardCounter).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DashboardCounter.key],
+            set_={"value": DashboardCounter.value + stmt.excluded.value, "updated_at": func.now()}
+        )
+        db.execute(stmt)
+
+    def get_all(self, db: Session) -> Dict[str, float]:
+        return {key: value for key, value in db.query(DashboardCounter.key, DashboardCounter.value)}
+
+    def derive(self, db: Session) -> Dict[str, float]:
+        """Recompute every counter from the base tables (full scans - reconciliation only)"""
+        expected: Dict[str, float] = {}
+        for status, count in db.query(Order.status, func.count(Order.id)).group_by(Order.status):
+            expected[order_status_key(status)] = count
+        expected[ORDERS_TOTAL] = sum(
+            value for key, value in expected.items() if key.startswith("orders:status:")
+        )
+        local_day = func.date(func.timezone(settings.RESTAURANT_TIMEZONE, Order.created_at))
+        revenue = db.query(local_day, func.sum(Order.total_amount))\
+            .filter(Order.status == OrderStatus.completed, Order.created_at.isnot(None))\
+            .group_by(local_day)
+        for day, amount in revenue:
+            expected[revenue_key(day)] = float(amount or 0)
+
+        for status, count in db.query(Reservation.status, func.count(Reservation.id)).group_by(Reservation.status):
+            expected[reservation_status_key(status)] = count
+        expected[RESERVATIONS_TOTAL] = sum(
+            value for key, value in expected.items() if key.startswith("reservations:status:")
+        )
+
+        for status, count in db.query(Table.status, func.count(Table.id)).group_by(Table.status):
+            expected[table_status_key(status)] = count
+        expected[TABLES_TOTAL] = sum(
+            value for key, value in expected.items() if key.startswith("tables:status:")
+        )
+        return expected
+
+    def reconcile(self, db: Session) -> Dict[str, float]:
+        """
+        Re-derive all counters, overwrite the stored values and return the drift
+        (expected - stored) for every counter that was wrong
+        """
+        # Lock the counters so concurrent bumps wait for the rewrite
+        stored = {
+            row.key: row.value
+            for row in db.query(DashboardCounter).with_for_update()
+        }
+        expected = self.derive(db)
+        drift = {}
+        for key in set(stored) | set(expected):
+            difference = expected.get(key, 0) - stored.get(key, 0)
+            if abs(difference) > 1e-6:
+                drift[key] = difference
+
+        if drift:
+            rows = [{"key": key, "value": expected.get(key, 0)} for key in sorted(drift)]
+            stmt = pg_insert(DashboardCounter).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DashboardCounter.key],
+                set_={"value": stmt.excluded.value, "updated_at": func.now()}
+            )
+            db.execute(stmt)
+            logger.warning(f"Dashboard counters drifted, corrected {len(drift)} keys: {drift}")
+        db.commit()
+        return drift
+
+
+counter = CRUDCounter()
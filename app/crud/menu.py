@@ -1,5 +1,8 @@
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Tuple
+from app.core.pagination import keyset_filter, window_total, split_total
 from app.models.menu import Category, MenuItem
 from app.schemas.menu import CategoryCreate, CategoryUpdate, MenuItemCreate, MenuItemUpdate
 
@@ -40,6 +43,21 @@ class CRUDCategory:
             query = query.filter(Category.name.ilike(f"%{search}%"))
         return query.count()
 
+    def get_page_with_search(
+        self, db: Session, skip: int = 0, limit: int = 100, search: Optional[str] = None, active_only: bool = True
+    ) -> Tuple[List[Category], int]:
+        """Page of categories plus total count in one statement"""
+        query = db.query(Category, window_total())
+        if active_only:
+            query = query.filter(Category.is_active == True)
+        if search:
+            query = query.filter(Category.name.ilike(f"%{search}%"))
+        query = query.order_by(Category.name.asc())
+        rows, total = split_total(query.offset(skip).limit(limit).all())
+        if total is None:
+            total = self.count_with_search(db, search=search, active_only=active_only) if skip else 0
+        return [category for category, in rows], total
+
     def create(self, db: Session, obj_in: CategoryCreate) -> Category:
         db_obj = Category(
             name=obj_in.name,
@@ -77,18 +95,16 @@ class CRUDMenuItem:
     def get_by_name(self, db: Session, name: str) -> Optional[MenuItem]:
         return db.query(MenuItem).filter(MenuItem.name == name).first()
 
-    def get_multi(
-        self, 
-        db: Session, 
-        skip: int = 0, 
-        limit: int = 100,
+    def _apply_filters(
+        self,
+        query,
         available_only: bool = True,
         category_id: Optional[int] = None,
         search_term: Optional[str] = None,
         is_featured: Optional[bool] = None,
         is_available: Optional[bool] = None
-    ) -> List[MenuItem]:
-        query = db.query(MenuItem)
+    ):
+        """Apply list filters; works for both Query and select() statements"""
         if available_only:
             query = query.filter(MenuItem.is_available == True)
         if category_id:
@@ -99,8 +115,32 @@ class CRUDMenuItem:
             query = query.filter(MenuItem.is_featured == is_featured)
         if is_available is not None:
             query = query.filter(MenuItem.is_available == is_available)
-        query = query.order_by(MenuItem.name.asc())
-        return query.offset(skip).limit(limit).all()
+        return query
+
+    def _paginate(self, query, skip: int = 0, after: Optional[tuple] = None):
+        """Stable (name, id) ordering; keyset after the given key, else offset"""
+        if after:
+            query = query.filter(keyset_filter((MenuItem.name, MenuItem.id), after))
+        query = query.order_by(MenuItem.name.asc(), MenuItem.id.asc())
+        return query if after else query.offset(skip)
+
+    def get_multi(
+        self, 
+        db: Session, 
+        skip: int = 0, 
+        limit: int = 100,
+        available_only: bool = True,
+        category_id: Optional[int] = None,
+        search_term: Optional[str] = None,
+        is_featured: Optional[bool] = None,
+        is_available: Optional[bool] = None,
+        after: Optional[tuple] = None
+    ) -> List[MenuItem]:
+        query = self._apply_filters(
+            db.query(MenuItem), available_only, category_id, search_term, is_featured, is_available
+        )
+        query = self._paginate(query, skip, after)
+        return query.limit(limit).all()
 
     def get_count(
         self, 
@@ -111,19 +151,76 @@ class CRUDMenuItem:
         is_featured: Optional[bool] = None,
         is_available: Optional[bool] = None
     ) -> int:
-        query = db.query(MenuItem)
-        if available_only:
-            query = query.filter(MenuItem.is_available == True)
-        if category_id:
-            query = query.filter(MenuItem.category_id == category_id)
-        if search_term:
-            query = query.filter(MenuItem.name.ilike(f"%{search_term}%"))
-        if is_featured is not None:
-            query = query.filter(MenuItem.is_featured == is_featured)
-        if is_available is not None:
-            query = query.filter(MenuItem.is_available == is_available)
+        query = self._apply_filters(
+            db.query(MenuItem), available_only, category_id, search_term, is_featured, is_available
+        )
         return query.count()
 
+    async def get_multi_async(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        available_only: bool = True,
+        category_id: Optional[int] = None,
+        search_term: Optional[str] = None,
+        is_featured: Optional[bool] = None,
+        is_available: Optional[bool] = None,
+        after: Optional[tuple] = None
+    ) -> List[MenuItem]:
+        """Async variant of get_multi (category is eager-loaded, lazy loads are not possible)"""
+        stmt = self._apply_filters(
+            select(MenuItem), available_only, category_id, search_term, is_featured, is_available
+        )
+        stmt = self._paginate(stmt, skip, after)
+        stmt = stmt.options(selectinload(MenuItem.category)).limit(limit)
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    async def get_page_async(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        available_only: bool = True,
+        category_id: Optional[int] = None,
+        search_term: Optional[str] = None,
+        is_featured: Optional[bool] = None,
+        is_available: Optional[bool] = None,
+        after: Optional[tuple] = None
+    ) -> Tuple[List[MenuItem], int]:
+        """Page of menu items plus total count in one statement"""
+        filters = dict(
+            available_only=available_only, category_id=category_id, search_term=search_term,
+            is_featured=is_featured, is_available=is_available
+        )
+        if after:
+            # A window count would only cover rows past the cursor
+            items = await self.get_multi_async(db, limit=limit, after=after, **filters)
+            return items, await self.get_count_async(db, **filters)
+        stmt = self._apply_filters(select(MenuItem, window_total()), **filters)
+        stmt = self._paginate(stmt, skip).options(selectinload(MenuItem.category)).limit(limit)
+        result = await db.execute(stmt)
+        rows, total = split_total(result.all())
+        if total is None:
+            total = await self.get_count_async(db, **filters) if skip else 0
+        return [item for item, in rows], total
+
+    async def get_count_async(
+        self,
+        db: AsyncSession,
+        available_only: bool = True,
+        category_id: Optional[int] = None,
+        search_term: Optional[str] = None,
+        is_featured: Optional[bool] = None,
+        is_available: Optional[bool] = None
+    ) -> int:
+        stmt = self._apply_filters(
+            select(MenuItem.id), available_only, category_id, search_term, is_featured, is_available
+        )
+        result = await db.execute(select(func.count()).select_from(stmt.subquery()))
+        return result.scalar_one()
+
     def get_featured(self, db: Session) -> List[MenuItem]:
         return db.query(MenuItem).filter(
             MenuItem.is_featured == True,
@@ -1,16 +1,75 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from typing import Optional, List
+from sqlalchemy import func, and_, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Tuple
 from datetime import datetime, date
 from app.models.order import Order, OrderItem, Reservation, OrderStatus, PaymentStatus, ReservationStatus
 from app.models.menu import MenuItem
 from app.models.user import User, UserRole
 from app.models.table import Table, TableStatus
+from app.core.time_window import day_window, restaurant_today, wall_clock_day_window
+from app.core.pagination import keyset_filter, window_total, split_total, estimated_row_count
+from app.core.config import settings
+from app.services.dashboard_cache import dashboard_cache
+from app.services.reservation_index import reservation_index
+from app.services.floor_projection import floor_projection
+from app.services import event_stream
+from app.crud.counter import (
+    counter as counter_crud, ORDERS_TOTAL, RESERVATIONS_TOTAL, TABLES_TOTAL,
+    order_status_key, reservation_status_key, table_status_key, revenue_key,
+    order_revenue, transition, merge, subtract
+)
 from app.schemas.order import (
     OrderCreate, OrderUpdate, 
     ReservationCreate, ReservationUpdate, OrderSummary
 )
 import uuid
+
+
+RESERVATION_DETAIL_COLUMNS = (
+    Reservation,
+    User.full_name.label('customer_name'),
+    User.email.label('customer_email'),
+    User.phone.label('customer_phone'),
+    Table.table_number.label('table_number'),
+    Table.capacity.label('table_capacity'),
+    Table.location.label('table_location')
+)
+
+
+def _reservation_details_dict(row) -> dict:
+    """Convert a (Reservation, customer..., table...) row to the ReservationWithDetails shape"""
+    reservation, customer_name, customer_email, customer_phone, table_number, table_capacity, table_location = row
+    return {
+        "id": reservation.id,
+        "customer_id": reservation.customer_id,
+        "table_id": reservation.table_id,
+        "reservation_date": reservation.reservation_datetime,  # Map DB field to API field
+        "party_size": reservation.party_size,
+        "status": reservation.status,
+        "special_requests": reservation.special_requests,
+        "notes": reservation.notes,
+        "created_at": reservation.created_at,
+        "updated_at": reservation.updated_at,
+        # Customer details
+        "customer_name": customer_name,
+        "customer_email": customer_email,
+        "customer_phone": customer_phone,
+        # Table details
+        "table_number": table_number,
+        "table_capacity": table_capacity,
+        "table_location": table_location
+    }
+
+
+ORDER_DETAIL_COLUMNS = (
+    Order,
+    User.full_name.label('customer_name'),
+    User.email.label('customer_email'),
+    Table.table_number.label('table_number')
+)
+
+
 class CRUDReservation:
     def get(self, db: Session, id: int) -> Optional[Reservation]:
         return db.query(Reservation).filter(Reservation.id == id).first()
@@ -29,7 +88,7 @@ class CRUDReservation:
         if status:
             query = query.filter(Reservation.status == status)
         if date_filter:
-            query = query.filter(func.date(Reservation.reservation_datetime) == date_filter)
+            query = query.filter(wall_clock_day_window(date_filter).filter(Reservation.reservation_datetime))
         return query.offset(skip).limit(limit).all()
     def get_by_date_range(
         self, 
@@ -48,7 +107,11 @@ class CRUDReservation:
         if table_id:
             query = query.filter(Reservation.table_id == table_id)
         return query.all()
-    def create(self, db: Session, obj_in: ReservationCreate) -> Reservation:
+    def get_by_idempotency_key(self, db: Session, idempotency_key: str) -> Optional[Reservation]:
+        return db.query(Reservation).filter(Reservation.idempotency_key == idempotency_key).first()
+    def create(
+        self, db: Session, obj_in: ReservationCreate, idempotency_key: Optional[str] = None
+    ) -> Reservation:
         db_obj = Reservation(
             customer_id=obj_in.customer_id,
             table_id=obj_in.table_id,
@@ -56,10 +119,17 @@ class CRUDReservation:
             party_size=obj_in.party_size,
             special_requests=obj_in.special_requests,
             notes=obj_in.notes,
+            idempotency_key=idempotency_key,
         )
         db.add(db_obj)
+        db.flush()
+        counter_crud.bump(db, {RESERVATIONS_TOTAL: 1, reservation_status_key(db_obj.status): 1})
+        event_stream.publish_reservation_created(db, db_obj)
         db.commit()
         db.refresh(db_obj)
+        dashboard_cache.invalidate()
+        reservation_index.upsert(db_obj)
+        floor_projection.upsert_reservation(db_obj)
         
         # Update table status after creating reservation
         self._update_table_status_for_reservation(db, db_obj.id)
@@ -73,11 +143,18 @@ class CRUDReservation:
         # Map reservation_date to reservation_datetime for database field
         if 'reservation_date' in update_data:
             update_data['reservation_datetime'] = update_data.pop('reservation_date')
+        old_status = db_obj.status
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         db.add(db_obj)
+        counter_crud.bump(db, transition(
+            reservation_status_key(old_status), reservation_status_key(db_obj.status)
+        ))
         db.commit()
         db.refresh(db_obj)
+        dashboard_cache.invalidate()
+        reservation_index.upsert(db_obj)
+        floor_projection.upsert_reservation(db_obj)
         
         # Update table status after updating reservation
         self._update_table_status_for_reservation(db, db_obj.id)
@@ -95,57 +172,45 @@ class CRUDReservation:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Failed to update table status for reservation {reservation_id}: {e}")
+    def _details_query(
+        self,
+        query,
+        status: Optional[ReservationStatus] = None,
+        date_filter: Optional[date] = None
+    ):
+        """Join customer/table details and apply listing filters"""
+        query = query.outerjoin(User, Reservation.customer_id == User.id)\
+         .outerjoin(Table, Reservation.table_id == Table.id)
+        if status:
+            query = query.filter(Reservation.status == status)
+        if date_filter:
+            query = query.filter(wall_clock_day_window(date_filter).filter(Reservation.reservation_datetime))
+        return query
+    def _paginate(self, query, skip: int = 0, after: Optional[tuple] = None):
+        """Stable (created_at, id) descending order; keyset after `after`, else offset"""
+        if after:
+            query = query.filter(
+                keyset_filter((Reservation.created_at, Reservation.id), after, descending=True)
+            )
+        query = query.order_by(Reservation.created_at.desc(), Reservation.id.desc())
+        return query if after else query.offset(skip)
     def get_multi_with_details(
         self, 
         db: Session, 
         skip: int = 0, 
         limit: int = 100,
         status: Optional[ReservationStatus] = None,
-        date_filter: Optional[date] = None
+        date_filter: Optional[date] = None,
+        after: Optional[tuple] = None
     ) -> List[dict]:
-        """Get reservations with customer and table details"""
-        # Build base query with joins
-        query = db.query(
-            Reservation,
-            User.full_name.label('customer_name'),
-            User.email.label('customer_email'),
-            User.phone.label('customer_phone'),
-            Table.table_number.label('table_number'),
-            Table.capacity.label('table_capacity'),
-            Table.location.label('table_location')
-        ).outerjoin(User, Reservation.customer_id == User.id)\
-         .outerjoin(Table, Reservation.table_id == Table.id)
-        # Apply filters
-        if status:
-            query = query.filter(Reservation.status == status)
-        if date_filter:
-            query = query.filter(func.date(Reservation.reservation_datetime) == date_filter)
-        results = query.order_by(Reservation.created_at.desc()).offset(skip).limit(limit).all()
-        # Convert to dict format
-        reservations_with_details = []
-        for reservation, customer_name, customer_email, customer_phone, table_number, table_capacity, table_location in results:
-            reservation_dict = {
-                "id": reservation.id,
-                "customer_id": reservation.customer_id,
-                "table_id": reservation.table_id,
-                "reservation_date": reservation.reservation_datetime,  # Map DB field to API field
-                "party_size": reservation.party_size,
-                "status": reservation.status,
-                "special_requests": reservation.special_requests,
-                "notes": reservation.notes,
-                "created_at": reservation.created_at,
-                "updated_at": reservation.updated_at,
-                # Customer details
-                "customer_name": customer_name,
-                "customer_email": customer_email,
-                "customer_phone": customer_phone,
-                # Table details
-                "table_number": table_number,
-                "table_capacity": table_capacity,
-                "table_location": table_location
-            }
-            reservations_with_details.append(reservation_dict)
-        return reservations_with_details
+        """Get reservations with customer and table details
+
+        Sorted by (created_at, id) descending; pass the previous page's last
+        (created_at, id) as `after` for keyset pagination instead of `skip`.
+        """
+        query = self._details_query(db.query(*RESERVATION_DETAIL_COLUMNS), status, date_filter)
+        results = self._paginate(query, skip, after).limit(limit).all()
+        return [_reservation_details_dict(row) for row in results]
     def get_count_with_details(
         self, 
         db: Session, 
@@ -153,15 +218,35 @@ class CRUDReservation:
         date_filter: Optional[date] = None
     ) -> int:
         """Get count of reservations with filters applied"""
-        query = db.query(Reservation)\
-            .outerjoin(User, Reservation.customer_id == User.id)\
-            .outerjoin(Table, Reservation.table_id == Table.id)
-        # Apply same filters as get_multi_with_details
-        if status:
-            query = query.filter(Reservation.status == status)
-        if date_filter:
-            query = query.filter(func.date(Reservation.reservation_datetime) == date_filter)
-        return query.count()
+        return self._details_query(db.query(Reservation), status, date_filter).count()
+    def get_page_with_details(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[ReservationStatus] = None,
+        date_filter: Optional[date] = None,
+        after: Optional[tuple] = None
+    ) -> Tuple[List[dict], int, bool]:
+        """Page of reservations plus total in one statement: (items, total, total_is_estimate)"""
+        if not (status or date_filter):
+            estimate = estimated_row_count(db, Reservation.__tablename__)
+            if estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+                items = self.get_multi_with_details(db, skip=skip, limit=limit, after=after)
+                return items, estimate, True
+        if after:
+            # A window count would only cover rows past the cursor
+            items = self.get_multi_with_details(
+                db, limit=limit, status=status, date_filter=date_filter, after=after
+            )
+            return items, self.get_count_with_details(db, status=status, date_filter=date_filter), False
+        query = self._details_query(
+            db.query(*RESERVATION_DETAIL_COLUMNS, window_total()), status, date_filter
+        )
+        rows, total = split_total(self._paginate(query, skip).limit(limit).all())
+        if total is None:
+            total = self.get_count_with_details(db, status=status, date_filter=date_filter) if skip else 0
+        return [_reservation_details_dict(row) for row in rows], total, False
     def get_my_reservations_with_details(
         self, 
         db: Session, 
@@ -171,43 +256,27 @@ class CRUDReservation:
     ) -> List[dict]:
         """Get user's reservations with customer and table details"""
         # Build base query with joins and filter by customer
-        query = db.query(
-            Reservation,
-            User.full_name.label('customer_name'),
-            User.email.label('customer_email'),
-            User.phone.label('customer_phone'),
-            Table.table_number.label('table_number'),
-            Table.capacity.label('table_capacity'),
-            Table.location.label('table_location')
-        ).outerjoin(User, Reservation.customer_id == User.id)\
+        query = db.query(*RESERVATION_DETAIL_COLUMNS)\
+         .outerjoin(User, Reservation.customer_id == User.id)\
          .outerjoin(Table, Reservation.table_id == Table.id)\
          .filter(Reservation.customer_id == customer_id)
         results = query.order_by(Reservation.created_at.desc()).offset(skip).limit(limit).all()
-        # Convert to dict format
-        reservations_with_details = []
-        for reservation, customer_name, customer_email, customer_phone, table_number, table_capacity, table_location in results:
-            reservation_dict = {
-                "id": reservation.id,
-                "customer_id": reservation.customer_id,
-                "table_id": reservation.table_id,
-                "reservation_date": reservation.reservation_datetime,  # Map DB field to API field
-                "party_size": reservation.party_size,
-                "status": reservation.status,
-                "special_requests": reservation.special_requests,
-                "notes": reservation.notes,
-                "created_at": reservation.created_at,
-                "updated_at": reservation.updated_at,
-                # Customer details
-                "customer_name": customer_name,
-                "customer_email": customer_email,
-                "customer_phone": customer_phone,
-                # Table details
-                "table_number": table_number,
-                "table_capacity": table_capacity,
-                "table_location": table_location
-            }
-            reservations_with_details.append(reservation_dict)
-        return reservations_with_details
+        return [_reservation_details_dict(row) for row in results]
+    async def get_my_reservations_with_details_async(
+        self,
+        db: AsyncSession,
+        customer_id: int,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[dict]:
+        """Async variant of get_my_reservations_with_details"""
+        stmt = select(*RESERVATION_DETAIL_COLUMNS)\
+            .outerjoin(User, Reservation.customer_id == User.id)\
+            .outerjoin(Table, Reservation.table_id == Table.id)\
+            .where(Reservation.customer_id == customer_id)\
+            .order_by(Reservation.created_at.desc()).offset(skip).limit(limit)
+        result = await db.execute(stmt)
+        return [_reservation_details_dict(row) for row in result.all()]
     def get_with_details(self, db: Session, reservation_id: int) -> Optional[dict]:
         """Get single reservation with full details"""
         # Get reservation with customer and table info
@@ -247,8 +316,12 @@ class CRUDReservation:
         }
     def delete(self, db: Session, id: int) -> Reservation:
         obj = db.query(Reservation).get(id)
+        counter_crud.bump(db, {RESERVATIONS_TOTAL: -1, reservation_status_key(obj.status): -1})
         db.delete(obj)
         db.commit()
+        dashboard_cache.invalidate()
+        reservation_index.remove(id)
+        floor_projection.remove_reservation(id)
         return obj
 class CRUDOrder:
     def get(self, db: Session, id: int) -> Optional[Order]:
@@ -263,9 +336,13 @@ class CRUDOrder:
             return None
         # Calculate total from order items
         total = db.query(func.sum(OrderItem.subtotal)).filter(OrderItem.order_id == order_id).scalar() or 0
+        revenue_before = order_revenue(order)
         order.total_amount = total
+        counter_crud.bump(db, subtract(order_revenue(order), revenue_before))
         db.commit()
+        dashboard_cache.invalidate()
         db.refresh(order)
+        floor_projection.upsert_order(order)
         return order
     def get_by_order_number(self, db: Session, order_number: str) -> Optional[Order]:
         return db.query(Order).filter(Order.order_number == order_number).first()
@@ -284,34 +361,25 @@ class CRUDOrder:
         if status:
             query = query.filter(Order.status == status)
         if date_filter:
-            query = query.filter(func.date(Order.created_at) == date_filter)
-        return query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-    def get_multi_with_details(
-        self, 
-        db: Session, 
-        skip: int = 0, 
-        limit: int = 100,
+            query = query.filter(day_window(date_filter).filter(Order.created_at))
+        return query.order_by(Order.created_at.desc(), Order.id.desc()).offset(skip).limit(limit).all()
+    def _details_query(
+        self,
+        query,
         customer_id: Optional[int] = None,
         status: Optional[OrderStatus] = None,
         date_filter: Optional[date] = None,
         search: Optional[str] = None
-    ) -> List[dict]:
-        """Get orders with customer and table details"""
-        # Build base query with joins
-        query = db.query(
-            Order,
-            User.full_name.label('customer_name'),
-            User.email.label('customer_email'),
-            Table.table_number.label('table_number')
-        ).outerjoin(User, Order.customer_id == User.id)\
+    ):
+        """Join customer/table details and apply listing filters"""
+        query = query.outerjoin(User, Order.customer_id == User.id)\
          .outerjoin(Table, Order.table_id == Table.id)
-        # Apply filters
         if customer_id:
             query = query.filter(Order.customer_id == customer_id)
         if status:
             query = query.filter(Order.status == status)
         if date_filter:
-            query = query.filter(func.date(Order.created_at) == date_filter)
+            query = query.filter(day_window(date_filter).filter(Order.created_at))
         if search:
             query = query.filter(
                 Order.order_number.ilike(f"%{search}%") |
@@ -319,29 +387,53 @@ class CRUDOrder:
                 User.email.ilike(f"%{search}%") |
                 Table.table_number.ilike(f"%{search}%")
             )
-        results = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-        # Convert to dict format
-        orders_with_details = []
-        for order, customer_name, customer_email, table_number in results:
-            order_dict = {
-                "id": order.id,
-                "order_number": order.order_number,
-                "customer_id": order.customer_id,
-                "table_id": order.table_id,
-                "status": order.status,
-                "payment_status": order.payment_status,
-                "total_amount": order.total_amount,
-                "tax_amount": order.tax_amount,
-                "discount_amount": order.discount_amount,
-                "created_at": order.created_at,
-                "updated_at": order.updated_at,
-                "customer_name": customer_name,
-                "customer_email": customer_email,
-                "table_number": table_number,
-                "order_items": []  # Will be populated separately if needed
-            }
-            orders_with_details.append(order_dict)
-        return orders_with_details
+        return query
+    def _paginate(self, query, skip: int = 0, after: Optional[tuple] = None):
+        """Stable (created_at, id) descending order; keyset after `after`, else offset"""
+        if after:
+            query = query.filter(keyset_filter((Order.created_at, Order.id), after, descending=True))
+        query = query.order_by(Order.created_at.desc(), Order.id.desc())
+        return query if after else query.offset(skip)
+    def _details_dict(self, row) -> dict:
+        order, customer_name, customer_email, table_number = row
+        return {
+            "id": order.id,
+            "order_number": order.order_number,
+            "customer_id": order.customer_id,
+            "table_id": order.table_id,
+            "status": order.status,
+            "payment_status": order.payment_status,
+            "total_amount": order.total_amount,
+            "tax_amount": order.tax_amount,
+            "discount_amount": order.discount_amount,
+            "created_at": order.created_at,
+            "updated_at": order.updated_at,
+            "customer_name": customer_name,
+            "customer_email": customer_email,
+            "table_number": table_number,
+            "order_items": []  # Will be populated separately if needed
+        }
+    def get_multi_with_details(
+        self, 
+        db: Session, 
+        skip: int = 0, 
+        limit: int = 100,
+        customer_id: Optional[int] = None,
+        status: Optional[OrderStatus] = None,
+        date_filter: Optional[date] = None,
+        search: Optional[str] = None,
+        after: Optional[tuple] = None
+    ) -> List[dict]:
+        """Get orders with customer and table details
+
+        Sorted by (created_at, id) descending; pass the previous page's last
+        (created_at, id) as `after` for keyset pagination instead of `skip`.
+        """
+        query = self._details_query(
+            db.query(*ORDER_DETAIL_COLUMNS), customer_id, status, date_filter, search
+        )
+        results = self._paginate(query, skip, after).limit(limit).all()
+        return [self._details_dict(row) for row in results]
     def get_count_with_details(
         self, 
         db: Session, 
@@ -351,25 +443,36 @@ class CRUDOrder:
         search: Optional[str] = None
     ) -> int:
         """Get count of orders with filters applied"""
-        # Build base query with joins
-        query = db.query(Order)\
-            .outerjoin(User, Order.customer_id == User.id)\
-            .outerjoin(Table, Order.table_id == Table.id)
-        # Apply same filters as get_multi_with_details
-        if customer_id:
-            query = query.filter(Order.customer_id == customer_id)
-        if status:
-            query = query.filter(Order.status == status)
-        if date_filter:
-            query = query.filter(func.date(Order.created_at) == date_filter)
-        if search:
-            query = query.filter(
-                Order.order_number.ilike(f"%{search}%") |
-                User.full_name.ilike(f"%{search}%") |
-                User.email.ilike(f"%{search}%") |
-                Table.table_number.ilike(f"%{search}%")
-            )
-        return query.count()
+        return self._details_query(
+            db.query(Order), customer_id, status, date_filter, search
+        ).count()
+    def get_page_with_details(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        customer_id: Optional[int] = None,
+        status: Optional[OrderStatus] = None,
+        date_filter: Optional[date] = None,
+        search: Optional[str] = None,
+        after: Optional[tuple] = None
+    ) -> Tuple[List[dict], int, bool]:
+        """Page of orders plus total in one statement: (items, total, total_is_estimate)"""
+        filters = dict(customer_id=customer_id, status=status, date_filter=date_filter, search=search)
+        if not any(filters.values()):
+            estimate = estimated_row_count(db, Order.__tablename__)
+            if estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+                items = self.get_multi_with_details(db, skip=skip, limit=limit, after=after)
+                return items, estimate, True
+        if after:
+            # A window count would only cover rows past the cursor
+            items = self.get_multi_with_details(db, limit=limit, after=after, **filters)
+            return items, self.get_count_with_details(db, **filters), False
+        query = self._details_query(db.query(*ORDER_DETAIL_COLUMNS, window_total()), **filters)
+        rows, total = split_total(self._paginate(query, skip).limit(limit).all())
+        if total is None:
+            total = self.get_count_with_details(db, **filters) if skip else 0
+        return [self._details_dict(row) for row in rows], total, False
     def create(self, db: Session, obj_in: OrderCreate) -> Order:
         # Generate unique order number
         order_number = f"ORD-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
@@ -414,25 +517,42 @@ class CRUDOrder:
         db_obj.total_amount = total_amount
         db_obj.tax_amount = tax_amount
         print(f"🔍 Debug CRUD: Total amount={total_amount}, tax={tax_amount}")
+        counter_crud.bump(db, {ORDERS_TOTAL: 1, order_status_key(db_obj.status or OrderStatus.pending): 1})
         db.commit()
         db.refresh(db_obj)
+        dashboard_cache.invalidate()
+        floor_projection.upsert_order(db_obj)
         print(f"✅ Order committed: {order_number}")
         return db_obj
     def update(self, db: Session, db_obj: Order, obj_in: OrderUpdate) -> Order:
         update_data = obj_in.dict(exclude_unset=True)
+        old_status = db_obj.status
+        revenue_before = order_revenue(db_obj)
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         # Automatically set payment_status to "paid" when order status is "completed"
         if update_data.get("status") == OrderStatus.completed:
             db_obj.payment_status = PaymentStatus.paid
         db.add(db_obj)
+        counter_crud.bump(db, merge(
+            transition(order_status_key(old_status), order_status_key(db_obj.status)),
+            subtract(order_revenue(db_obj), revenue_before)
+        ))
+        event_stream.publish_order_status(db, db_obj, old_status)
         db.commit()
         db.refresh(db_obj)
+        dashboard_cache.invalidate()
+        floor_projection.upsert_order(db_obj)
         return db_obj
     def delete(self, db: Session, id: int) -> Order:
         obj = db.query(Order).get(id)
+        counter_crud.bump(db, subtract(
+            {}, merge({ORDERS_TOTAL: 1, order_status_key(obj.status): 1}, order_revenue(obj))
+        ))
         db.delete(obj)
         db.commit()
+        dashboard_cache.invalidate()
+        floor_projection.remove_order(id)
         return obj
     def get_with_details(self, db: Session, order_id: int) -> Optional[dict]:
         """Get single order with full details including order items"""
@@ -488,32 +608,29 @@ class CRUDOrder:
         }
     def get_dashboard_stats(self, db: Session) -> dict:
         """Get comprehensive dashboard statistics"""
-        today = date.today()
-        # Order statistics
-        total_orders = db.query(Order).count()
-        pending_orders = db.query(Order).filter(Order.status == OrderStatus.pending).count()
-        completed_orders = db.query(Order).filter(Order.status == OrderStatus.completed).count()
-        # Revenue (completed orders only)
-        revenue_result = db.query(func.sum(Order.total_amount)).filter(
-            Order.status == OrderStatus.completed,
-            func.date(Order.created_at) == today
-        ).scalar()
-        total_revenue = float(revenue_result) if revenue_result else 0.0
-        # Table statistics
-        total_tables = db.query(Table).count()
-        available_tables = db.query(Table).filter(Table.status == TableStatus.available).count()
-        occupied_tables = db.query(Table).filter(Table.status == TableStatus.occupied).count()
-        reserved_tables = db.query(Table).filter(Table.status == TableStatus.reserved).count()
-        # User statistics
-        total_customers = db.query(User).filter(User.role == UserRole.customer).count()
-        total_staff = db.query(User).filter(User.role.in_([UserRole.staff, UserRole.manager, UserRole.admin])).count()
-        # Menu statistics
-        total_menu_items = db.query(MenuItem).count()
-        available_menu_items = db.query(MenuItem).filter(MenuItem.is_available == True).count()
-        # Reservation statistics
-        total_reservations = db.query(Reservation).count()
-        pending_reservations = db.query(Reservation).filter(Reservation.status == ReservationStatus.pending).count()
-        confirmed_reservations = db.query(Reservation).filter(Reservation.status == ReservationStatus.confirmed).count()
+        # Order, reservation, table and revenue figures are maintained incrementally
+        # by the write paths (see app.crud.counter) - a single primary-key scan
+        counters = counter_crud.get_all(db)
+
+        def count(key: str) -> int:
+            return int(counters.get(key, 0))
+
+        # Users and menu items change rarely, aggregate them directly in one statement
+        user_stats = select(
+            func.count(User.id).filter(User.role == UserRole.customer).label('total_customers'),
+            func.count(User.id).filter(
+                User.role.in_([UserRole.staff, UserRole.manager, UserRole.admin])
+            ).label('total_staff')
+        ).subquery()
+        menu_stats = select(
+            func.count(MenuItem.id).label('total_menu_items'),
+            func.count(MenuItem.id).filter(MenuItem.is_available == True).label('available_menu_items')
+        ).subquery()
+        stats = db.execute(
+            select(user_stats, menu_stats).select_from(user_stats.join(menu_stats, true()))
+        ).one()._mapping
+        # Revenue (completed orders created today)
+        total_revenue = float(counters.get(revenue_key(restaurant_today()), 0.0))
         # Recent orders (last 5)
         recent_orders = db.query(
             Order.id,
@@ -579,39 +696,42 @@ class CRUDOrder:
                 'total_ordered': item_data.total_ordered
             })
         return {
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'completed_orders': completed_orders,
+            'total_orders': count(ORDERS_TOTAL),
+            'pending_orders': count(order_status_key(OrderStatus.pending)),
+            'completed_orders': count(order_status_key(OrderStatus.completed)),
             'total_revenue': total_revenue,
-            'total_tables': total_tables,
-            'available_tables': available_tables,
-            'occupied_tables': occupied_tables,
-            'reserved_tables': reserved_tables,
-            'total_customers': total_customers,
-            'total_staff': total_staff,
-            'total_menu_items': total_menu_items,
-            'available_menu_items': available_menu_items,
-            'total_reservations': total_reservations,
-            'pending_reservations': pending_reservations,
-            'confirmed_reservations': confirmed_reservations,
+            'total_tables': count(TABLES_TOTAL),
+            'available_tables': count(table_status_key(TableStatus.available)),
+            'occupied_tables': count(table_status_key(TableStatus.occupied)),
+            'reserved_tables': count(table_status_key(TableStatus.reserved)),
+            'total_customers': stats['total_customers'],
+            'total_staff': stats['total_staff'],
+            'total_menu_items': stats['total_menu_items'],
+            'available_menu_items': stats['available_menu_items'],
+            'total_reservations': count(RESERVATIONS_TOTAL),
+            'pending_reservations': count(reservation_status_key(ReservationStatus.pending)),
+            'confirmed_reservations': count(reservation_status_key(ReservationStatus.confirmed)),
             'recent_orders': recent_orders_data,
             'recent_reservations': recent_reservations_data,
             'popular_items': popular_items_data
         }
     def get_daily_summary(self, db: Session, target_date: Optional[date] = None) -> OrderSummary:
         if not target_date:
-            target_date = date.today()
-        # Get orders for the specific date
-        orders = db.query(Order).filter(func.date(Order.created_at) == target_date).all()
-        total_orders = len(orders)
-        pending_orders = len([o for o in orders if o.status == OrderStatus.pending])
-        completed_orders = len([o for o in orders if o.status == OrderStatus.completed])
-        total_revenue = sum([o.total_amount for o in orders if o.payment_status == PaymentStatus.paid])
+            target_date = restaurant_today()
+        # Aggregate orders for the specific date in a single statement
+        stats = db.query(
+            func.count(Order.id).label('total_orders'),
+            func.count(Order.id).filter(Order.status == OrderStatus.pending).label('pending_orders'),
+            func.count(Order.id).filter(Order.status == OrderStatus.completed).label('completed_orders'),
+            func.sum(Order.total_amount).filter(
+                Order.payment_status == PaymentStatus.paid
+            ).label('total_revenue')
+        ).filter(day_window(target_date).filter(Order.created_at)).one()
         return OrderSummary(
-            total_orders=total_orders,
-            pending_orders=pending_orders,
-            completed_orders=completed_orders,
-            total_revenue=total_revenue
+            total_orders=stats.total_orders,
+            pending_orders=stats.pending_orders,
+            completed_orders=stats.completed_orders,
+            total_revenue=float(stats.total_revenue or 0)
         )
 class CRUDOrderItem:
     def get(self, db: Session, id: int) -> Optional[OrderItem]:
@@ -626,3 +746,66 @@ class CRUDOrderItem:
 reservation = CRUDReservation()
 order = CRUDOrder()
 order_item = CRUDOrderItem()
+
+
+# counters, users + menu items, recent orders, recent reservations, popular items
+DASHBOARD_STATEMENTS = 5
+
+
+def dashboard_query_check(db: Session, rows: int = 100000, runs: int = 20) -> dict:
+    """
+    Statement count and latency of get_dashboard_stats. Seeds `rows` synthetic
+    orders in the session's transaction (rolled back at the end) so the recent
+    and aggregate queries run against a large table; every call must issue
+    exactly DASHBOARD_STATEMENTS statements.
+    """
+    import statistics
+    import time
+    from sqlalchemy import event, text
+
+    db.execute(text(
+        "INSERT INTO orders (order_number, status, payment_status, total_amount, tax_amount, "
+        "discount_amount, created_at) "
+        "SELECT 'DASH-BENCH-' || g, 'completed', 'paid', 100, 0, 0, now() - g * interval '1 minute' "
+        "FROM generate_series(1, :rows) AS g"
+    ), {"rows": rows})
+    db.execute(text("ANALYZE orders"))
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    connection = db.connection()
+    counts, samples = [], []
+    try:
+        for _ in range(runs):
+            statements.clear()
+            event.listen(connection, "before_cursor_execute", count_statement)
+            started = time.perf_counter()
+            try:
+                order.get_dashboard_stats(db)
+            finally:
+                event.remove(connection, "before_cursor_execute", count_statement)
+            samples.append((time.perf_counter() - started) * 1000)
+            counts.append(len(statements))
+    finally:
+        db.rollback()
+    return {
+        "rows_seeded": rows,
+        "statements": max(counts),
+        "expected_statements": DASHBOARD_STATEMENTS,
+        "passed": all(count == DASHBOARD_STATEMENTS for count in counts),
+        "median_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3)
+    }
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print("Dashboard statements:", dashboard_query_check(session))
+    finally:
+        session.close()
@@ -1,9 +1,17 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import Optional, List
-from datetime import datetime, timedelta
+from sqlalchemy import and_, select, func, exists, values, column, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Tuple, Dict
+from datetime import datetime
 from app.models.table import Table, TableStatus
+from app.core.dining_policy import estimated_end_time
 from app.schemas.table import TableCreate, TableUpdate
+from app.core.pagination import keyset_filter, window_total, split_total
+from app.crud.counter import counter as counter_crud, TABLES_TOTAL, table_status_key, transition
+from app.services.reservation_index import reservation_index
+from app.services.floor_projection import floor_projection
+from app.services.dashboard_cache import dashboard_cache
+from app.services import event_stream
 
 
 class CRUDTable:
@@ -13,16 +21,13 @@ class CRUDTable:
     def get_by_table_number(self, db: Session, table_number: str) -> Optional[Table]:
         return db.query(Table).filter(Table.table_number == table_number).first()
 
-    def get_multi(
-        self, 
-        db: Session, 
-        skip: int = 0, 
-        limit: int = 100,
+    def _list_query(
+        self,
+        query,
         active_only: bool = True,
         status: Optional[TableStatus] = None,
         search: Optional[str] = None
-    ) -> List[Table]:
-        query = db.query(Table)
+    ):
         if active_only:
             query = query.filter(Table.is_active == True)
         if status:
@@ -32,7 +37,28 @@ class CRUDTable:
                 Table.table_number.ilike(f"%{search}%") |
                 Table.location.ilike(f"%{search}%")
             )
-        return query.offset(skip).limit(limit).all()
+        return query
+
+    def _paginate(self, query, skip: int = 0, after: Optional[tuple] = None):
+        """Stable (table_number, id) ordering; keyset after `after`, else offset"""
+        if after:
+            query = query.filter(keyset_filter((Table.table_number, Table.id), after))
+        query = query.order_by(Table.table_number.asc(), Table.id.asc())
+        return query if after else query.offset(skip)
+
+    def get_multi(
+        self, 
+        db: Session, 
+        skip: int = 0, 
+        limit: int = 100,
+        active_only: bool = True,
+        status: Optional[TableStatus] = None,
+        search: Optional[str] = None,
+        after: Optional[tuple] = None
+    ) -> List[Table]:
+        """List tables ordered by (table_number, id); `after` enables keyset pagination"""
+        query = self._list_query(db.query(Table), active_only, status, search)
+        return self._paginate(query, skip, after).limit(limit).all()
 
     def count(
         self, 
@@ -41,99 +67,165 @@ class CRUDTable:
         status: Optional[TableStatus] = None,
         search: Optional[str] = None
     ) -> int:
-        query = db.query(Table)
-        if active_only:
-            query = query.filter(Table.is_active == True)
-        if status:
-            query = query.filter(Table.status == status)
-        if search:
-            query = query.filter(
-                Table.table_number.ilike(f"%{search}%") |
-                Table.location.ilike(f"%{search}%")
+        return self._list_query(db.query(Table), active_only, status, search).count()
+
+    def get_page(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        active_only: bool = True,
+        status: Optional[TableStatus] = None,
+        search: Optional[str] = None,
+        after: Optional[tuple] = None
+    ) -> Tuple[List[Table], int]:
+        """Page of tables plus total count in one statement"""
+        if after:
+            # A window count would only cover rows past the cursor
+            tables = self.get_multi(
+                db, limit=limit, active_only=active_only, status=status, search=search, after=after
             )
-        return query.count()
+            return tables, self.count(db, active_only=active_only, status=status, search=search)
+        query = self._list_query(db.query(Table, window_total()), active_only, status, search)
+        rows, total = split_total(self._paginate(query, skip).limit(limit).all())
+        if total is None:
+            total = self.count(db, active_only=active_only, status=status, search=search) if skip else 0
+        return [table for table, in rows], total
 
-    def get_available_tables(
-        self, db: Session, min_capacity: Optional[int] = None,
-        reservation_datetime: Optional[datetime] = None,
-        duration_hours: int = 2
-    ) -> List[Table]:
-        """Get available tables, optionally checking for reservation conflicts"""
-        query = db.query(Table).filter(
+    def _reservation_conflict_filter(self, reservation_datetime: datetime, end_time: datetime):
+        """Active reservations overlapping [reservation_datetime, end_time] (GiST && probe)"""
+        from app.models.order import Reservation, ReservationStatus
+
+        return and_(
+            Reservation.status.in_([ReservationStatus.pending, ReservationStatus.confirmed]),
+            Reservation.time_range.overlaps(func.tstzrange(reservation_datetime, end_time, "[]"))
+        )
+
+    def _available_tables_filter(
+        self, query, min_capacity: Optional[int] = None,
+        reservation_datetime: Optional[datetime] = None
+    ):
+        """
+        Apply availability filters; works for both Query and select() statements.
+        min_capacity is the party size, so the conflict window is the same
+        policy-derived hold that booking checks and stores.
+        """
+        query = query.filter(
             Table.status == TableStatus.available,
             Table.is_active == True
         )
         if min_capacity:
             query = query.filter(Table.capacity >= min_capacity)
-            
+
         # If checking for specific reservation time, exclude tables with conflicts
-        if reservation_datetime:
-            from app.models.order import Reservation, ReservationStatus
-            
-            # Calculate time window (reservation + duration)
-            end_time = reservation_datetime + timedelta(hours=duration_hours)
-            
+        # (skipped when the in-memory index answers it, see _exclude_conflicts)
+        if reservation_datetime and not reservation_index.is_fresh():
+            from app.models.order import Reservation
+
+            # Calculate time window (reservation + dining duration)
+            end_time = estimated_end_time(min_capacity, reservation_datetime)
+
             # Find tables with conflicting reservations
-            conflicting_reservations = db.query(Reservation.table_id).filter(
-                and_(
-                    Reservation.status.in_([ReservationStatus.pending, ReservationStatus.confirmed]),
-                    or_(
-                        # New reservation starts during existing reservation
-                        and_(
-                            Reservation.reservation_datetime <= reservation_datetime,
-                            Reservation.estimated_end_time >= reservation_datetime
-                        ),
-                        # New reservation ends during existing reservation
-                        and_(
-                            Reservation.reservation_datetime <= end_time,
-                            Reservation.estimated_end_time >= end_time
-                        ),
-                        # New reservation completely covers existing reservation
-                        and_(
-                            Reservation.reservation_datetime >= reservation_datetime,
-                            Reservation.estimated_end_time <= end_time
-                        )
-                    )
-                )
-            ).subquery()
-            
+            conflicting_reservations = select(Reservation.table_id).where(
+                self._reservation_conflict_filter(reservation_datetime, end_time)
+            )
+
             # Exclude tables with conflicts
             query = query.filter(~Table.id.in_(conflicting_reservations))
-            
-        return query.all()
+        return query
+
+    def get_available_tables(
+        self, db: Session, min_capacity: Optional[int] = None,
+        reservation_datetime: Optional[datetime] = None
+    ) -> List[Table]:
+        """Get available tables, optionally checking for reservation conflicts"""
+        query = self._available_tables_filter(
+            db.query(Table), min_capacity, reservation_datetime
+        )
+        return self._exclude_conflicts(query.all(), reservation_datetime, min_capacity)
+
+    async def get_available_tables_async(
+        self, db: AsyncSession, min_capacity: Optional[int] = None,
+        reservation_datetime: Optional[datetime] = None
+    ) -> List[Table]:
+        """Async variant of get_available_tables"""
+        stmt = self._available_tables_filter(
+            select(Table), min_capacity, reservation_datetime
+        )
+        result = await db.execute(stmt)
+        return self._exclude_conflicts(result.scalars().all(), reservation_datetime, min_capacity)
+
+    def _exclude_conflicts(
+        self, tables: List[Table], reservation_datetime: Optional[datetime], party_size: Optional[int]
+    ) -> List[Table]:
+        """Drop tables the reservation index reports as booked in the window"""
+        if not reservation_datetime or not reservation_index.is_fresh():
+            return tables
+        end_time = estimated_end_time(party_size, reservation_datetime)
+        conflicting = reservation_index.conflicting_table_ids(
+            reservation_datetime, end_time, [t.id for t in tables]
+        )
+        return [t for t in tables if t.id not in conflicting]
+
+    def _slot_availability_stmt(self, slots: List[datetime], min_capacity: Optional[int] = None):
+        """
+        Free table count per candidate start time in one statement:
+        VALUES (slot, policy end) x available tables, minus tables with an overlapping reservation
+        """
+        from app.models.order import Reservation
+
+        slot_table = values(
+            column("slot_start", DateTime), column("slot_end", DateTime), name="slots"
+        ).data([(s, estimated_end_time(min_capacity, s)) for s in slots])
+        slot_start = slot_table.c.slot_start
+        conflict = exists().where(
+            Reservation.table_id == Table.id,
+            self._reservation_conflict_filter(slot_start, slot_table.c.slot_end)
+        )
+        stmt = select(slot_start, func.count(Table.id)).select_from(slot_table).join(
+            Table, and_(Table.status == TableStatus.available, Table.is_active == True)
+        )
+        if min_capacity:
+            stmt = stmt.where(Table.capacity >= min_capacity)
+        return stmt.where(~conflict).group_by(slot_start)
+
+    def get_slot_availability(
+        self, db: Session, slots: List[datetime], min_capacity: Optional[int] = None
+    ) -> Dict[datetime, int]:
+        """Number of free tables for every slot (slots with none are reported as 0)"""
+        if not slots:
+            return {}
+        counts = dict(db.execute(self._slot_availability_stmt(slots, min_capacity)).all())
+        return {slot: counts.get(slot, 0) for slot in slots}
+
+    async def get_slot_availability_async(
+        self, db: AsyncSession, slots: List[datetime], min_capacity: Optional[int] = None
+    ) -> Dict[datetime, int]:
+        """Async variant of get_slot_availability"""
+        if not slots:
+            return {}
+        result = await db.execute(self._slot_availability_stmt(slots, min_capacity))
+        counts = dict(result.all())
+        return {slot: counts.get(slot, 0) for slot in slots}
 
     def is_table_available_at_time(
         self, db: Session, table_id: int, 
-        reservation_datetime: datetime, duration_hours: int = 2
+        reservation_datetime: datetime, party_size: Optional[int] = None
     ) -> bool:
         """Check if specific table is available at given time"""
         table = self.get(db, table_id)
         if not table or table.status != TableStatus.available or not table.is_active:
             return False
             
-        from app.models.order import Reservation, ReservationStatus
-        
-        end_time = reservation_datetime + timedelta(hours=duration_hours)
+        end_time = estimated_end_time(party_size, reservation_datetime)
+        if reservation_index.is_fresh():
+            return not reservation_index.has_conflict(table_id, reservation_datetime, end_time)
+
+        from app.models.order import Reservation
         
         conflicting_count = db.query(Reservation).filter(
-            and_(
-                Reservation.table_id == table_id,
-                Reservation.status.in_([ReservationStatus.pending, ReservationStatus.confirmed]),
-                or_(
-                    and_(
-                        Reservation.reservation_datetime <= reservation_datetime,
-                        Reservation.estimated_end_time >= reservation_datetime
-                    ),
-                    and_(
-                        Reservation.reservation_datetime <= end_time,
-                        Reservation.estimated_end_time >= end_time
-                    ),
-                    and_(
-                        Reservation.reservation_datetime >= reservation_datetime,
-                        Reservation.estimated_end_time <= end_time
-                    )
-                )
-            )
+            Reservation.table_id == table_id,
+            self._reservation_conflict_filter(reservation_datetime, end_time)
         ).count()
         
         return conflicting_count == 0
@@ -153,20 +245,29 @@ class CRUDTable:
             is_active=obj_in.is_active,
         )
         db.add(db_obj)
+        db.flush()
+        counter_crud.bump(db, {TABLES_TOTAL: 1, table_status_key(db_obj.status): 1})
         db.commit()
+        dashboard_cache.invalidate()
         db.refresh(db_obj)
+        floor_projection.upsert_table(db_obj)
         return db_obj
 
     def update(
         self, db: Session, db_obj: Table, obj_in: TableUpdate
     ) -> Table:
         update_data = obj_in.dict(exclude_unset=True)
+        old_status = db_obj.status
         for field, value in update_data.items():
             setattr(db_obj, field, value)
 
         db.add(db_obj)
+        counter_crud.bump(db, transition(table_status_key(old_status), table_status_key(db_obj.status)))
+        event_stream.publish_table_status(db, db_obj, old_status, db_obj.status)
         db.commit()
+        dashboard_cache.invalidate()
         db.refresh(db_obj)
+        floor_projection.upsert_table(db_obj)
         return db_obj
 
     def update_status(
@@ -174,16 +275,23 @@ class CRUDTable:
     ) -> Optional[Table]:
         db_obj = self.get(db, table_id)
         if db_obj:
+            counter_crud.bump(db, transition(table_status_key(db_obj.status), table_status_key(status)))
+            event_stream.publish_table_status(db, db_obj, db_obj.status, status)
             db_obj.status = status
             db.add(db_obj)
             db.commit()
+            dashboard_cache.invalidate()
             db.refresh(db_obj)
+            floor_projection.upsert_table(db_obj)
         return db_obj
 
     def delete(self, db: Session, id: int) -> Table:
         obj = db.query(Table).get(id)
+        counter_crud.bump(db, {TABLES_TOTAL: -1, table_status_key(obj.status): -1})
         db.delete(obj)
         db.commit()
+        dashboard_cache.invalidate()
+        floor_projection.remove_table(id)
         return obj
 
 
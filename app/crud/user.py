@@ -3,6 +3,7 @@ from typing import Optional, List
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash, verify_password
+from app.services.user_cache import user_cache
 
 
 class CRUDUser:
@@ -39,6 +40,7 @@ class CRUDUser:
     def update(
         self, db: Session, db_obj: User, obj_in: UserUpdate
     ) -> User:
+        old_username = db_obj.username
         update_data = obj_in.dict(exclude_unset=True)
         if "password" in update_data:
             hashed_password = get_password_hash(update_data["password"])
@@ -51,12 +53,16 @@ class CRUDUser:
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        # Covers profile, role and is_active (deactivation) changes
+        user_cache.invalidate(old_username, db_obj.username)
         return db_obj
 
     def delete(self, db: Session, id: int) -> User:
         obj = db.query(User).get(id)
+        username = obj.username
         db.delete(obj)
         db.commit()
+        user_cache.invalidate(username)
         return obj
 
     def authenticate(self, db: Session, username: str, password: str) -> Optional[User]:
@@ -80,6 +86,7 @@ class CRUDUser:
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        user_cache.invalidate(db_obj.username)
         return db_obj
 
 
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.database import get_pool_stats
 from app.api import router as api_router
 
 # Create FastAPI app
@@ -40,6 +41,67 @@ def run_migrations():
         print(f"[Startup] Migration error: {e}")
 
 
+@app.on_event("startup")
+def load_reservation_index():
+    # Availability checks fall back to SQL until the index is loaded
+    from app.core.database import SessionLocal
+    from app.services.reservation_index import reservation_index
+    db = SessionLocal()
+    try:
+        count = reservation_index.load(db)
+        print(f"[Startup] Reservation index loaded ({count} active reservations).")
+    except Exception as e:
+        print(f"[Startup] Reservation index error: {e}")
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def load_floor_projection():
+    # /tables/floor is served from memory; write paths keep it current afterwards
+    from app.core.database import SessionLocal
+    from app.services.floor_projection import floor_projection
+    db = SessionLocal()
+    try:
+        count = floor_projection.load(db)
+        print(f"[Startup] Floor projection loaded ({count} tables).")
+    except Exception as e:
+        print(f"[Startup] Floor projection error: {e}")
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def start_scheduler():
+    # Status sync, no-show sweep, arrival reminders and counter reconciliation; each job runs on one worker only
+    if not settings.SCHEDULER_ENABLED:
+        return
+    from app.services.scheduler import scheduler
+    scheduler.start()
+    print(f"[Startup] Scheduler started ({len(scheduler.jobs)} jobs).")
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    if not settings.SCHEDULER_ENABLED:
+        return
+    from app.services.scheduler import scheduler
+    await scheduler.stop()
+
+
+@app.on_event("startup")
+async def start_event_listener():
+    # LISTEN for change events so /events/stream clients on this worker receive them
+    from app.services.event_stream import event_broker
+    event_broker.start()
+
+
+@app.on_event("shutdown")
+async def stop_event_listener():
+    from app.services.event_stream import event_broker
+    await event_broker.stop()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -57,6 +119,28 @@ async def health_check():
     return {"status": "healthy", "service": "RestoBot API"}
 
 
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    """Connection pool gauges (checked-out, overflow, checkout wait) for the primary and replica pools"""
+    return get_pool_stats()
+
+
+@app.get("/health/user-cache")
+async def user_cache_stats():
+    """Authenticated user cache size, hit rate and evictions in this worker"""
+    from app.services.user_cache import user_cache
+    return user_cache.stats()
+
+
+@app.get("/health/scheduler")
+async def scheduler_stats():
+    """Background job runs, failures, durations and leadership in this worker"""
+    if not settings.SCHEDULER_ENABLED:
+        return {"running": False, "jobs": {}}
+    from app.services.scheduler import scheduler
+    return scheduler.snapshot()
+
+
 @app.post("/webhook")
 async def rasa_webhook(data: dict):
     """Webhook endpoint for Rasa actions"""
@@ -24,6 +24,8 @@ try:
     from app.models.menu import Category, MenuItem  
     from app.models.table import Table
     from app.models.order import Order, OrderItem, Reservation
+    from app.models.counter import DashboardCounter
+    from app.models.arrival_stats import ArrivalDailyStats
     from app.seed_data import seed_database
 except ImportError as e:
     print(f"Import error: {e}")
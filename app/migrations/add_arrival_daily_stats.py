@@ -0,0 +1,39 @@
+"""
+Database migration: Add arrival_daily_stats, a per-day rollup of arrival
+statistics, and backfill it from the reservation history
+
+Revision ID: add_arrival_daily_stats
+Revises: add_reservation_time_range
+Create Date: 2026-10-17
+"""
+from app.core.database import engine, SessionLocal
+from app.models.arrival_stats import ArrivalDailyStats
+from app.crud.arrival_stats import arrival_stats
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade():
+    """Create the rollup table and roll up every completed day"""
+    ArrivalDailyStats.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        days = arrival_stats.refresh_recent(db)
+        logger.info(f"Rolled up {days} days of arrivals")
+    finally:
+        db.close()
+    logger.info("Migration completed successfully")
+
+
+def downgrade():
+    """Drop the rollup table"""
+    ArrivalDailyStats.__table__.drop(bind=engine, checkfirst=True)
+    logger.info("Downgrade completed - removed arrival_daily_stats")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("Running migration: Add arrival daily stats...")
+    upgrade()
+    print("Migration completed!")
@@ -0,0 +1,39 @@
+"""
+Database migration: Add dashboard_counters table holding incrementally
+maintained order, reservation, table and revenue counters
+
+Revision ID: add_dashboard_counters
+Revises: add_performance_indexes
+Create Date: 2026-10-17
+"""
+from app.core.database import engine, SessionLocal
+from app.models.counter import DashboardCounter
+from app.crud.counter import counter
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade():
+    """Create the counters table and seed it from the current data"""
+    DashboardCounter.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        drift = counter.reconcile(db)
+        logger.info(f"Seeded {len(drift)} dashboard counters")
+    finally:
+        db.close()
+    logger.info("Migration completed successfully")
+
+
+def downgrade():
+    """Drop the counters table"""
+    DashboardCounter.__table__.drop(bind=engine, checkfirst=True)
+    logger.info("Downgrade completed - removed dashboard_counters")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("Running migration: Add dashboard counters...")
+    upgrade()
+    print("Migration completed!")
@@ -0,0 +1,106 @@
+"""
+Database migration: Add composite and partial indexes for reservation conflict
+checks and order listings
+
+Revision ID: add_performance_indexes
+Revises: add_payment_fields
+Create Date: 2026-10-17
+"""
+from sqlalchemy import text
+from app.core.database import engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Keep in sync with __table_args__ in app/models/order.py
+INDEXES = [
+    (
+        "ix_reservations_active_table_window",
+        "reservations (table_id, reservation_datetime, estimated_end_time) "
+        "WHERE status IN ('pending', 'confirmed')"
+    ),
+    ("ix_reservations_status_datetime", "reservations (status, reservation_datetime)"),
+    ("ix_reservations_customer_created", "reservations (customer_id, created_at)"),
+    ("ix_reservations_created_at", "reservations (created_at, id)"),
+    ("ix_orders_created_at", "orders (created_at, id)"),
+    ("ix_orders_status_created", "orders (status, created_at)"),
+    ("ix_orders_customer_created", "orders (customer_id, created_at)"),
+    ("ix_orders_table_status", "orders (table_id, status)"),
+    ("ix_order_items_order_menu_item", "order_items (order_id, menu_item_id)"),
+]
+
+# One representative hot query per index; EXPLAIN must show the index in its plan
+EXPLAIN_QUERIES = {
+    "ix_reservations_active_table_window": (
+        "SELECT id FROM reservations WHERE table_id = 1 AND status IN ('pending', 'confirmed') "
+        "AND reservation_datetime < now() + interval '2 hours' AND estimated_end_time > now()"
+    ),
+    "ix_reservations_status_datetime": (
+        "SELECT id FROM reservations WHERE status = 'confirmed' AND reservation_datetime <= now()"
+    ),
+    "ix_reservations_customer_created": (
+        "SELECT id FROM reservations WHERE customer_id = 1 ORDER BY created_at DESC LIMIT 20"
+    ),
+    "ix_reservations_created_at": "SELECT id FROM reservations ORDER BY created_at DESC, id DESC LIMIT 20",
+    "ix_orders_created_at": "SELECT id FROM orders ORDER BY created_at DESC, id DESC LIMIT 20",
+    "ix_orders_status_created": (
+        "SELECT id FROM orders WHERE status = 'pending' AND created_at >= now() - interval '1 day'"
+    ),
+    "ix_orders_customer_created": "SELECT id FROM orders WHERE customer_id = 1 ORDER BY created_at DESC LIMIT 20",
+    "ix_orders_table_status": "SELECT id FROM orders WHERE table_id = 1 AND status = 'pending'",
+    "ix_order_items_order_menu_item": "SELECT id FROM order_items WHERE order_id = 1 AND menu_item_id = 1",
+}
+
+
+def _index_names(plan: dict) -> set:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+
+def explain_check() -> dict:
+    """
+    EXPLAIN each hot query and report whether its index appears in the plan.
+    Sequential scans are disabled for the check: on a small development
+    database the planner would rightly prefer them, and the point is that the
+    index matches the predicate.
+    """
+    report = {}
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for name, query in EXPLAIN_QUERIES.items():
+                plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+                used = _index_names(plan[0]["Plan"])
+                report[name] = {"used": name in used, "plan_indexes": sorted(used)}
+    report["passed"] = all(entry["used"] for entry in report.values())
+    return report
+
+
+def upgrade():
+    """Create indexes without blocking writes (CONCURRENTLY needs autocommit)"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, definition in INDEXES:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+            logger.info(f"Created index {name}")
+        for table_name in ("reservations", "orders", "order_items"):
+            conn.execute(text(f"ANALYZE {table_name}"))
+    logger.info("Migration completed successfully")
+
+
+def downgrade():
+    """Drop the indexes added by upgrade()"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, _ in INDEXES:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    logger.info("Downgrade completed - removed performance indexes")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("Running migration: Add performance indexes...")
+    upgrade()
+    print("Migration completed!")
+    print("EXPLAIN check:", explain_check())
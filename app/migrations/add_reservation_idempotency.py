@@ -0,0 +1,40 @@
+"""
+Database migration: Add reservations.idempotency_key for retry-safe bookings
+
+Revision ID: add_reservation_idempotency
+Revises: add_dashboard_counters
+Create Date: 2026-10-17
+"""
+from sqlalchemy import text
+from app.core.database import engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade():
+    """Add the column and its unique index (built without blocking writes)"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "ALTER TABLE reservations ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(100)"
+        ))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_reservations_idempotency_key "
+            "ON reservations (idempotency_key)"
+        ))
+    logger.info("Migration completed successfully")
+
+
+def downgrade():
+    """Remove the idempotency key column"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ux_reservations_idempotency_key"))
+        conn.execute(text("ALTER TABLE reservations DROP COLUMN IF EXISTS idempotency_key"))
+    logger.info("Downgrade completed - removed idempotency_key")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("Running migration: Add reservation idempotency key...")
+    upgrade()
+    print("Migration completed!")
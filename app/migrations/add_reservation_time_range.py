@@ -0,0 +1,120 @@
+"""
+Database migration: Backfill reservations.estimated_end_time from the dining
+policy and add a materialized tstzrange slot with a GiST index
+
+Revision ID: add_reservation_time_range
+Revises: add_reservation_idempotency
+Create Date: 2026-10-17
+"""
+from sqlalchemy import text
+from app.core.database import engine
+from app.core.dining_policy import estimated_end_time
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def backfill_end_times(conn) -> int:
+    """Fill missing estimated_end_time in batches (policy is evaluated in Python)"""
+    updated = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, reservation_datetime, party_size FROM reservations "
+            "WHERE estimated_end_time IS NULL ORDER BY id LIMIT :limit"
+        ), {"limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            return updated
+        conn.execute(
+            text("UPDATE reservations SET estimated_end_time = :end WHERE id = :id"),
+            [
+                {"id": row.id, "end": estimated_end_time(row.party_size, row.reservation_datetime)}
+                for row in rows
+            ]
+        )
+        updated += len(rows)
+        logger.info(f"Backfilled {updated} reservation end times")
+
+
+def upgrade():
+    """Backfill, then add the generated range column and its partial GiST index"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        backfill_end_times(conn)
+        conn.execute(text("ALTER TABLE reservations ALTER COLUMN estimated_end_time SET NOT NULL"))
+        conn.execute(text(
+            "ALTER TABLE reservations ADD COLUMN IF NOT EXISTS time_range tstzrange "
+            "GENERATED ALWAYS AS (tstzrange(reservation_datetime, estimated_end_time, '[]')) STORED"
+        ))
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reservations_active_time_range "
+            "ON reservations USING gist (time_range) WHERE status IN ('pending', 'confirmed')"
+        ))
+        conn.execute(text("ANALYZE reservations"))
+    logger.info("Migration completed successfully")
+
+
+def backfill_check() -> dict:
+    """
+    Backfill a 12:00 lunch and a 19:00 dinner (party of 2) and read back their
+    time_range. Runs in a transaction that is rolled back (NOT NULL is dropped
+    inside it so the rows can start without an end time). Expected spans: 2h
+    for lunch, 2h plus the dinner extra for dinner.
+    """
+    from datetime import datetime, time, timedelta
+    from app.core.config import settings
+
+    day = datetime.utcnow().date() + timedelta(days=400)
+    starts = {"lunch": datetime.combine(day, time(12, 0)), "dinner": datetime.combine(day, time(19, 0))}
+    base = settings.RESERVATION_DURATION_HOURS * 60
+    expected = {"lunch": base, "dinner": base + settings.DINING_DINNER_EXTRA_MINUTES}
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            customer_id = conn.execute(text("SELECT min(id) FROM users")).scalar()
+            table_id = conn.execute(text("SELECT min(id) FROM tables")).scalar()
+            if customer_id is None or table_id is None:
+                return {"skipped": "needs at least one user and one table"}
+            conn.execute(text("ALTER TABLE reservations ALTER COLUMN estimated_end_time DROP NOT NULL"))
+            ids = {
+                name: conn.execute(text(
+                    "INSERT INTO reservations (customer_id, table_id, reservation_datetime, party_size, status) "
+                    "VALUES (:customer_id, :table_id, :start, 2, 'cancelled') RETURNING id"
+                ), {"customer_id": customer_id, "table_id": table_id, "start": start}).scalar()
+                for name, start in starts.items()
+            }
+            backfill_end_times(conn)
+            report = {}
+            for name, reservation_id in ids.items():
+                row = conn.execute(text(
+                    "SELECT lower(time_range) AS starts_at, upper(time_range) AS ends_at "
+                    "FROM reservations WHERE id = :id"
+                ), {"id": reservation_id}).one()
+                minutes = int((row.ends_at - row.starts_at).total_seconds() // 60)
+                report[name] = {
+                    "starts_at": row.starts_at.isoformat(),
+                    "span_minutes": minutes,
+                    "expected_minutes": expected[name]
+                }
+        finally:
+            transaction.rollback()
+    report["passed"] = all(entry["span_minutes"] == entry["expected_minutes"] for entry in report.values())
+    return report
+
+
+def downgrade():
+    """Drop the range column and index; end times stay filled"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_reservations_active_time_range"))
+        conn.execute(text("ALTER TABLE reservations DROP COLUMN IF EXISTS time_range"))
+        conn.execute(text("ALTER TABLE reservations ALTER COLUMN estimated_end_time DROP NOT NULL"))
+    logger.info("Downgrade completed - removed reservation time_range")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("Running migration: Add reservation time range...")
+    upgrade()
+    print("Migration completed!")
+    print("Backfill check:", backfill_check())
@@ -0,0 +1,69 @@
+"""
+Database migration: Recompute reservation end times written with the wrong
+time of day
+
+The first backfill (and updates that only changed party_size) shifted the
+stored wall-clock start into RESTAURANT_TIMEZONE before applying the dinner
+rule, so lunches got the dinner extra and dinners lost it. Rows whose end time
+matches that shifted result are recomputed; time_range follows automatically.
+
+Revision ID: fix_reservation_end_times
+Revises: add_arrival_daily_stats
+Create Date: 2026-10-17
+"""
+from sqlalchemy import text
+from app.core.database import engine
+from app.core.dining_policy import dining_duration, estimated_end_time
+from app.core.time_window import restaurant_timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def _shifted_end_time(party_size, start):
+    """End time the faulty policy produced for a start loaded from the DB"""
+    shifted = start.astimezone(restaurant_timezone()).replace(tzinfo=None)
+    return start + dining_duration(party_size, shifted)
+
+
+def fix_end_times(conn) -> int:
+    """Rewrite end times equal to the shifted result (and different from the policy); returns rows fixed"""
+    fixed, last_id = 0, 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, reservation_datetime, party_size, estimated_end_time FROM reservations "
+            "WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            return fixed
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            correct = estimated_end_time(row.party_size, row.reservation_datetime)
+            shifted = _shifted_end_time(row.party_size, row.reservation_datetime)
+            if correct != shifted and row.estimated_end_time == shifted:
+                updates.append({"id": row.id, "end": correct})
+        if updates:
+            conn.execute(text("UPDATE reservations SET estimated_end_time = :end WHERE id = :id"), updates)
+            fixed += len(updates)
+            logger.info(f"Fixed {fixed} reservation end times")
+
+
+def upgrade():
+    with engine.begin() as conn:
+        fixed = fix_end_times(conn)
+    logger.info(f"Migration completed successfully ({fixed} reservations fixed)")
+
+
+def downgrade():
+    """Nothing to undo - the previous values were wrong"""
+    logger.info("Downgrade completed - end times left as recomputed")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("Running migration: Fix reservation end times...")
+    upgrade()
+    print("Migration completed!")
@@ -0,0 +1,39 @@
+"""
+Database migration: Rebuild arrival_daily_stats on wall-clock days
+
+The first rollup bucketed reservation_datetime in RESTAURANT_TIMEZONE, shifting
+the stored wall-clock times by the zone offset (evening bookings landed on the
+next day, hours were off by the offset). Every completed day is recomputed.
+
+Revision ID: rebuild_arrival_daily_stats
+Revises: fix_reservation_end_times
+Create Date: 2026-10-17
+"""
+from app.core.database import SessionLocal
+from app.crud.arrival_stats import arrival_stats
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade():
+    """Drop the shifted rollup rows and roll up every completed day again"""
+    db = SessionLocal()
+    try:
+        days = arrival_stats.rebuild(db)
+        logger.info(f"Rebuilt {days} days of arrivals")
+    finally:
+        db.close()
+    logger.info("Migration completed successfully")
+
+
+def downgrade():
+    """Nothing to undo - the rebuilt rows replace the shifted ones"""
+    logger.info("Downgrade completed - no changes")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("Running migration: Rebuild arrival daily stats...")
+    upgrade()
+    print("Migration completed!")
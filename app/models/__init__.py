@@ -3,11 +3,15 @@ from .user import User, UserRole
 from .menu import Category, MenuItem
 from .table import Table, TableStatus
 from .order import Order, OrderItem, Reservation, OrderStatus, PaymentStatus, ReservationStatus
+from .counter import DashboardCounter
+from .arrival_stats import ArrivalDailyStats
 
 __all__ = [
     "User", "UserRole",
     "Category", "MenuItem",
     "Table", "TableStatus",
     "Order", "OrderItem", "Reservation",
-    "OrderStatus", "PaymentStatus", "ReservationStatus"
+    "OrderStatus", "PaymentStatus", "ReservationStatus",
+    "DashboardCounter",
+    "ArrivalDailyStats"
 ]
\ No newline at end of file
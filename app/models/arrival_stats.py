@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Date, Integer, Float, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ArrivalDailyStats(Base):
+    """Per-day arrival rollup (restaurant-local day of the reservation)"""
+    __tablename__ = "arrival_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    total_arrivals = Column(Integer, default=0, nullable=False)
+    early = Column(Integer, default=0, nullable=False)
+    on_time = Column(Integer, default=0, nullable=False)
+    late = Column(Integer, default=0, nullable=False)
+    very_late = Column(Integer, default=0, nullable=False)
+    no_show = Column(Integer, default=0, nullable=False)
+    sum_difference_minutes = Column(Float, default=0.0, nullable=False)
+    # {"<minutes late, clamped>": count} - merged across days for percentiles
+    minute_counts = Column(JSONB, default=dict, nullable=False)
+    # {"<local hour>": [arrivals, sum_difference_minutes, no_shows]}
+    hour_stats = Column(JSONB, default=dict, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class DashboardCounter(Base):
+    """Incrementally maintained dashboard metric, e.g. "orders:status:pending" """
+    __tablename__ = "dashboard_counters"
+
+    key = Column(String, primary_key=True)
+    value = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Index, Enum as SQLEnum, text, Computed, event, inspect
+from sqlalchemy.dialects.postgresql import TSTZRANGE
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.dining_policy import estimated_end_time
 import enum
 
 
@@ -44,7 +46,15 @@ class Reservation(Base):
     # Arrival tracking fields
     actual_arrival_time = Column(DateTime(timezone=True), nullable=True)
     arrival_status = Column(String(50), nullable=True)  # early, on_time, late, very_late, no_show
-    estimated_end_time = Column(DateTime(timezone=True), nullable=True)
+    estimated_end_time = Column(DateTime(timezone=True), nullable=False)  # Filled from the dining policy
+    # Materialized [start, end] slot, used for && / @> overlap probes
+    time_range = Column(
+        TSTZRANGE,
+        Computed("tstzrange(reservation_datetime, estimated_end_time, '[]')", persisted=True)
+    )
+
+    # Client-supplied key so retried booking requests return the original reservation
+    idempotency_key = Column(String(100), nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -53,6 +63,42 @@ class Reservation(Base):
     customer = relationship("User", back_populates="reservations")
     table = relationship("Table", back_populates="reservations")
 
+    __table_args__ = (
+        # Overlap checks only ever look at active reservations of one table
+        Index(
+            "ix_reservations_active_table_window",
+            "table_id", "reservation_datetime", "estimated_end_time",
+            postgresql_where=text("status IN ('pending', 'confirmed')"),
+        ),
+        Index(
+            "ix_reservations_active_time_range",
+            "time_range",
+            postgresql_using="gist",
+            postgresql_where=text("status IN ('pending', 'confirmed')"),
+        ),
+        Index("ix_reservations_status_datetime", "status", "reservation_datetime"),
+        Index("ix_reservations_customer_created", "customer_id", "created_at"),
+        Index("ix_reservations_created_at", "created_at", "id"),
+        Index("ux_reservations_idempotency_key", "idempotency_key", unique=True),
+    )
+
+
+@event.listens_for(Reservation, "before_insert")
+def _fill_estimated_end_time(mapper, connection, target):
+    if target.estimated_end_time is None and target.reservation_datetime is not None:
+        target.estimated_end_time = estimated_end_time(target.party_size, target.reservation_datetime)
+
+
+@event.listens_for(Reservation, "before_update")
+def _refresh_estimated_end_time(mapper, connection, target):
+    state = inspect(target)
+    rescheduled = (
+        state.attrs.reservation_datetime.history.has_changes()
+        or state.attrs.party_size.history.has_changes()
+    )
+    if rescheduled and not state.attrs.estimated_end_time.history.has_changes():
+        target.estimated_end_time = estimated_end_time(target.party_size, target.reservation_datetime)
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -77,6 +123,13 @@ class Order(Base):
     table = relationship("Table", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_orders_created_at", "created_at", "id"),
+        Index("ix_orders_status_created", "status", "created_at"),
+        Index("ix_orders_customer_created", "customer_id", "created_at"),
+        Index("ix_orders_table_status", "table_id", "status"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -92,4 +145,8 @@ class OrderItem(Base):
 
     # Relationships
     order = relationship("Order", back_populates="order_items")
-    menu_item = relationship("MenuItem", back_populates="order_items")
\ No newline at end of file
+    menu_item = relationship("MenuItem", back_populates="order_items")
+
+    __table_args__ = (
+        Index("ix_order_items_order_menu_item", "order_id", "menu_item_id"),
+    )
\ No newline at end of file
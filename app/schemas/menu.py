@@ -120,6 +120,7 @@ class PaginatedMenuResponse(BaseModel):
     page: int
     size: int
     pages: int
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
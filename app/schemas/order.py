@@ -221,6 +221,9 @@ class DashboardStats(BaseModel):
     recent_reservations: List[dict] = []
     popular_items: List[dict] = []
 
+    # Snapshot time (stats may be served from cache for a few seconds)
+    generated_at: Optional[datetime] = None
+
 # Paginated Response Schemas
 class PaginatedReservationResponse(BaseModel):
     items: List[ReservationWithDetails]
@@ -228,6 +231,8 @@ class PaginatedReservationResponse(BaseModel):
     page: int
     size: int
     pages: int
+    total_is_estimate: bool = False
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -237,6 +242,8 @@ class PaginatedOrderResponse(BaseModel):
     total: int
     skip: int
     limit: int
+    total_is_estimate: bool = False
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
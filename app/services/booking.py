@@ -0,0 +1,191 @@
+"""
+Booking Service for RestoBot
+Đặt bàn nguyên tử: khóa theo bàn (advisory lock) + idempotency key cho các lần gửi lại
+"""
+from typing import List, Optional, Tuple
+from datetime import datetime
+import logging
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.order import Reservation, ReservationStatus
+from app.schemas.order import ReservationCreate
+from app.crud.order import reservation as reservation_crud
+from app.crud.table import table as table_crud
+from app.core.dining_policy import estimated_end_time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock namespaces (first key of the two-int form)
+TABLE_LOCK_NAMESPACE = 7301
+IDEMPOTENCY_LOCK_NAMESPACE = 7302
+
+
+class BookingConflict(Exception):
+    """No requested/candidate table is free for the slot"""
+
+
+class IdempotencyKeyReused(Exception):
+    """The idempotency key already belongs to another customer's booking"""
+
+
+class IdempotencyKeyExpired(Exception):
+    """The idempotency key belongs to a booking that is no longer active (cancelled, no-show, ...)"""
+
+
+# Only an active booking is replayed; a key whose booking has since ended is rejected
+REPLAYABLE_STATUSES = (ReservationStatus.pending, ReservationStatus.confirmed)
+
+
+class BookingService:
+    """
+    Serializes bookings per table with pg_advisory_xact_lock so the conflict
+    check and the insert happen atomically; locks are released on commit/rollback
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _lock_table(self, table_id: int) -> None:
+        self.db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :table_id)"),
+            {"namespace": TABLE_LOCK_NAMESPACE, "table_id": table_id}
+        )
+
+    def _lock_idempotency_key(self, idempotency_key: str) -> None:
+        self.db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:key))"),
+            {"namespace": IDEMPOTENCY_LOCK_NAMESPACE, "key": idempotency_key}
+        )
+
+    def replay(self, idempotency_key: str, customer_id: Optional[int]) -> Optional[Reservation]:
+        """Active reservation previously created with this key, if any"""
+        existing = reservation_crud.get_by_idempotency_key(self.db, idempotency_key)
+        if existing and customer_id is not None and existing.customer_id != customer_id:
+            raise IdempotencyKeyReused()
+        if existing and existing.status not in REPLAYABLE_STATUSES:
+            raise IdempotencyKeyExpired()
+        return existing
+
+    def has_conflict(self, table_id: int, start: datetime, end: datetime) -> bool:
+        """Active reservation on the table overlapping [start, end]"""
+        return self.db.query(Reservation.id).filter(
+            Reservation.table_id == table_id,
+            table_crud._reservation_conflict_filter(start, end)
+        ).first() is not None
+
+    def book(
+        self,
+        reservation_in: ReservationCreate,
+        table_ids: List[int],
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Reservation, bool]:
+        """
+        Book the first free table of table_ids (in preference order).
+        Returns (reservation, created); created is False for an idempotent replay.
+        """
+        start = reservation_in.reservation_date
+        end = estimated_end_time(reservation_in.party_size, start)
+        for table_id in table_ids:
+            if idempotency_key:
+                self._lock_idempotency_key(idempotency_key)
+                existing = self.replay(idempotency_key, reservation_in.customer_id)
+                if existing:
+                    self.db.rollback()
+                    return existing, False
+
+            self._lock_table(table_id)
+            if self.has_conflict(table_id, start, end):
+                # Release the locks before trying the next candidate
+                self.db.rollback()
+                continue
+
+            reservation_in.table_id = table_id
+            try:
+                # create() commits, which releases both advisory locks
+                return reservation_crud.create(
+                    self.db, obj_in=reservation_in, idempotency_key=idempotency_key
+                ), True
+            except IntegrityError:
+                self.db.rollback()
+                existing = idempotency_key and self.replay(idempotency_key, reservation_in.customer_id)
+                if existing:
+                    return existing, False
+                raise
+        raise BookingConflict()
+
+
+def create_booking_service(db: Session) -> BookingService:
+    """Factory function to create booking service"""
+    return BookingService(db)
+
+
+def load_test(table_id: int, customer_id: int, reservation_datetime: datetime,
+              workers: int = 200, party_size: int = 2) -> dict:
+    """
+    Fire `workers` concurrent bookings for the same table and slot, each on its
+    own session, then count what landed. Expect exactly one booking.
+    Creates a real reservation - run against a test database.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from app.core.database import SessionLocal
+
+    def attempt(i: int) -> str:
+        db = SessionLocal()
+        try:
+            create_booking_service(db).book(
+                ReservationCreate(
+                    customer_id=customer_id,
+                    table_id=table_id,
+                    reservation_date=reservation_datetime,
+                    party_size=party_size,
+                    notes=f"load test {i}"
+                ),
+                [table_id]
+            )
+            return "booked"
+        except BookingConflict:
+            return "conflict"
+        except Exception as e:
+            logger.error(f"Load test attempt {i} failed: {e}")
+            return "error"
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    # Every waiter holds a pooled connection while blocked on the table lock
+    threads = min(workers, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(attempt, range(workers)))
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        overlapping = db.query(func.count(Reservation.id)).filter(
+            Reservation.table_id == table_id,
+            Reservation.reservation_datetime == reservation_datetime,
+            Reservation.status.in_([ReservationStatus.pending, ReservationStatus.confirmed])
+        ).scalar()
+    finally:
+        db.close()
+    return {
+        "attempts": workers,
+        "booked": outcomes.count("booked"),
+        "conflicts": outcomes.count("conflict"),
+        "errors": outcomes.count("error"),
+        "reservations_in_db": overlapping,
+        "double_bookings": max(overlapping - 1, 0),
+        "requests_per_second": round(workers / elapsed, 1)
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 4:
+        print("Usage: python -m app.services.booking <table_id> <customer_id> <YYYY-MM-DDTHH:MM>")
+        sys.exit(1)
+    print(load_test(int(sys.argv[1]), int(sys.argv[2]), datetime.fromisoformat(sys.argv[3])))
@@ -0,0 +1,58 @@
+"""
+Bulk Availability for RestoBot
+Tải bàn và các đặt bàn đang hoạt động một lần, rồi trả lời nhiều câu hỏi còn bàn trống trong bộ nhớ
+"""
+from typing import Dict, List, Tuple
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.table import Table
+from app.models.order import Reservation
+from app.crud.table import table as table_crud
+from app.core.time_window import naive_utc
+from app.core.dining_policy import estimated_end_time, max_dining_duration
+
+
+class AvailabilityScan:
+    """Available tables and their active reservation windows over a date range"""
+
+    def __init__(self, tables: List[Table], windows: Dict[int, List[Tuple[datetime, datetime]]]):
+        self.tables = sorted(tables, key=lambda t: (t.capacity, t.id))
+        self.windows = windows
+
+    def _is_free(self, table_id: int, start: datetime, end: datetime) -> bool:
+        # Closed intervals, same as the tstzrange '[]' && probe
+        return not any(
+            start <= other_end and end >= other_start
+            for other_start, other_end in self.windows.get(table_id, ())
+        )
+
+    def free_tables(self, reservation_datetime: datetime, guests: int) -> List[Table]:
+        # Same policy-derived hold that booking checks and stores
+        start = naive_utc(reservation_datetime)
+        end = estimated_end_time(guests, start)
+        return [
+            t for t in self.tables
+            if t.capacity >= guests and self._is_free(t.id, start, end)
+        ]
+
+    def free_counts(self, slots: List[datetime], guests: int) -> Dict[datetime, int]:
+        """Number of free tables for every slot"""
+        return {slot: len(self.free_tables(slot, guests)) for slot in slots}
+
+
+async def load_availability_scan(db: AsyncSession, start: datetime, end: datetime) -> AvailabilityScan:
+    """One table query and one reservation scan covering bookings from start to end"""
+    result = await db.execute(table_crud._available_tables_filter(select(Table)))
+    tables = result.scalars().all()
+
+    # Bookings starting up to end must be checked against reservations until end + the longest hold
+    result = await db.execute(
+        select(Reservation.table_id, Reservation.reservation_datetime, Reservation.estimated_end_time)
+        .where(table_crud._reservation_conflict_filter(start, end + max_dining_duration()))
+        .where(Reservation.table_id.in_([t.id for t in tables]))
+    )
+    windows: Dict[int, List[Tuple[datetime, datetime]]] = {}
+    for table_id, starts_at, ends_at in result.all():
+        windows.setdefault(table_id, []).append((naive_utc(starts_at), naive_utc(ends_at)))
+    return AvailabilityScan(tables, windows)
@@ -3,12 +3,23 @@ Customer Arrival Tracking System for RestoBot
 Theo dõi thời gian khách hàng đến so với reservation
 """
 from typing import Optional, List
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 from app.models.order import Reservation, ReservationStatus
 from app.models.table import Table, TableStatus
+from app.models.user import User
 from app.services.table_status_manager import create_table_status_manager
+from app.services.dashboard_cache import dashboard_cache
+from app.services.reservation_index import reservation_index
+from app.services.floor_projection import floor_projection
+from app.services import event_stream
+from app.core.time_window import today_window, wall_clock_now
+from app.crud.arrival_stats import arrival_stats as arrival_stats_crud
+from app.crud.counter import (
+    counter as counter_crud, reservation_status_key, table_status_key, transition, merge
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,6 +46,12 @@ class ArrivalRecord(BaseModel):
     party_size: int
 
 
+class NoShowSweep(BaseModel):
+    """Result of a no-show sweep"""
+    reservation_ids: List[int] = []
+    released_table_ids: List[int] = []
+
+
 class CustomerArrivalTracker:
     """
     Tracker để quản lý việc khách hàng đến nhà hàng
@@ -55,13 +72,15 @@ class CustomerArrivalTracker:
         """
         Record customer arrival and update reservation status
         """
-        # Get reservation
-        reservation = self.db.query(Reservation).filter(
-            Reservation.id == reservation_id
-        ).first()
+        # Get reservation (customer name joined in, so nothing lazy-loads later)
+        row = self.db.query(Reservation, User.full_name)\
+            .outerjoin(User, Reservation.customer_id == User.id)\
+            .filter(Reservation.id == reservation_id).first()
 
-        if not reservation:
+        if not row:
             raise ValueError(f"Reservation {reservation_id} not found")
+        reservation, customer_name = row
+        customer_name = customer_name or "Guest"
 
         if reservation.status == ReservationStatus.cancelled:
             raise ValueError("Cannot record arrival for cancelled reservation")
@@ -84,9 +103,15 @@ class CustomerArrivalTracker:
         # Update reservation status to confirmed if it was pending
         if reservation.status == ReservationStatus.pending:
             reservation.status = ReservationStatus.confirmed
+            counter_crud.bump(self.db, transition(
+                reservation_status_key(ReservationStatus.pending),
+                reservation_status_key(ReservationStatus.confirmed)
+            ))
 
         self.db.commit()
+        dashboard_cache.invalidate()
         self.db.refresh(reservation)
+        floor_projection.upsert_reservation(reservation, customer_name=customer_name)
 
         # Update table status to occupied
         if reservation.table_id:
@@ -101,7 +126,7 @@ class CustomerArrivalTracker:
             arrival_status=arrival_status,
             minutes_difference=int(time_diff),
             table_id=reservation.table_id,
-            customer_name=reservation.customer.full_name if reservation.customer else "Guest",
+            customer_name=customer_name,
             party_size=reservation.party_size
         )
 
@@ -127,36 +152,76 @@ class CustomerArrivalTracker:
         else:
             return ArrivalStatus.NO_SHOW
 
-    def check_for_no_shows(self, threshold_minutes: int = 60) -> List[Reservation]:
+    def check_for_no_shows(self, threshold_minutes: int = 60) -> NoShowSweep:
         """
         Check for no-show reservations (customers who didn't arrive)
+        Two set-based UPDATE ... RETURNING statements: one cancels the overdue
+        reservations, one releases their still-reserved tables
         """
-        current_time = datetime.utcnow()
+        current_time = wall_clock_now()
         threshold_time = current_time - timedelta(minutes=threshold_minutes)
 
-        # Find confirmed reservations that are past due without arrival record
-        no_show_reservations = self.db.query(Reservation).filter(
-            Reservation.status == ReservationStatus.confirmed,
-            Reservation.reservation_datetime <= threshold_time,
-            Reservation.actual_arrival_time.is_(None)
+        # Cancel confirmed reservations that are past due without arrival record;
+        # the WHERE is re-checked on each row, so a concurrent check-in wins
+        swept = self.db.execute(
+            update(Reservation).where(
+                Reservation.status == ReservationStatus.confirmed,
+                Reservation.reservation_datetime <= threshold_time,
+                Reservation.actual_arrival_time.is_(None)
+            ).values(
+                status=ReservationStatus.cancelled,
+                arrival_status=ArrivalStatus.NO_SHOW
+            ).returning(Reservation.id, Reservation.table_id)
+            .execution_options(synchronize_session=False)
         ).all()
+        if not swept:
+            self.db.rollback()
+            return NoShowSweep()
+
+        # Release their tables in one statement
+        table_ids = {table_id for _, table_id in swept if table_id is not None}
+        released = []
+        if table_ids:
+            released = self.db.execute(
+                update(Table).where(
+                    Table.id.in_(table_ids),
+                    Table.status == TableStatus.reserved
+                ).values(status=TableStatus.available)
+                .returning(Table.id, Table.table_number)
+                .execution_options(synchronize_session=False)
+            ).all()
+
+        counter_crud.bump(self.db, merge(
+            transition(
+                reservation_status_key(ReservationStatus.confirmed),
+                reservation_status_key(ReservationStatus.cancelled),
+                len(swept)
+            ),
+            transition(
+                table_status_key(TableStatus.reserved),
+                table_status_key(TableStatus.available),
+                len(released)
+            )
+        ))
+        for table in released:
+            event_stream.publish_table_status(self.db, table, TableStatus.reserved, TableStatus.available)
+        self.db.commit()
+        dashboard_cache.invalidate()
 
-        # Update status to cancelled for no-shows
-        for reservation in no_show_reservations:
-            reservation.status = ReservationStatus.cancelled
-            reservation.arrival_status = ArrivalStatus.NO_SHOW
-            
-            # Release table
-            if reservation.table_id:
-                table = self.db.query(Table).filter(Table.id == reservation.table_id).first()
-                if table and table.status == TableStatus.reserved:
-                    table.status = TableStatus.available
-
-        if no_show_reservations:
-            self.db.commit()
-            logger.info(f"Marked {len(no_show_reservations)} reservations as no-show")
-
-        return no_show_reservations
+        sweep = NoShowSweep(
+            reservation_ids=sorted(reservation_id for reservation_id, _ in swept),
+            released_table_ids=sorted(table_id for table_id, _ in released)
+        )
+        for reservation_id in sweep.reservation_ids:
+            reservation_index.remove(reservation_id)
+            floor_projection.remove_reservation(reservation_id)
+        for table_id in sweep.released_table_ids:
+            floor_projection.set_table_status(table_id, TableStatus.available)
+        logger.info(
+            f"Marked {len(sweep.reservation_ids)} reservations as no-show, "
+            f"released {len(sweep.released_table_ids)} tables"
+        )
+        return sweep
 
     def get_arrival_statistics(
         self, 
@@ -165,76 +230,33 @@ class CustomerArrivalTracker:
     ) -> dict:
         """
         Get arrival statistics for analysis
+        Aggregated in SQL; whole days come from the arrival_daily_stats rollup
         """
-        query = self.db.query(Reservation).filter(
-            Reservation.actual_arrival_time.isnot(None)
-        )
-
-        if start_date:
-            query = query.filter(Reservation.reservation_datetime >= start_date)
-        if end_date:
-            query = query.filter(Reservation.reservation_datetime <= end_date)
-
-        arrivals = query.all()
-
-        if not arrivals:
-            return {
-                "total_arrivals": 0,
-                "early": 0,
-                "on_time": 0,
-                "late": 0,
-                "very_late": 0,
-                "no_show": 0,
-                "average_difference_minutes": 0
-            }
-
-        # Count by status
-        status_counts = {
-            ArrivalStatus.EARLY: 0,
-            ArrivalStatus.ON_TIME: 0,
-            ArrivalStatus.LATE: 0,
-            ArrivalStatus.VERY_LATE: 0,
-            ArrivalStatus.NO_SHOW: 0
-        }
-
-        total_diff = 0
-        for arrival in arrivals:
-            status = arrival.arrival_status or ArrivalStatus.ON_TIME
-            status_counts[status] = status_counts.get(status, 0) + 1
-            
-            if arrival.actual_arrival_time and arrival.reservation_datetime:
-                diff = (arrival.actual_arrival_time - arrival.reservation_datetime).total_seconds() / 60
-                total_diff += diff
-
-        avg_diff = total_diff / len(arrivals) if arrivals else 0
-
-        return {
-            "total_arrivals": len(arrivals),
-            "early": status_counts[ArrivalStatus.EARLY],
-            "on_time": status_counts[ArrivalStatus.ON_TIME],
-            "late": status_counts[ArrivalStatus.LATE],
-            "very_late": status_counts[ArrivalStatus.VERY_LATE],
-            "no_show": status_counts[ArrivalStatus.NO_SHOW],
-            "average_difference_minutes": round(avg_diff, 1)
-        }
+        return arrival_stats_crud.get_statistics(self.db, start_date=start_date, end_date=end_date)
 
     def get_todays_arrivals(self) -> List[dict]:
         """
         Get today's arrival records
+        One joined query returning only the columns the response needs
         """
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
-
-        arrivals = self.db.query(Reservation).filter(
-            Reservation.actual_arrival_time >= today_start,
-            Reservation.actual_arrival_time < today_end
-        ).order_by(Reservation.actual_arrival_time.desc()).all()
+        arrivals = self.db.query(
+            Reservation.id,
+            Reservation.party_size,
+            Reservation.reservation_datetime,
+            Reservation.actual_arrival_time,
+            Reservation.arrival_status,
+            User.full_name.label("customer_name"),
+            Table.table_number
+        ).outerjoin(User, Reservation.customer_id == User.id)\
+         .outerjoin(Table, Reservation.table_id == Table.id)\
+         .filter(today_window().filter(Reservation.actual_arrival_time))\
+         .order_by(Reservation.actual_arrival_time.desc()).all()
 
         return [
             {
                 "reservation_id": arr.id,
-                "customer_name": arr.customer.full_name if arr.customer else "Guest",
-                "table_number": arr.table.table_number if arr.table else "N/A",
+                "customer_name": arr.customer_name or "Guest",
+                "table_number": arr.table_number or "N/A",
                 "party_size": arr.party_size,
                 "reservation_time": arr.reservation_datetime.isoformat(),
                 "arrival_time": arr.actual_arrival_time.isoformat(),
@@ -246,23 +268,111 @@ class CustomerArrivalTracker:
             for arr in arrivals
         ]
 
-    def notify_upcoming_arrivals(self, minutes_ahead: int = 30) -> List[Reservation]:
+    def notify_upcoming_arrivals(self, minutes_ahead: int = 30) -> list:
         """
         Get reservations with upcoming arrival times (for notification)
+        Rows carry the reservation columns plus customer_name, customer_phone and table_number
         """
-        current_time = datetime.utcnow()
+        current_time = wall_clock_now()
         upcoming_time = current_time + timedelta(minutes=minutes_ahead)
 
-        upcoming_reservations = self.db.query(Reservation).filter(
+        upcoming_reservations = self.db.query(
+            Reservation.id,
+            Reservation.party_size,
+            Reservation.reservation_datetime,
+            User.full_name.label("customer_name"),
+            User.phone.label("customer_phone"),
+            Table.table_number
+        ).outerjoin(User, Reservation.customer_id == User.id)\
+         .outerjoin(Table, Reservation.table_id == Table.id)\
+         .filter(
             Reservation.status == ReservationStatus.confirmed,
             Reservation.reservation_datetime >= current_time,
             Reservation.reservation_datetime <= upcoming_time,
             Reservation.actual_arrival_time.is_(None)
-        ).all()
+        ).order_by(Reservation.reservation_datetime).all()
 
         return upcoming_reservations
 
 
 def create_arrival_tracker(db: Session) -> CustomerArrivalTracker:
     """Factory function to create CustomerArrivalTracker"""
-    return CustomerArrivalTracker(db)
\ No newline at end of file
+    return CustomerArrivalTracker(db)
+
+def query_count_check(db: Session, arrivals: int = 300) -> dict:
+    """
+    Regression check for the arrival endpoints: seed `arrivals` arrived and
+    upcoming reservations in an uncommitted transaction, count the SQL
+    statements each read issues, then roll back. Every read must cost exactly
+    one query however many rows it returns (it was 1 + 2 per row with lazy loads).
+    """
+    from sqlalchemy import event
+
+    customer_id = db.query(User.id).order_by(User.id).limit(1).scalar()
+    table_ids = [table_id for (table_id,) in db.query(Table.id).order_by(Table.id).limit(20)]
+    if customer_id is None or not table_ids:
+        return {"skipped": "needs at least one user and one table"}
+
+    now = datetime.utcnow()
+    schedule_now = wall_clock_now()  # reservation times are wall-clock, arrivals are UTC instants
+    db.add_all([
+        Reservation(
+            customer_id=customer_id,
+            table_id=table_ids[i % len(table_ids)],
+            reservation_datetime=schedule_now - timedelta(minutes=i % 60),
+            actual_arrival_time=now,
+            arrival_status=ArrivalStatus.ON_TIME,
+            party_size=2,
+            status=ReservationStatus.confirmed
+        )
+        for i in range(arrivals)
+    ] + [
+        Reservation(
+            customer_id=customer_id,
+            table_id=table_ids[i % len(table_ids)],
+            reservation_datetime=schedule_now + timedelta(minutes=5 + i % 20),
+            party_size=2,
+            status=ReservationStatus.confirmed
+        )
+        for i in range(arrivals)
+    ])
+    db.flush()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    tracker = create_arrival_tracker(db)
+    connection = db.connection()
+    report = {}
+    try:
+        for name, read in (
+            ("today", tracker.get_todays_arrivals),
+            ("upcoming", lambda: [
+                (row.customer_name, row.customer_phone, row.table_number)
+                for row in tracker.notify_upcoming_arrivals(minutes_ahead=30)
+            ]),
+        ):
+            statements.clear()
+            event.listen(connection, "before_cursor_execute", count_statement)
+            try:
+                rows = len(read())
+            finally:
+                event.remove(connection, "before_cursor_execute", count_statement)
+            report[name] = {"rows": rows, "queries": len(statements)}
+    finally:
+        db.rollback()
+    report["passed"] = all(entry["queries"] == 1 for entry in report.values())
+    return report
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print("Query counts:", query_count_check(session))
+    finally:
+        session.close()
@@ -0,0 +1,67 @@
+"""
+Dashboard Snapshot Cache for RestoBot
+Giữ kết quả thống kê dashboard trong bộ nhớ, làm mới theo TTL hoặc khi có ghi dữ liệu
+"""
+from typing import Any, Callable, Dict, NamedTuple
+from datetime import datetime
+import hashlib
+import json
+import threading
+import time
+from app.core.config import settings
+
+
+class Snapshot(NamedTuple):
+    """Cached value with the metadata needed for conditional requests"""
+    value: Any
+    generated_at: datetime
+    etag: str
+
+
+def compute_etag(value: Any) -> str:
+    """Strong ETag derived from the JSON content of the value"""
+    payload = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return '"' + hashlib.sha1(payload).hexdigest() + '"'
+
+
+class DashboardCache:
+    """
+    In-process TTL cache of dashboard snapshots, invalidated after writes
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}  # key -> (expires_at, version, Snapshot)
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Snapshot:
+        """Return the cached snapshot for key, recomputing it if expired or invalidated"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and entry[1] == self._version:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            version = self._version
+
+        value = compute()
+        snapshot = Snapshot(value=value, generated_at=datetime.utcnow(), etag=compute_etag(value))
+
+        with self._lock:
+            # Don't store a result computed before a concurrent invalidation
+            if version == self._version:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, version, snapshot)
+        return snapshot
+
+    def invalidate(self) -> None:
+        """Drop every snapshot; called after orders, reservations or table statuses change"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+dashboard_cache = DashboardCache(settings.DASHBOARD_CACHE_TTL_SECONDS)
@@ -0,0 +1,338 @@
+"""
+Event Stream for RestoBot
+Đẩy sự kiện thay đổi trạng thái bàn / order / đặt bàn tới màn hình nhân viên và bếp (SSE),
+phát qua Postgres LISTEN/NOTIFY để mọi worker đều nhận được
+"""
+from typing import AsyncIterator, Deque, Iterable, List, Optional, Set
+from collections import deque
+from datetime import datetime
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "restobot_events"
+
+TABLE_STATUS = "table.status"
+ORDER_STATUS = "order.status"
+RESERVATION_CREATED = "reservation.created"
+RESYNC = "resync"
+KEEPALIVE = "keepalive"
+
+_sequence = itertools.count(1)
+
+
+def status_value(enum_value):
+    return getattr(enum_value, "value", enum_value)
+
+
+def publish(db: Session, event_type: str, data: dict) -> None:
+    """
+    Queue an event on the caller's transaction. Postgres delivers NOTIFY only
+    when that transaction commits, so rolled-back changes never reach clients.
+    The id is assigned here so every worker replays the same event under the same id.
+    """
+    event = {
+        "id": f"{time.time_ns()}-{os.getpid()}-{next(_sequence)}",
+        "type": event_type,
+        "at": datetime.utcnow().isoformat(),
+        "data": data
+    }
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": json.dumps(event, default=str)}
+    )
+
+
+def publish_table_status(db: Session, table, old_status, new_status) -> None:
+    if status_value(old_status) != status_value(new_status):
+        publish(db, TABLE_STATUS, {
+            "table_id": table.id,
+            "table_number": table.table_number,
+            "old_status": status_value(old_status),
+            "new_status": status_value(new_status)
+        })
+
+
+def publish_order_status(db: Session, order, old_status) -> None:
+    if status_value(old_status) != status_value(order.status):
+        publish(db, ORDER_STATUS, {
+            "order_id": order.id,
+            "order_number": order.order_number,
+            "table_id": order.table_id,
+            "old_status": status_value(old_status),
+            "new_status": status_value(order.status)
+        })
+
+
+def publish_reservation_created(db: Session, reservation) -> None:
+    publish(db, RESERVATION_CREATED, {
+        "reservation_id": reservation.id,
+        "table_id": reservation.table_id,
+        "reservation_datetime": reservation.reservation_datetime,
+        "party_size": reservation.party_size,
+        "status": status_value(reservation.status)
+    })
+
+
+class EventFilter:
+    """Per-client filter: event type prefixes (e.g. "table", "order.status") and table ids"""
+
+    def __init__(self, types: Optional[Iterable[str]] = None, table_ids: Optional[Iterable[int]] = None):
+        self.types = tuple(t for t in (types or ()) if t)
+        self.table_ids: Optional[Set[int]] = set(table_ids) if table_ids else None
+
+    def matches(self, event: dict) -> bool:
+        if self.types and not event["type"].startswith(self.types):
+            return False
+        if self.table_ids is not None and event["data"].get("table_id") not in self.table_ids:
+            return False
+        return True
+
+
+class Subscriber:
+    def __init__(self, event_filter: EventFilter, queue_size: int):
+        self.filter = event_filter
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Set when events were lost (slow client, listener reconnect); the stream sends a resync
+        self.needs_resync = False
+
+
+class EventBroker:
+    """
+    Per-worker fan-out of NOTIFY events to SSE subscribers.
+
+    Idle subscribers cost one pending Queue.get() each; a single heartbeat task
+    per worker wakes them for keep-alives and nothing polls the database. Recent events are kept in a ring buffer so a
+    reconnecting client (Last-Event-ID) gets what it missed, or a resync
+    snapshot when the id is too old or unknown.
+    """
+
+    def __init__(self, history_size: int = 1000, queue_size: int = 256, heartbeat_seconds: float = 15.0):
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.subscribers: Set[Subscriber] = set()
+        self.history: Deque[dict] = deque(maxlen=history_size)
+        self.delivered = 0
+        self.dropped = 0
+        self.listening = False
+        self._listener_task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    def subscribe(self, event_filter: EventFilter) -> Subscriber:
+        subscriber = Subscriber(event_filter, self.queue_size)
+        self.subscribers.add(subscriber)
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.get_running_loop().create_task(
+                self._heartbeat(), name="event-stream-heartbeat"
+            )
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def replay_after(self, last_event_id: str) -> Optional[List[dict]]:
+        """Events after last_event_id, or None when that id is no longer buffered"""
+        events = list(self.history)
+        for position, event in enumerate(events):
+            if event["id"] == last_event_id:
+                return events[position + 1:]
+        return None
+
+    def dispatch(self, event: dict) -> None:
+        """Deliver one event to every matching subscriber (event loop thread only)"""
+        self.history.append(event)
+        for subscriber in self.subscribers:
+            if subscriber.needs_resync or not subscriber.filter.matches(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                subscriber.needs_resync = True
+
+    async def _heartbeat(self) -> None:
+        # Ends once the last subscriber leaves; the next subscribe() restarts it
+        while self.subscribers:
+            await asyncio.sleep(self.heartbeat_seconds)
+            for subscriber in list(self.subscribers):
+                if subscriber.queue.empty():
+                    subscriber.queue.put_nowait({"id": None, "type": KEEPALIVE, "data": {}})
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            self.dispatch(json.loads(payload))
+        except Exception as e:
+            logger.error(f"Invalid event payload on {channel}: {e}")
+
+    def _mark_all_for_resync(self) -> None:
+        for subscriber in self.subscribers:
+            subscriber.needs_resync = True
+            # Wake the stream so the resync goes out immediately
+            if subscriber.queue.empty():
+                subscriber.queue.put_nowait({"id": None, "type": RESYNC, "data": {}})
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        backoff = 1.0
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(settings.DATABASE_URL)
+                lost = asyncio.get_running_loop().create_future()
+                connection.add_termination_listener(lambda _: lost.done() or lost.set_result(None))
+                await connection.add_listener(CHANNEL, self._on_notify)
+                self.listening = True
+                backoff = 1.0
+                logger.info(f"Event stream listening on {CHANNEL}")
+                await lost
+                logger.warning("Event stream listener connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event stream listener error: {e}")
+            finally:
+                self.listening = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            # Anything published while disconnected is gone - make every client resync
+            self._mark_all_for_resync()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def start(self) -> None:
+        if self._listener_task is None:
+            self._listener_task = asyncio.get_running_loop().create_task(
+                self._listen(), name="event-stream-listener"
+            )
+
+    async def stop(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            await asyncio.gather(self._listener_task, return_exceptions=True)
+            self._listener_task = None
+
+    def stats(self) -> dict:
+        return {
+            "listening": self.listening,
+            "subscribers": len(self.subscribers),
+            "buffered_events": len(self.history),
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+
+event_broker = EventBroker()
+
+
+def format_sse(event_type: str, data, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def resync_snapshot() -> dict:
+    """Full floor state (tables, reservations, open orders) from the floor projection"""
+    from app.services.floor_projection import floor_projection
+
+    snapshot = floor_projection.snapshot()
+    return {**snapshot.value, "etag": snapshot.etag}
+
+
+async def event_stream(
+    event_filter: EventFilter,
+    last_event_id: Optional[str] = None,
+    broker: EventBroker = event_broker
+) -> AsyncIterator[str]:
+    """
+    SSE body for one client: replay or resync first, then live events and
+    periodic keep-alive comments until the client disconnects
+    """
+    subscriber = broker.subscribe(event_filter)
+    try:
+        missed = broker.replay_after(last_event_id) if last_event_id else None
+        if missed is None:
+            yield format_sse(RESYNC, resync_snapshot(), broker.history[-1]["id"] if broker.history else None)
+        else:
+            for event in missed:
+                if event_filter.matches(event):
+                    yield format_sse(event["type"], event, event["id"])
+
+        while True:
+            event = await subscriber.queue.get()
+            if subscriber.needs_resync:
+                # Drop whatever is queued; the snapshot supersedes it
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.needs_resync = False
+                yield format_sse(RESYNC, resync_snapshot(), broker.history[-1]["id"] if broker.history else None)
+            elif event["type"] == KEEPALIVE:
+                yield ": keep-alive\n\n"
+            else:
+                yield format_sse(event["type"], event, event["id"])
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+async def load_test(subscribers: Iterable[int] = (0, 100, 500, 1000),
+                    idle_seconds: float = 10.0, heartbeat_seconds: float = 15.0) -> List[dict]:
+    """
+    Open N idle in-process streams (no events published) and measure the CPU
+    the worker burns while they wait, then publish one event to all of them.
+    Runs without a database: uses a private broker and an empty floor projection.
+    """
+    report = []
+    for count in subscribers:
+        broker = EventBroker(heartbeat_seconds=heartbeat_seconds)
+
+        async def consume(stream):
+            async for _ in stream:
+                pass
+
+        tasks = [
+            asyncio.get_running_loop().create_task(
+                consume(event_stream(EventFilter(), broker=broker))
+            )
+            for _ in range(count)
+        ]
+        await asyncio.sleep(0.5)  # let every stream send its initial snapshot
+
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        await asyncio.sleep(idle_seconds)
+        idle_cpu = time.process_time() - cpu_started
+        wall = time.perf_counter() - wall_started
+
+        fanout_started = time.perf_counter()
+        broker.dispatch({"id": "load-test", "type": TABLE_STATUS, "at": None, "data": {"table_id": 1}})
+        await asyncio.sleep(0)
+        while any(not s.queue.empty() for s in broker.subscribers):
+            await asyncio.sleep(0)
+        fanout_ms = (time.perf_counter() - fanout_started) * 1000
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        report.append({
+            "subscribers": count,
+            "idle_cpu_percent": round(idle_cpu / wall * 100, 3),
+            "fanout_ms": round(fanout_ms, 3),
+            "delivered": broker.delivered
+        })
+    return report
+
+
+if __name__ == "__main__":
+    for row in asyncio.run(load_test()):
+        print(row)
@@ -0,0 +1,274 @@
+"""
+Floor Projection for RestoBot
+Trạng thái sàn (bàn, đặt bàn hiện tại/kế tiếp, order đang mở) giữ trong bộ nhớ,
+cập nhật theo các thao tác ghi để màn hình sơ đồ bàn đọc không cần truy vấn DB
+"""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from bisect import insort
+import threading
+import logging
+import time
+from sqlalchemy.orm import Session, joinedload
+from app.models.table import Table
+from app.models.order import Order, OrderStatus, Reservation, ReservationStatus
+from app.services.dashboard_cache import Snapshot, compute_etag
+from app.core.time_window import wall_clock, wall_clock_now
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_RESERVATION_STATUSES = (ReservationStatus.pending, ReservationStatus.confirmed)
+OPEN_ORDER_STATUSES = (
+    OrderStatus.pending, OrderStatus.confirmed, OrderStatus.preparing, OrderStatus.ready, OrderStatus.served
+)
+
+# (start, end, reservation_id, summary), kept sorted by start per table;
+# ids are unique so the summary dict is never compared
+Booking = Tuple[datetime, datetime, int, dict]
+
+
+def _value(enum_value):
+    return getattr(enum_value, "value", enum_value)
+
+
+def table_summary(table: Table) -> dict:
+    return {
+        "id": table.id,
+        "table_number": table.table_number,
+        "capacity": table.capacity,
+        "location": table.location,
+        "status": _value(table.status)
+    }
+
+
+def reservation_summary(reservation: Reservation, customer_name: Optional[str] = None) -> dict:
+    if customer_name is None:
+        customer_name = reservation.customer.full_name if reservation.customer else "Guest"
+    return {
+        "id": reservation.id,
+        "status": _value(reservation.status),
+        "reservation_datetime": reservation.reservation_datetime,
+        "estimated_end_time": reservation.estimated_end_time,
+        "party_size": reservation.party_size,
+        "customer_name": customer_name,
+        "arrived": reservation.actual_arrival_time is not None
+    }
+
+
+def order_summary(order: Order) -> dict:
+    return {
+        "id": order.id,
+        "order_number": order.order_number,
+        "status": _value(order.status),
+        "total_amount": order.total_amount,
+        "created_at": order.created_at
+    }
+
+
+class FloorProjection:
+    """
+    Per-table floor state kept in sync by the write paths.
+
+    Reads are served from a snapshot that is rebuilt only after a write or when
+    the clock reaches the next reservation boundary (a current reservation
+    ending or the next one starting), so a repeat read is a dict lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Dict[int, dict] = {}
+        self._bookings: Dict[int, List[Booking]] = {}
+        self._booking_tables: Dict[int, int] = {}
+        self._orders: Dict[int, Dict[int, dict]] = {}
+        self._order_tables: Dict[int, int] = {}
+        self._snapshot: Optional[Tuple[datetime, Snapshot]] = None
+        self.loaded = False
+
+    # Internal helpers (caller holds the lock)
+
+    def _remove_booking(self, reservation_id: int) -> None:
+        table_id = self._booking_tables.pop(reservation_id, None)
+        if table_id is not None:
+            self._bookings[table_id] = [
+                booking for booking in self._bookings[table_id] if booking[2] != reservation_id
+            ]
+
+    @staticmethod
+    def _booking_for(reservation: Reservation, customer_name: Optional[str] = None) -> Optional[Tuple[int, Booking]]:
+        # Built outside the lock: the summary may lazy-load the customer
+        if (
+            reservation.status not in ACTIVE_RESERVATION_STATUSES
+            or reservation.table_id is None
+            or reservation.estimated_end_time is None
+        ):
+            return None
+        booking = (
+            wall_clock(reservation.reservation_datetime),
+            wall_clock(reservation.estimated_end_time),
+            reservation.id,
+            reservation_summary(reservation, customer_name)
+        )
+        return reservation.table_id, booking
+
+    def _put_booking(self, reservation_id: int, entry: Optional[Tuple[int, Booking]]) -> None:
+        self._remove_booking(reservation_id)
+        if entry:
+            table_id, booking = entry
+            insort(self._bookings.setdefault(table_id, []), booking)
+            self._booking_tables[reservation_id] = table_id
+
+    def _remove_order(self, order_id: int) -> None:
+        table_id = self._order_tables.pop(order_id, None)
+        if table_id is not None:
+            self._orders[table_id].pop(order_id, None)
+
+    def _put_order(self, order: Order) -> None:
+        self._remove_order(order.id)
+        if order.status in OPEN_ORDER_STATUSES and order.table_id is not None:
+            self._orders.setdefault(order.table_id, {})[order.id] = order_summary(order)
+            self._order_tables[order.id] = order.table_id
+
+    def _build(self, now: datetime) -> Tuple[datetime, Snapshot]:
+        valid_until = datetime.max
+        floor = []
+        for table_id, table in sorted(self._tables.items(), key=lambda item: item[1]["table_number"]):
+            # Reservations that already ended stay out of every later snapshot
+            bookings = []
+            for booking in self._bookings.get(table_id, []):
+                if booking[1] > now:
+                    bookings.append(booking)
+                else:
+                    self._booking_tables.pop(booking[2], None)
+            self._bookings[table_id] = bookings
+            current = next((b for b in bookings if b[0] <= now), None)
+            upcoming = next((b for b in bookings if b[0] > now), None)
+            if current:
+                valid_until = min(valid_until, current[1])
+            if upcoming:
+                valid_until = min(valid_until, upcoming[0])
+            floor.append({
+                **table,
+                "current_reservation": current[3] if current else None,
+                "next_reservation": upcoming[3] if upcoming else None,
+                "open_orders": sorted(self._orders.get(table_id, {}).values(), key=lambda o: o["id"])
+            })
+        value = {"tables": floor, "table_count": len(floor)}
+        return valid_until, Snapshot(value=value, generated_at=datetime.utcnow(), etag=compute_etag(value))
+
+    # Public API
+
+    def load(self, db: Session) -> int:
+        """(Re)build the projection from the database; returns the number of tables"""
+        tables = db.query(Table).filter(Table.is_active == True).all()
+        reservations = db.query(Reservation).options(joinedload(Reservation.customer)).filter(
+            Reservation.status.in_(ACTIVE_RESERVATION_STATUSES),
+            Reservation.estimated_end_time >= wall_clock_now()
+        ).all()
+        orders = db.query(Order).filter(Order.status.in_(OPEN_ORDER_STATUSES)).all()
+        bookings = [(reservation.id, self._booking_for(reservation)) for reservation in reservations]
+        with self._lock:
+            self._tables = {table.id: table_summary(table) for table in tables}
+            self._bookings.clear()
+            self._booking_tables.clear()
+            self._orders.clear()
+            self._order_tables.clear()
+            for reservation_id, entry in bookings:
+                self._put_booking(reservation_id, entry)
+            for order in orders:
+                self._put_order(order)
+            self._snapshot = None
+            self.loaded = True
+            count = len(self._tables)
+        logger.info(
+            f"Floor projection loaded: {count} tables, {len(reservations)} reservations, {len(orders)} open orders"
+        )
+        return count
+
+    def upsert_table(self, table: Table) -> None:
+        """Apply a committed table create/update/status change"""
+        with self._lock:
+            if table.is_active:
+                self._tables[table.id] = table_summary(table)
+            else:
+                self._tables.pop(table.id, None)
+            self._snapshot = None
+
+    def set_table_status(self, table_id: int, status) -> None:
+        """Apply a committed bulk status change without reloading the table"""
+        with self._lock:
+            if table_id in self._tables:
+                self._tables[table_id] = {**self._tables[table_id], "status": _value(status)}
+                self._snapshot = None
+
+    def remove_table(self, table_id: int) -> None:
+        with self._lock:
+            self._tables.pop(table_id, None)
+            self._snapshot = None
+
+    def upsert_reservation(self, reservation: Reservation, customer_name: Optional[str] = None) -> None:
+        """Apply a committed reservation create/update/cancel (customer_name saves a lazy load)"""
+        entry = self._booking_for(reservation, customer_name)
+        with self._lock:
+            self._put_booking(reservation.id, entry)
+            self._snapshot = None
+
+    def remove_reservation(self, reservation_id: int) -> None:
+        with self._lock:
+            self._remove_booking(reservation_id)
+            self._snapshot = None
+
+    def upsert_order(self, order: Order) -> None:
+        """Apply a committed order create/update; closed orders leave the floor"""
+        with self._lock:
+            self._put_order(order)
+            self._snapshot = None
+
+    def remove_order(self, order_id: int) -> None:
+        with self._lock:
+            self._remove_order(order_id)
+            self._snapshot = None
+
+    def snapshot(self) -> Snapshot:
+        """Current floor state with its ETag"""
+        # Bookings hold naive wall-clock times (see time_window), so "now" is the restaurant's clock
+        now = wall_clock(wall_clock_now())
+        with self._lock:
+            if self._snapshot is None or now >= self._snapshot[0]:
+                self._snapshot = self._build(now)
+            return self._snapshot[1]
+
+
+floor_projection = FloorProjection()
+
+
+def benchmark(db: Session, reads: int = 10000) -> dict:
+    """Time a cold load, a snapshot rebuild and repeated cached reads"""
+    started = time.perf_counter()
+    tables = floor_projection.load(db)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    floor_projection.snapshot()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for _ in range(reads):
+        floor_projection.snapshot()
+    read_us = (time.perf_counter() - started) * 1e6 / reads
+    return {
+        "tables": tables,
+        "load_ms": round(load_ms, 2),
+        "rebuild_ms": round(build_ms, 3),
+        "cached_read_us": round(read_us, 3)
+    }
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print("Benchmark:", benchmark(session))
+    finally:
+        session.close()
@@ -0,0 +1,261 @@
+"""
+Reservation Interval Index for RestoBot
+Giữ các đặt bàn đang hoạt động (pending/confirmed) của từng bàn trong bộ nhớ,
+để kiểm tra trùng lịch không cần truy vấn lại bảng reservations
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right, insort
+import threading
+import logging
+import time
+from sqlalchemy.orm import Session
+from app.models.order import Reservation, ReservationStatus
+from app.core.time_window import naive_utc
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (ReservationStatus.pending, ReservationStatus.confirmed)
+
+# (start, end, reservation_id), kept sorted by start per table
+Interval = Tuple[datetime, datetime, int]
+
+
+def _overlaps(start: datetime, end: datetime, window_start: datetime, window_end: datetime) -> bool:
+    """Same three-branch test as CRUDTable._reservation_conflict_filter"""
+    return (
+        (start <= window_start and end >= window_start)
+        or (start <= window_end and end >= window_end)
+        or (start >= window_start and end <= window_end)
+    )
+
+
+class ReservationIntervalIndex:
+    """
+    Per-table sorted interval lists of active reservations.
+
+    Reservations without an estimated_end_time never match the SQL overlap
+    predicate, so they are not indexed either.
+
+    Write hooks only update the worker that handled the write, so every worker
+    reloads periodically (scheduler job reload_reservation_index) and the index
+    is only trusted while the last load is younger than max_age_seconds.
+    """
+
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._tables: Dict[int, List[Interval]] = {}
+        self._by_id: Dict[int, Tuple[int, Interval]] = {}
+        # Longest indexed reservation per table, bounds how far back a lookup scans
+        self._max_length: Dict[int, timedelta] = {}
+        # Local writes made while a load is reading, replayed over its result
+        self._writes_during_load: Optional[Dict[int, Optional[Tuple[int, Interval]]]] = None
+        self._loaded_at: Optional[float] = None
+        self.loaded = False
+
+    @staticmethod
+    def _interval_for(reservation: Reservation) -> Optional[Tuple[int, Interval]]:
+        if (
+            reservation.status not in ACTIVE_STATUSES
+            or reservation.table_id is None
+            or reservation.reservation_datetime is None
+            or reservation.estimated_end_time is None
+        ):
+            return None
+        interval = (
+            naive_utc(reservation.reservation_datetime),
+            naive_utc(reservation.estimated_end_time),
+            reservation.id
+        )
+        return reservation.table_id, interval
+
+    def _insert(self, table_id: int, interval: Interval) -> None:
+        insort(self._tables.setdefault(table_id, []), interval)
+        self._by_id[interval[2]] = (table_id, interval)
+        length = interval[1] - interval[0]
+        if length > self._max_length.get(table_id, timedelta(0)):
+            self._max_length[table_id] = length
+
+    def _remove(self, reservation_id: int) -> None:
+        entry = self._by_id.pop(reservation_id, None)
+        if not entry:
+            return
+        table_id, interval = entry
+        intervals = self._tables.get(table_id, [])
+        position = bisect_left(intervals, interval)
+        if position < len(intervals) and intervals[position] == interval:
+            del intervals[position]
+
+    def is_fresh(self) -> bool:
+        """Loaded recently enough to answer availability checks instead of SQL"""
+        return (
+            self.loaded and self._loaded_at is not None
+            and time.monotonic() - self._loaded_at <= self.max_age_seconds
+        )
+
+    def load(self, db: Session) -> int:
+        """(Re)build the index from the database; returns the number of indexed reservations"""
+        started_at = time.monotonic()
+        with self._lock:
+            self._writes_during_load = {}
+        try:
+            rows = db.query(Reservation).filter(
+                Reservation.status.in_(ACTIVE_STATUSES),
+                Reservation.estimated_end_time.isnot(None)
+            ).all()
+            entries = [self._interval_for(reservation) for reservation in rows]
+        except Exception:
+            with self._lock:
+                self._writes_during_load = None
+            raise
+        with self._lock:
+            self._tables.clear()
+            self._by_id.clear()
+            self._max_length.clear()
+            for entry in entries:
+                if entry:
+                    self._insert(*entry)
+            # A write committed after the query's snapshot would otherwise be lost
+            for reservation_id, entry in self._writes_during_load.items():
+                self._remove(reservation_id)
+                if entry:
+                    self._insert(*entry)
+            self._writes_during_load = None
+            self._loaded_at = started_at
+            self.loaded = True
+            count = len(self._by_id)
+        logger.info(f"Reservation index loaded with {count} active reservations")
+        return count
+
+    def upsert(self, reservation: Reservation) -> None:
+        """Apply a committed reservation create/update/cancel"""
+        entry = self._interval_for(reservation)
+        with self._lock:
+            self._remove(reservation.id)
+            if entry:
+                self._insert(*entry)
+            if self._writes_during_load is not None:
+                self._writes_during_load[reservation.id] = entry
+
+    def remove(self, reservation_id: int) -> None:
+        with self._lock:
+            self._remove(reservation_id)
+            if self._writes_during_load is not None:
+                self._writes_during_load[reservation_id] = None
+
+    def _table_conflicts(self, table_id: int, window_start: datetime, window_end: datetime) -> bool:
+        intervals = self._tables.get(table_id)
+        if not intervals:
+            return False
+        # Only intervals starting in [window_start - longest, window_end] can overlap
+        lower = bisect_left(intervals, (window_start - self._max_length[table_id],))
+        upper = bisect_right(intervals, (window_end, datetime.max))
+        return any(
+            _overlaps(start, end, window_start, window_end)
+            for start, end, _ in intervals[lower:upper]
+        )
+
+    def has_conflict(self, table_id: int, reservation_datetime: datetime, end_time: datetime) -> bool:
+        window_start, window_end = naive_utc(reservation_datetime), naive_utc(end_time)
+        with self._lock:
+            return self._table_conflicts(table_id, window_start, window_end)
+
+    def conflicting_table_ids(
+        self, reservation_datetime: datetime, end_time: datetime,
+        table_ids: Optional[Iterable[int]] = None
+    ) -> Set[int]:
+        """Tables (optionally restricted to table_ids) with an active reservation overlapping the window"""
+        window_start, window_end = naive_utc(reservation_datetime), naive_utc(end_time)
+        with self._lock:
+            candidates = list(self._tables) if table_ids is None else table_ids
+            return {
+                table_id for table_id in candidates
+                if self._table_conflicts(table_id, window_start, window_end)
+            }
+
+    def verify(self, db: Session) -> dict:
+        """Compare the index with the database; lists reservation ids that differ"""
+        expected = {}
+        rows = db.query(Reservation).filter(
+            Reservation.status.in_(ACTIVE_STATUSES),
+            Reservation.estimated_end_time.isnot(None)
+        ).all()
+        for reservation in rows:
+            entry = self._interval_for(reservation)
+            if entry:
+                expected[reservation.id] = entry
+        with self._lock:
+            indexed = dict(self._by_id)
+        missing = sorted(set(expected) - set(indexed))
+        stale = sorted(set(indexed) - set(expected))
+        changed = sorted(
+            reservation_id for reservation_id in set(expected) & set(indexed)
+            if expected[reservation_id] != indexed[reservation_id]
+        )
+        return {
+            "consistent": not (missing or stale or changed),
+            "indexed": len(indexed),
+            "missing": missing,
+            "stale": stale,
+            "changed": changed
+        }
+
+
+reservation_index = ReservationIntervalIndex(max_age_seconds=settings.RESERVATION_INDEX_REFRESH_SECONDS * 3)
+
+
+def benchmark(db: Session, samples: int = 200, duration_hours: int = 2) -> dict:
+    """Time per-table conflict checks through SQL and through the index on random windows"""
+    import random
+    from app.crud.table import table as table_crud
+    from app.models.table import Table
+
+    if not reservation_index.loaded:
+        reservation_index.load(db)
+    table_ids = [table_id for table_id, in db.query(Table.id).all()]
+    if not table_ids:
+        return {"samples": 0}
+    now = datetime.utcnow()
+    windows = [
+        (random.choice(table_ids), now + timedelta(minutes=random.randint(-24 * 60, 14 * 24 * 60)))
+        for _ in range(samples)
+    ]
+
+    started = time.perf_counter()
+    sql_results = []
+    for table_id, moment in windows:
+        sql_results.append(db.query(Reservation.id).filter(
+            Reservation.table_id == table_id,
+            table_crud._reservation_conflict_filter(moment, moment + timedelta(hours=duration_hours))
+        ).first() is not None)
+    sql_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index_results = [
+        reservation_index.has_conflict(table_id, moment, moment + timedelta(hours=duration_hours))
+        for table_id, moment in windows
+    ]
+    index_seconds = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(sql_results, index_results) if a != b)
+    return {
+        "samples": samples,
+        "sql_ms_per_check": round(sql_seconds * 1000 / samples, 4),
+        "index_ms_per_check": round(index_seconds * 1000 / samples, 4),
+        "mismatches": mismatches
+    }
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        reservation_index.load(session)
+        print("Consistency:", reservation_index.verify(session))
+        print("Benchmark:", benchmark(session))
+    finally:
+        session.close()
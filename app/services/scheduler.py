@@ -0,0 +1,337 @@
+"""
+Background Scheduler for RestoBot
+Chạy định kỳ đồng bộ trạng thái bàn, quét no-show, nhắc khách sắp đến và đối soát bộ đếm dashboard; chỉ một worker chạy mỗi job
+"""
+from typing import Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import random
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.time_window import naive_utc, wall_clock, wall_clock_now
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock namespace for job leadership (booking uses 7301/7302)
+SCHEDULER_LOCK_NAMESPACE = 7303
+
+
+class JobMetrics:
+    """Run counters for one job in this worker"""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0  # ticks where another worker was the leader
+        self.total_duration_ms = 0.0
+        self.max_duration_ms = 0.0
+        self.last_duration_ms: Optional[float] = None
+        self.last_run_at: Optional[datetime] = None
+        self.last_result: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.next_run_at: Optional[datetime] = None
+
+    def record(self, started_at: datetime, duration_ms: float,
+               result: Optional[int] = None, error: Optional[str] = None) -> None:
+        self.runs += 1
+        self.total_duration_ms += duration_ms
+        self.max_duration_ms = max(self.max_duration_ms, duration_ms)
+        self.last_duration_ms = duration_ms
+        self.last_run_at = started_at
+        if error is None:
+            self.last_result = result
+        else:
+            self.failures += 1
+            self.last_error = error
+
+    def snapshot(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped_not_leader": self.skipped,
+            "avg_duration_ms": round(self.total_duration_ms / self.runs, 2) if self.runs else None,
+            "max_duration_ms": round(self.max_duration_ms, 2),
+            "last_duration_ms": round(self.last_duration_ms, 2) if self.last_duration_ms is not None else None,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "next_run_at": self.next_run_at
+        }
+
+
+class ScheduledJob:
+    """
+    A periodic job. run(db) does the work on a fresh session and returns the
+    number of rows it touched (recorded as last_result). Jobs that refresh
+    per-process state set leader_only=False and run on every worker.
+    """
+
+    def __init__(self, name: str, lock_id: int, run: Callable[[Session], int],
+                 interval_seconds: float, jitter_seconds: float = 0, leader_only: bool = True):
+        self.name = name
+        self.lock_id = lock_id
+        self.run = run
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.leader_only = leader_only
+        self.metrics = JobMetrics()
+
+    def next_delay(self) -> float:
+        """Interval plus random jitter so workers and jobs don't fire in lockstep"""
+        return max(self.interval_seconds + random.uniform(-self.jitter_seconds, self.jitter_seconds), 1.0)
+
+
+class LeaderElection:
+    """
+    Per-job leadership via session-level pg_try_advisory_lock on one dedicated
+    connection. The leader keeps the lock across runs; if its worker dies or the
+    connection drops, Postgres releases the lock and another worker takes over.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._connection = None
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT 1"))
+                return self._connection
+            except Exception as e:
+                logger.warning(f"Scheduler leader connection lost ({e}), re-electing")
+                self._discard()
+        self._connection = self.engine.connect()
+        return self._connection
+
+    def _discard(self) -> None:
+        try:
+            if self._connection is not None:
+                self._connection.invalidate()
+        except Exception:
+            pass
+        self._connection = None
+        self._held.clear()
+
+    def is_leader(self, lock_id: int) -> bool:
+        """True when this worker holds (or just acquired) leadership of the job"""
+        with self._lock:
+            try:
+                connection = self._connect()
+                if lock_id in self._held:
+                    return True
+                acquired = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:namespace, :lock_id)"),
+                    {"namespace": SCHEDULER_LOCK_NAMESPACE, "lock_id": lock_id}
+                ).scalar()
+                if acquired:
+                    self._held.add(lock_id)
+                    logger.info(f"Scheduler took leadership of job {lock_id}")
+                return bool(acquired)
+            except Exception as e:
+                logger.error(f"Scheduler leader election failed: {e}")
+                self._discard()
+                return False
+
+    def held(self, lock_id: int) -> bool:
+        return lock_id in self._held
+
+    def release_all(self) -> None:
+        """Close the connection, which releases every session-level lock it holds"""
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.close()
+                except Exception:
+                    pass
+            self._connection = None
+            self._held.clear()
+
+
+class Scheduler:
+    """In-process asyncio scheduler; job bodies run in a thread with their own session"""
+
+    def __init__(self, session_factory: Callable[[], Session], election: LeaderElection):
+        self.session_factory = session_factory
+        self.election = election
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.started_at: Optional[datetime] = None
+
+    def add_job(self, job: ScheduledJob) -> None:
+        self.jobs[job.name] = job
+
+    def _execute(self, job: ScheduledJob) -> int:
+        db = self.session_factory()
+        try:
+            return job.run(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def run_once(self, job: ScheduledJob) -> None:
+        """One tick: run the job if this worker is its leader, and record metrics"""
+        if job.leader_only and not await asyncio.to_thread(self.election.is_leader, job.lock_id):
+            job.metrics.skipped += 1
+            return
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(self._execute, job)
+            job.metrics.record(started_at, (time.perf_counter() - started) * 1000, result=result)
+        except Exception as e:
+            job.metrics.record(started_at, (time.perf_counter() - started) * 1000, error=str(e))
+            logger.error(f"Scheduled job {job.name} failed: {e}")
+
+    async def _loop(self, job: ScheduledJob) -> None:
+        # Stagger the first run so workers booted together don't race for the locks
+        delay = random.uniform(0, job.jitter_seconds or 1.0)
+        while True:
+            job.metrics.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+            await self.run_once(job)
+            delay = job.next_delay()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self.started_at = datetime.utcnow()
+        self._tasks = [
+            asyncio.get_running_loop().create_task(self._loop(job), name=f"scheduler:{job.name}")
+            for job in self.jobs.values()
+        ]
+        logger.info(f"Scheduler started with {len(self._tasks)} jobs")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.election.release_all)
+        logger.info("Scheduler stopped")
+
+    def snapshot(self) -> dict:
+        """Per-job metrics for monitoring"""
+        return {
+            "running": bool(self._tasks),
+            "started_at": self.started_at,
+            "jobs": {
+                name: {
+                    "interval_seconds": job.interval_seconds,
+                    "jitter_seconds": job.jitter_seconds,
+                    "leader_only": job.leader_only,
+                    "leader": self.election.held(job.lock_id) if job.leader_only else None,
+                    **job.metrics.snapshot()
+                }
+                for name, job in self.jobs.items()
+            }
+        }
+
+
+def sync_table_statuses_job(db: Session) -> int:
+    # Only statuses the sync derives itself; cleaning/occupied set by staff are left alone
+    from app.services.table_status_manager import create_table_status_manager, SYNC_OWNED_STATUSES
+    return len(create_table_status_manager(db).sync_all_table_statuses(SYNC_OWNED_STATUSES))
+
+
+def no_show_sweep_job(db: Session) -> int:
+    from app.services.customer_arrival_tracker import create_arrival_tracker
+    return len(create_arrival_tracker(db).check_for_no_shows(
+        threshold_minutes=settings.NO_SHOW_THRESHOLD_MINUTES
+    ).reservation_ids)
+
+
+def arrival_rollup_job(db: Session) -> int:
+    from app.crud.arrival_stats import arrival_stats
+    return arrival_stats.refresh_recent(db)
+
+
+def reconcile_counters_job(db: Session) -> int:
+    # Re-derives the dashboard counters so seeding, manual SQL and crashed
+    # transactions can't leave them wrong; one worker only, as it locks every row
+    from app.crud.counter import counter
+    return len(counter.reconcile(db))
+
+
+def reload_floor_projection_job(db: Session) -> int:
+    # Picks up writes made by other workers, whose hooks only update their own projection
+    from app.services.floor_projection import floor_projection
+    return floor_projection.load(db)
+
+
+def reload_reservation_index_job(db: Session) -> int:
+    # Same for the availability index: keeps every worker's view within one interval of the DB
+    from app.services.reservation_index import reservation_index
+    return reservation_index.load(db)
+
+
+class UpcomingArrivalsJob:
+    """Announce each upcoming reservation once, however many ticks it stays in the window"""
+
+    def __init__(self):
+        self._notified: Dict[int, datetime] = {}
+
+    def __call__(self, db: Session) -> int:
+        from app.services.customer_arrival_tracker import create_arrival_tracker
+        now = wall_clock(wall_clock_now())  # same naive wall-clock form as the stored keys
+        self._notified = {
+            reservation_id: at for reservation_id, at in self._notified.items() if at >= now
+        }
+        upcoming = create_arrival_tracker(db).notify_upcoming_arrivals(
+            minutes_ahead=settings.UPCOMING_ARRIVALS_MINUTES
+        )
+        fresh = [r for r in upcoming if r.id not in self._notified]
+        for reservation in fresh:
+            self._notified[reservation.id] = naive_utc(reservation.reservation_datetime)
+            logger.info(
+                f"Upcoming arrival: reservation {reservation.id}, party of {reservation.party_size} "
+                f"at {reservation.reservation_datetime.isoformat()}"
+            )
+        return len(fresh)
+
+
+def create_scheduler() -> Scheduler:
+    """Factory function to create the scheduler with the default jobs"""
+    from app.core.database import SessionLocal, engine
+
+    scheduler = Scheduler(SessionLocal, LeaderElection(engine))
+    jitter = settings.SCHEDULER_JITTER_SECONDS
+    scheduler.add_job(ScheduledJob(
+        "sync_table_statuses", 1, sync_table_statuses_job,
+        settings.SCHEDULER_SYNC_STATUSES_SECONDS, jitter
+    ))
+    scheduler.add_job(ScheduledJob(
+        "no_show_sweep", 2, no_show_sweep_job,
+        settings.SCHEDULER_NO_SHOWS_SECONDS, jitter
+    ))
+    scheduler.add_job(ScheduledJob(
+        "upcoming_arrivals", 3, UpcomingArrivalsJob(),
+        settings.SCHEDULER_UPCOMING_ARRIVALS_SECONDS, jitter
+    ))
+    scheduler.add_job(ScheduledJob(
+        "arrival_rollup", 5, arrival_rollup_job,
+        settings.SCHEDULER_ARRIVAL_ROLLUP_SECONDS, jitter
+    ))
+    scheduler.add_job(ScheduledJob(
+        "reconcile_counters", 7, reconcile_counters_job,
+        settings.SCHEDULER_COUNTER_RECONCILE_SECONDS, jitter
+    ))
+    scheduler.add_job(ScheduledJob(
+        "reload_floor_projection", 4, reload_floor_projection_job,
+        settings.FLOOR_PROJECTION_REFRESH_SECONDS, jitter, leader_only=False
+    ))
+    scheduler.add_job(ScheduledJob(
+        "reload_reservation_index", 6, reload_reservation_index_job,
+        settings.RESERVATION_INDEX_REFRESH_SECONDS, jitter, leader_only=False
+    ))
+    return scheduler
+
+
+scheduler = create_scheduler()
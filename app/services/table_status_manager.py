@@ -2,16 +2,26 @@
 Table Status Manager for RestoBot
 Quản lý trạng thái bàn tự động dựa trên reservation và order
 """
-from typing import Optional, List
+from typing import Optional, List, Sequence
+from sqlalchemy import func, select, update, case, cast, exists
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app.models.table import Table, TableStatus
 from app.models.order import Reservation, ReservationStatus, Order, OrderStatus
 from app.crud.table import table as table_crud
+from app.services.dashboard_cache import dashboard_cache
+from app.services.floor_projection import floor_projection
+from app.services import event_stream
+from app.crud.counter import counter as counter_crud, table_status_key, transition, merge
+from app.core.time_window import wall_clock_now
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Statuses the periodic sync may overwrite: the ones it derives from reservations and
+# orders. cleaning, occupied and maintenance are set by staff (or arrival) and kept.
+SYNC_OWNED_STATUSES = (TableStatus.available, TableStatus.reserved)
+
 class TableStatusManager:
     """
     Manager để xử lý trạng thái bàn tự động
@@ -42,7 +52,7 @@ class TableStatusManager:
             new_status = self._determine_table_status_after_cancellation(table.id)
         else:
             # For pending reservations, keep current status unless it should be reserved
-            current_time = datetime.utcnow()
+            current_time = wall_clock_now()
             if (reservation.reservation_datetime <= current_time + timedelta(minutes=30) and
                 reservation.reservation_datetime >= current_time - timedelta(minutes=15)):
                 new_status = TableStatus.reserved
@@ -62,12 +72,13 @@ class TableStatusManager:
                 return self._update_table_status(table_id, TableStatus.occupied)
         
         # Check for any active reservations
-        current_time = datetime.utcnow()
+        current_time = wall_clock_now()
         active_reservation = self.db.query(Reservation).filter(
             Reservation.table_id == table_id,
             Reservation.status == ReservationStatus.confirmed,
-            Reservation.reservation_datetime <= current_time + timedelta(minutes=30),
-            Reservation.estimated_end_time >= current_time
+            Reservation.time_range.overlaps(
+                func.tstzrange(current_time, current_time + timedelta(minutes=30), "[]")
+            )
         ).first()
 
         if active_reservation:
@@ -98,7 +109,7 @@ class TableStatusManager:
         """
         Determine table status after a reservation is cancelled
         """
-        current_time = datetime.utcnow()
+        current_time = wall_clock_now()
         
         # Check for other active reservations
         other_reservations = self.db.query(Reservation).filter(
@@ -125,7 +136,7 @@ class TableStatusManager:
         """
         Determine next table status based on upcoming reservations
         """
-        current_time = datetime.utcnow()
+        current_time = wall_clock_now()
         
         # Check for upcoming reservations within next 30 minutes
         upcoming_reservation = self.db.query(Reservation).filter(
@@ -146,29 +157,83 @@ class TableStatusManager:
         """
         table = table_crud.update_status(self.db, table_id, new_status)
         if table:
+            dashboard_cache.invalidate()
             logger.info(f"Table {table.table_number} status updated to {new_status}")
         return table
 
-    def sync_all_table_statuses(self) -> List[Table]:
+    def _correct_status_cte(self, current_time: datetime, statuses: Optional[Sequence[TableStatus]] = None):
+        """
+        Current and correct status of every active table (same rules as
+        _calculate_correct_table_status), or only of tables currently in statuses
+        """
+        def status_literal(status: TableStatus):
+            return cast(status, Table.status.type)
+
+        active_order = exists().where(
+            Order.table_id == Table.id,
+            Order.status.in_([OrderStatus.pending, OrderStatus.confirmed, OrderStatus.ready, OrderStatus.served])
+        )
+        active_reservation = exists().where(
+            Reservation.table_id == Table.id,
+            Reservation.status == ReservationStatus.confirmed,
+            Reservation.time_range.overlaps(
+                func.tstzrange(current_time, current_time + timedelta(minutes=30), "[]")
+            )
+        )
+        correct_status = case(
+            (active_order, status_literal(TableStatus.occupied)),
+            (active_reservation, status_literal(TableStatus.reserved)),
+            (Table.status == TableStatus.maintenance, status_literal(TableStatus.maintenance)),
+            else_=status_literal(TableStatus.available)
+        )
+        query = select(
+            Table.id.label("table_id"),
+            Table.status.label("old_status"),
+            correct_status.label("new_status")
+        ).where(Table.is_active == True)
+        if statuses is not None:
+            query = query.where(Table.status.in_(statuses))
+        return query.cte("correct_status")
+
+    def sync_all_table_statuses(self, statuses: Optional[Sequence[TableStatus]] = None) -> List[Table]:
         """
         Sync all table statuses with current reservations and orders
-        Useful for fixing inconsistent states
+        Useful for fixing inconsistent states; with statuses, only tables currently
+        in one of them are touched (the scheduled sync passes SYNC_OWNED_STATUSES)
+        One CTE computes every table's correct status; one UPDATE ... RETURNING applies the changes
         """
-        updated_tables = []
-        current_time = datetime.utcnow()
-        
-        # Get all active tables
-        all_tables = self.db.query(Table).filter(Table.is_active == True).all()
-        
-        for table in all_tables:
-            # Determine correct status based on current state
-            correct_status = self._calculate_correct_table_status(table.id, current_time)
-            
-            if table.status != correct_status:
-                updated_table = self._update_table_status(table.id, correct_status)
-                if updated_table:
-                    updated_tables.append(updated_table)
-        
+        target = self._correct_status_cte(wall_clock_now(), statuses)
+        stmt = update(Table).where(
+            Table.id == target.c.table_id,
+            target.c.old_status != target.c.new_status
+        ).values(status=target.c.new_status).returning(
+            Table.id, Table.table_number, target.c.old_status, target.c.new_status
+        ).execution_options(synchronize_session=False)
+        changed = self.db.execute(stmt).all()
+        if not changed:
+            self.db.rollback()
+            return []
+
+        counter_crud.bump(self.db, merge(*(
+            transition(table_status_key(old_status), table_status_key(new_status))
+            for _, _, old_status, new_status in changed
+        )))
+        for table_id, table_number, old_status, new_status in changed:
+            event_stream.publish(self.db, event_stream.TABLE_STATUS, {
+                "table_id": table_id,
+                "table_number": table_number,
+                "old_status": event_stream.status_value(old_status),
+                "new_status": event_stream.status_value(new_status)
+            })
+        self.db.commit()
+        dashboard_cache.invalidate()
+
+        updated_tables = self.db.query(Table).filter(
+            Table.id.in_([table_id for table_id, _, _, _ in changed])
+        ).order_by(Table.id).all()
+        for table in updated_tables:
+            floor_projection.upsert_table(table)
+            logger.info(f"Table {table.table_number} status updated to {table.status}")
         return updated_tables
 
     def _calculate_correct_table_status(self, table_id: int, current_time: datetime) -> TableStatus:
@@ -188,8 +253,9 @@ class TableStatusManager:
         active_reservation = self.db.query(Reservation).filter(
             Reservation.table_id == table_id,
             Reservation.status == ReservationStatus.confirmed,
-            Reservation.reservation_datetime <= current_time + timedelta(minutes=30),
-            Reservation.estimated_end_time >= current_time
+            Reservation.time_range.overlaps(
+                func.tstzrange(current_time, current_time + timedelta(minutes=30), "[]")
+            )
         ).count()
 
         if active_reservation > 0:
@@ -219,4 +285,77 @@ class TableStatusManager:
 
 def create_table_status_manager(db: Session) -> TableStatusManager:
     """Factory function to create TableStatusManager"""
-    return TableStatusManager(db)
\ No newline at end of file
+    return TableStatusManager(db)
+
+def benchmark(tables: int = 500, repeat: int = 5) -> dict:
+    """
+    Compare the per-table status calculation with the single CTE query on
+    `tables` synthetic tables. Inserts and then removes the tables - run
+    against a test database.
+    """
+    import time
+    from sqlalchemy import event
+    from app.core.database import SessionLocal, engine
+
+    statements = {"count": 0}
+
+    def count_statement(*args):
+        statements["count"] += 1
+
+    def measure(run) -> dict:
+        statements["count"] = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return {
+            "ms": round((time.perf_counter() - started) * 1000 / repeat, 2),
+            "statements": statements["count"] // repeat
+        }
+
+    db = SessionLocal()
+    prefix = f"BENCH{int(time.time())}"
+    try:
+        db.add_all([
+            Table(table_number=f"{prefix}-{i}", capacity=4, status=TableStatus.occupied)
+            for i in range(tables)
+        ])
+        db.commit()
+        manager = create_table_status_manager(db)
+        table_ids = [table_id for (table_id,) in db.query(Table.id).filter(Table.is_active == True)]
+        now = wall_clock_now()
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            per_table = measure(lambda: [
+                manager._calculate_correct_table_status(table_id, now) for table_id in table_ids
+            ])
+            set_based = measure(lambda: db.execute(select(manager._correct_status_cte(now))).all())
+            statements["count"] = 0
+            started = time.perf_counter()
+            changed = len(manager.sync_all_table_statuses())
+            sync = {
+                "ms": round((time.perf_counter() - started) * 1000, 2),
+                "statements": statements["count"],
+                "tables_changed": changed
+            }
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+    finally:
+        db.rollback()
+        db.query(Table).filter(Table.table_number.like(f"{prefix}-%")).delete(synchronize_session=False)
+        db.commit()
+        # The synthetic tables bypassed CRUD, so re-derive the dashboard counters
+        counter_crud.reconcile(db)
+        db.close()
+
+    return {
+        "tables": len(table_ids),
+        "per_table_calculation": per_table,
+        "set_based_calculation": set_based,
+        "sync_all_table_statuses": sync
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print("Benchmark:", benchmark())
@@ -0,0 +1,152 @@
+"""
+Authenticated User Cache for RestoBot
+Giữ người dùng đã xác thực trong bộ nhớ (TTL + LRU) theo subject của token để mỗi request không phải truy vấn DB
+"""
+from typing import Callable, Dict, Optional
+from collections import OrderedDict
+import threading
+import time
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.models.user import User
+from app.core.config import settings
+
+
+def _detached_copy(user: User) -> User:
+    """Column-only copy with an identity key, never attached to any session"""
+    copy = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+    make_transient_to_detached(copy)
+    return copy
+
+
+class UserCache:
+    """
+    Bounded TTL/LRU cache of resolved users keyed by token subject (username).
+
+    Entries are detached column snapshots; each request gets its own instance via
+    Session.merge(load=False), so no SQL is emitted and requests never share an
+    ORM object. Local writes invalidate immediately; changes made by another
+    worker become visible once the entry expires.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # username -> (expires_at, version, User)
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, db: Session, username: str, load: Callable[[], Optional[User]]) -> Optional[User]:
+        """The user for username, attached to db; load() runs on a miss"""
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return load()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                cached = entry[2]
+            else:
+                if entry:
+                    del self._entries[username]
+                self.misses += 1
+                cached = None
+            version = self._version
+        if cached is not None:
+            return db.merge(cached, load=False)
+
+        user = load()
+        if user is None:
+            return None
+        snapshot = _detached_copy(user)
+        with self._lock:
+            # Don't store a row read before a concurrent invalidation
+            if version == self._version:
+                self._entries[username] = (time.monotonic() + self.ttl_seconds, version, snapshot)
+                self._entries.move_to_end(username)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return user
+
+    def invalidate(self, *usernames: Optional[str]) -> None:
+        """Drop the given users; called after profile, role, activation or password changes"""
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            for username in usernames:
+                if username:
+                    self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+user_cache = UserCache(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_MAX_ENTRIES)
+
+
+def benchmark(db: Session, requests: int = 2000) -> Dict[str, dict]:
+    """
+    Authenticated-request throughput of get_current_user (token check + user
+    lookup) with the cache disabled and warm, for the first active user
+    """
+    from fastapi.security import HTTPAuthorizationCredentials
+    from app.api.deps import get_current_user
+    from app.core.security import create_access_token
+
+    username = db.query(User.username).filter(User.is_active == True).order_by(User.id).limit(1).scalar()
+    if username is None:
+        return {"skipped": {"reason": "needs one active user"}}
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(username))
+
+    report = {}
+    saved_ttl = user_cache.ttl_seconds
+    try:
+        for name, ttl in (("uncached", 0), ("cached", saved_ttl or 60)):
+            user_cache.ttl_seconds = ttl
+            user_cache.clear()
+            get_current_user(db, credentials)  # warm up (and fill the cache)
+            started = time.perf_counter()
+            for _ in range(requests):
+                get_current_user(db, credentials)
+                db.expunge_all()  # each request has its own session
+            elapsed = time.perf_counter() - started
+            report[name] = {
+                "requests_per_second": round(requests / elapsed, 1),
+                "mean_us": round(elapsed * 1e6 / requests, 1)
+            }
+    finally:
+        user_cache.ttl_seconds = saved_ttl
+        user_cache.clear()
+    report["stats"] = user_cache.stats()
+    return report
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print("Benchmark:", benchmark(session))
+    finally:
+        session.close()
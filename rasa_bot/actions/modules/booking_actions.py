@@ -3,6 +3,7 @@ Table Booking Actions for RestoBot
 Xử lý các action liên quan đến đặt bàn
 """
 import re
+import uuid
 import requests
 from datetime import datetime, timedelta
 from typing import Any, Text, Dict, List
@@ -466,12 +467,24 @@ Có lỗi khi xử lý thông tin đặt bàn: {str(e)}
             
             print(f"DEBUG - Booking data: {booking_data}")
             
-            response = requests.post(
-                f"{API_BASE_URL}/orders/reservations/",
-                headers=headers,
-                json=booking_data,
-                timeout=10
-            )
+            # Một key mới cho mỗi lần đặt bàn; chỉ lần gửi lại do timeout/mất kết nối dùng lại key này
+            idempotency_key = str(uuid.uuid4())
+            booking_headers = {**headers, "Idempotency-Key": idempotency_key}
+            try:
+                response = requests.post(
+                    f"{API_BASE_URL}/orders/reservations/",
+                    headers=booking_headers,
+                    json=booking_data,
+                    timeout=10
+                )
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                # Safe to retry once: the server replays the first attempt for this key
+                response = requests.post(
+                    f"{API_BASE_URL}/orders/reservations/",
+                    headers=booking_headers,
+                    json=booking_data,
+                    timeout=10
+                )
             
             print(f"DEBUG - Reservation POST status: {response.status_code}, response: {getattr(response, 'text', '')}")
 